@@ -0,0 +1,384 @@
+"""Benchmarks for the BOC core: bit strings, builders, hashing, BoC
+serialization and parsing, slices, dictionaries and cell arenas.
+
+    python tests/bench/bench_boc.py                 # print results
+    python tests/bench/bench_boc.py --check         # fail on regressions
+    python tests/bench/bench_boc.py --save          # store new baselines
+    python tests/bench/bench_boc.py -k boc          # only matching benchmarks
+
+Each benchmark reports operations per second (best of several rounds) and
+the peak memory allocated by a single operation. With --check the run exits
+with status 1 if a benchmark is slower than its stored baseline, or needs
+more memory than it, by more than --tolerance; a benchmark that looks slower
+is measured again before it is reported. Baselines are machine specific:
+save them again with --save when the benchmarks run elsewhere.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from nacl.signing import SigningKey  # noqa: E402
+
+from tonsdk.boc import Cell, CellArena, DictView, begin_cell, begin_dict, parse_dict  # noqa: E402
+from tonsdk.boc.dict import serialize_dict  # noqa: E402
+from tonsdk.contract.token.ft import JettonMinter, JettonWallet  # noqa: E402
+from tonsdk.contract.token.nft import NFTCollection, NFTItem, NFTSale  # noqa: E402
+from tonsdk.contract.wallet import WalletV4ContractR2, HighloadWalletV3Contract  # noqa: E402
+from tonsdk.utils import Address, HighloadQueryId  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+ROUND_TIME = 0.2
+ROUNDS = 5
+RETRIES = 2
+
+_signing_key = SigningKey(bytes(range(32)))
+PUBLIC_KEY = bytes(_signing_key.verify_key)
+PRIVATE_KEY = bytes(_signing_key._signing_key)
+ADDRESS = Address('EQBvW8Z5huBkMJYdnfAEM5JqTNkuWX3diqYENkWsIL0XggGG')
+OTHER_ADDRESS = Address('0:' + '11' * 32)
+CREATED_AT = 1700000000
+
+
+# fixtures
+
+WALLET_V4 = WalletV4ContractR2(public_key=PUBLIC_KEY, private_key=PRIVATE_KEY, wc=0)
+
+
+def wallet_v4_transfer() -> Cell:
+    return WALLET_V4.create_transfer_message(
+        ADDRESS.to_string(True, True, True), 10 ** 9, 5, payload='hello', dummy_signature=True)['message']
+
+
+HIGHLOAD_WALLET = HighloadWalletV3Contract(public_key=PUBLIC_KEY, private_key=PRIVATE_KEY)
+HIGHLOAD_RECIPIENTS = [{
+    'address': (ADDRESS if i % 2 else OTHER_ADDRESS).to_string(True, True, True),
+    'amount': i + 1,
+    'payload': 'payment %d' % i,
+} for i in range(254)]
+
+
+def highload_v3_batch() -> Cell:
+    return HIGHLOAD_WALLET.create_batch_transfer_message(
+        HIGHLOAD_RECIPIENTS, HighloadQueryId.from_seqno(7), CREATED_AT, dummy_signature=True)['message']
+
+
+NFT_COLLECTION = NFTCollection(
+    royalty_base=1000, royalty=0.055, royalty_address=ADDRESS, owner_address=OTHER_ADDRESS,
+    collection_content_uri='https://s.getgems.io/nft/meta.json',
+    nft_item_content_base_uri='https://s.getgems.io/nft/',
+    nft_item_code_hex=NFTItem.code)
+NFT_ITEMS = [('%d/meta.json' % i, ADDRESS) for i in range(250)]
+
+
+def nft_batch_mint() -> Cell:
+    return NFT_COLLECTION.create_batch_mint_body(1, NFT_ITEMS)
+
+
+CODE_BOCS = {
+    'wallet_v4': bytes.fromhex(WALLET_V4.code),
+    'highload_v3': bytes.fromhex(HIGHLOAD_WALLET.code),
+    'jetton_minter': bytes.fromhex(JettonMinter.code),
+    'jetton_wallet': bytes.fromhex(JettonWallet.code),
+    'nft_collection': bytes.fromhex(NFTCollection.code),
+    'nft_item': bytes.fromhex(NFTItem.code),
+    'nft_sale': bytes.fromhex(NFTSale.code),
+}
+
+
+def jetton_transfer_body() -> Cell:
+    return begin_cell() \
+        .store_uint(0xf8a7ea5, 32) \
+        .store_uint(7, 64) \
+        .store_coins(10 ** 12) \
+        .store_address(ADDRESS) \
+        .store_address(OTHER_ADDRESS) \
+        .store_bit(0) \
+        .store_coins(1) \
+        .store_bit(0) \
+        .end_cell()
+
+
+DICT_ITEMS = {(i * 2654435761) & 0xffffffff: begin_cell().store_uint(i, 32).end_cell() for i in range(1000)}
+
+
+# benchmarks
+
+def bench_bit_string_writes():
+    cell = Cell()
+    bits = cell.bits
+    for i in range(32):
+        bits.write_uint(i, 7)
+    bits.write_address(ADDRESS)
+    bits.write_grams(10 ** 9)
+    bits.write_bytes(b'\x01' * 32)
+
+
+def bench_builder_chain():
+    for i in range(10):
+        begin_cell() \
+            .store_uint(0xf8a7ea5, 32) \
+            .store_uint(i, 64) \
+            .store_coins(10 ** 12) \
+            .store_address(ADDRESS) \
+            .store_address(OTHER_ADDRESS) \
+            .store_maybe_ref(None) \
+            .store_coins(1) \
+            .store_bit(0) \
+            .end_cell()
+
+
+def bench_build_wallet_v4_transfer():
+    wallet_v4_transfer()
+
+
+def bench_build_highload_v3_batch():
+    highload_v3_batch()
+
+
+def bench_build_nft_batch_mint():
+    nft_batch_mint()
+
+
+def _hash_benchmark(build):
+    cell = build()
+    cells = [c for _, c in cell.tree_walk()[0]]
+
+    def bench():
+        # hashes are cached per cell: measure a cold computation
+        for c in cells:
+            c._hashes_cache = None
+        cell.bytes_hash()
+    return bench
+
+
+def _to_boc_benchmark(build):
+    cell = build()
+    return lambda: cell.to_boc(False)
+
+
+def _from_boc_benchmark(build):
+    boc = bytes(build().to_boc(False))
+    return lambda: Cell.one_from_boc(boc)
+
+
+def bench_parse_code_bocs():
+    for boc in CODE_BOCS.values():
+        Cell.one_from_boc(boc)
+
+
+def bench_hash_code_bocs():
+    for boc in CODE_BOCS.values():
+        Cell.one_from_boc(boc).bytes_hash()
+
+
+JETTON_TRANSFER = jetton_transfer_body()
+
+
+def bench_slice_reads():
+    for _ in range(10):
+        s = JETTON_TRANSFER.begin_parse()
+        s.read_uint(32)
+        s.read_uint(64)
+        s.read_coins()
+        s.read_msg_addr()
+        s.read_msg_addr()
+        s.read_bit()
+        s.read_coins()
+        s.read_bit()
+
+
+def bench_serialize_dict():
+    serialize_dict(DICT_ITEMS, 32, lambda src, dest: dest.write_cell(src))
+
+
+def bench_dict_builder():
+    builder = begin_dict(32)
+    for key, value in DICT_ITEMS.items():
+        builder.store_cell(key, value)
+    builder.end_dict()
+
+
+DICT_CELL = serialize_dict(DICT_ITEMS, 32, lambda src, dest: dest.write_cell(src))
+DICT_KEYS = sorted(DICT_ITEMS)[::100]
+
+
+def bench_parse_dict():
+    parse_dict(DICT_CELL, 32, lambda src: src.read_uint(32))
+
+
+def bench_dict_view_get():
+    view = DictView(DICT_CELL, 32, lambda src: src.read_uint(32))
+    for key in DICT_KEYS:
+        view.get(key)
+
+
+DICT_BUILDER = begin_dict(32)
+for _key, _value in DICT_ITEMS.items():
+    DICT_BUILDER.store_cell(_key, _value)
+DICT_BUILDER.end_dict().bytes_hash()
+_UPDATED_VALUE = begin_cell().store_uint(1, 32).end_cell()
+
+
+def bench_dict_builder_update():
+    for key in DICT_KEYS:
+        DICT_BUILDER.set(key + 1, _UPDATED_VALUE)
+        DICT_BUILDER.end_dict().bytes_hash()
+        DICT_BUILDER.delete(key + 1)
+    DICT_BUILDER.end_dict().bytes_hash()
+
+
+DICT_BOC = bytes(DICT_CELL.to_boc(False))
+DICT_ARENA = CellArena.from_boc(DICT_BOC)
+
+
+def bench_arena_from_boc():
+    CellArena.from_boc(DICT_BOC)
+
+
+def bench_arena_hash():
+    # hashes are computed once per arena: measure a cold computation
+    DICT_ARENA._hashes = None
+    DICT_ARENA.roots()[0].bytes_hash()
+
+
+def bench_arena_to_boc():
+    DICT_ARENA.to_boc(False)
+
+
+def benchmarks():
+    """Returns {name: callable} of all benchmarks. Fixtures are built here,
+    outside of the measured callables."""
+    cases = {
+        'bit_string.writes': bench_bit_string_writes,
+        'builder.chain_x10': bench_builder_chain,
+        'build.wallet_v4_transfer': bench_build_wallet_v4_transfer,
+        'build.highload_v3_batch_254': bench_build_highload_v3_batch,
+        'build.nft_batch_mint_250': bench_build_nft_batch_mint,
+        'boc.parse_code_bocs': bench_parse_code_bocs,
+        'hash.code_bocs': bench_hash_code_bocs,
+        'slice.jetton_transfer_x10': bench_slice_reads,
+        'dict.serialize_1000': bench_serialize_dict,
+        'dict.builder_1000': bench_dict_builder,
+        'dict.parse_1000': bench_parse_dict,
+        'dict.view_get_x10': bench_dict_view_get,
+        'dict.builder_update_x10': bench_dict_builder_update,
+        'arena.from_boc.dict_1000': bench_arena_from_boc,
+        'arena.hash.dict_1000': bench_arena_hash,
+        'arena.to_boc.dict_1000': bench_arena_to_boc,
+    }
+    for name, build in (('wallet_v4_transfer', wallet_v4_transfer),
+                        ('highload_v3_batch_254', highload_v3_batch),
+                        ('nft_batch_mint_250', nft_batch_mint)):
+        cases['hash.%s' % name] = _hash_benchmark(build)
+        cases['boc.to_boc.%s' % name] = _to_boc_benchmark(build)
+        cases['boc.one_from_boc.%s' % name] = _from_boc_benchmark(build)
+    return cases
+
+
+# runner
+
+def measure(func):
+    """Returns (ops per second, peak bytes) of func."""
+    func()  # warm up
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= ROUND_TIME / 10:
+            break
+        number *= 2
+    number = max(1, int(number * ROUND_TIME / elapsed))
+
+    best = None
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return number / best, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='pattern', default='', help='run only benchmarks containing this string')
+    parser.add_argument('--check', action='store_true', help='compare with the stored baselines')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baselines')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='allowed relative slowdown / memory growth (default 0.3)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failures = []
+    print('%-42s %14s %12s %10s' % ('benchmark', 'ops/sec', 'peak KiB', 'vs base'))
+    for name, func in benchmarks().items():
+        if args.pattern not in name:
+            continue
+        ops, peak = measure(func)
+        base = baseline.get(name)
+        if args.check and base:
+            # a busy machine slows whole runs down: confirm a slowdown before reporting it
+            for _ in range(RETRIES):
+                if ops >= base['ops_per_sec'] * (1 - args.tolerance):
+                    break
+                ops = max(ops, measure(func)[0])
+        results[name] = {'ops_per_sec': round(ops, 1), 'peak_bytes': peak}
+
+        ratio = ''
+        if base:
+            ratio = '%.2fx' % (ops / base['ops_per_sec'])
+            if ops < base['ops_per_sec'] * (1 - args.tolerance):
+                failures.append('%s: %.1f ops/sec, baseline %.1f' % (name, ops, base['ops_per_sec']))
+            if peak > base['peak_bytes'] * (1 + args.tolerance):
+                failures.append('%s: peak %d bytes, baseline %d' % (name, peak, base['peak_bytes']))
+        print('%-42s %14.1f %12.1f %10s' % (name, ops, peak / 1024, ratio))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('saved %d baselines to %s' % (len(results), args.baseline))
+
+    if args.check and failures:
+        print('\nregressions:')
+        for failure in failures:
+            print('  ' + failure)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
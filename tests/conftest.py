@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+
+class FakeWrapper:
+    """Stands for AsyncTonLibJsonWrapper: answers each request with
+    handler(request), raising it if it is an exception, or leaves it
+    pending if it is None."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self.pending = []
+        self.holds = 0
+
+    def hold(self):
+        self.holds += 1
+
+    def release(self):
+        self.holds -= 1
+
+    def execute(self, query, timeout=10):
+        self.requests.append(query)
+        future = asyncio.get_event_loop().create_future()
+        result = self.handler(query)
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+        elif result is not None:
+            future.set_result(result)
+        else:
+            self.pending.append(future)
+        return future
+
+    def sent(self, query_type):
+        return [query for query in self.requests if query['@type'] == query_type]
+
+
+@pytest.fixture
+def fake_wrapper():
+    return FakeWrapper
@@ -0,0 +1,17 @@
+import pytest
+
+from tonsdk.utils import Address, InvalidAddressError
+
+FRIENDLY = 'EQBvW8Z5huBkMJYdnfAEM5JqTNkuWX3diqYENkWsIL0XggGG'
+
+
+def test_parse_many():
+    raw = '0:' + '00' * 32
+    parsed = Address.parse_many([FRIENDLY, raw, FRIENDLY, Address(FRIENDLY)])
+    assert parsed == [Address(FRIENDLY), Address(raw), Address(FRIENDLY), Address(FRIENDLY)]
+
+
+@pytest.mark.parametrize('item', [None, 123, b'0:00', ['0:00']])
+def test_parse_many_rejects_non_str(item):
+    with pytest.raises(InvalidAddressError):
+        Address.parse_many([FRIENDLY, item])
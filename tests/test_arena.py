@@ -0,0 +1,50 @@
+import pytest
+
+from tonsdk.boc import Cell, CellArena, begin_cell, create_merkle_proof, create_pruned_branch
+from tonsdk.boc.dict import serialize_dict
+from tonsdk.contract.wallet import WalletV4ContractR2
+
+
+def store_uint32(value, cell):
+    cell.bits.write_uint(value, 32)
+
+
+def trees():
+    leaf = begin_cell().store_uint(5, 3).end_cell()
+    shared = begin_cell().store_bytes(b'shared').store_ref(leaf).end_cell()
+    yield begin_cell().end_cell()
+    yield begin_cell().store_ref(shared).store_ref(shared).store_uint(1, 1).end_cell()
+    yield serialize_dict({key: key for key in range(0, 1000, 3)}, 16, store_uint32)
+    yield Cell.one_from_boc(WalletV4ContractR2.code)
+    yield create_merkle_proof(begin_cell().store_ref(create_pruned_branch(shared)).store_ref(leaf).end_cell())
+
+
+@pytest.mark.parametrize('options', [{}, {'has_idx': False}, {'hash_crc32': False}, {'has_cache_bits': True}])
+def test_boc_round_trip(options):
+    for root in trees():
+        boc = bytes(root.to_boc(**options))
+        arena = CellArena.from_boc(boc)
+        assert bytes(arena.to_boc(**options)) == boc
+        assert bytes(CellArena.from_cells(root).to_boc(**options)) == boc
+        assert arena.roots()[0].bytes_hash() == root.bytes_hash()
+        assert arena.roots()[0].get_max_depth() == root.get_max_depth()
+        assert arena.roots()[0].to_cell().bytes_hash() == root.bytes_hash()
+
+
+def test_from_cells_stores_shared_cells_once():
+    first, second = list(trees())[1:3]
+    arena = CellArena.from_cells(first, second)
+    assert len(arena) == 3 + len(CellArena.from_cells(second))
+    assert [root.bytes_hash() for root in arena.roots()] == [first.bytes_hash(), second.bytes_hash()]
+    assert bytes(arena.to_boc()) == bytes(CellArena.from_boc(arena.to_boc()).to_boc())
+
+
+def test_arena_cells_read_like_cells():
+    root = list(trees())[1]
+    cell = CellArena.from_cells(root).roots()[0]
+    assert cell.refs[0] == cell.refs[1]
+    shared = cell.refs[0].begin_parse()
+    assert shared.read_bytes(6) == b'shared'
+    assert shared.read_ref().begin_parse().read_uint(3) == 5
+    assert cell.begin_parse().read_uint(1) == 1
+    assert cell.bits.get_top_upped_array() == root.bits.get_top_upped_array()
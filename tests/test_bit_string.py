@@ -0,0 +1,90 @@
+import pytest
+
+from tonsdk.boc._bit_string import BitString
+from tonsdk.utils import Address
+
+ADDRESS = Address('EQCD39VS5jcptHL8vMjEXrzGaRcCVYto7HUn4bpAOg8xqB2N')
+
+# (method, args, (cursor, top-upped data) when written to an empty BitString,
+#  the same after five 1 bits), as written bit by bit before word-level writes
+WRITES = [
+    ('write_uint', (5, 3), (3, 'b0'), (8, 'fd')),
+    ('write_uint', (0xdeadbeef, 32), (32, 'deadbeef'), (37, 'fef56df77c')),
+    ('write_uint', (2 ** 64 - 1, 64), (64, 'ffffffffffffffff'), (69, 'fffffffffffffffffc')),
+    ('write_uint', (0, 0), (0, ''), (5, 'fc')),
+    ('write_uint', (1, 257), (257, '0000000000000000000000000000000000000000000000000000000000000000c0'),
+     (262, 'f80000000000000000000000000000000000000000000000000000000000000006')),
+    ('write_int', (-1, 1), (1, 'c0'), (6, 'fe')),
+    ('write_int', (-5, 7), (7, 'f7'), (12, 'ffb8')),
+    ('write_int', (-2 ** 31, 32), (32, '80000000'), (37, 'fc00000004')),
+    ('write_int', (12345, 17), (17, '181cc0'), (22, 'f8c0e6')),
+    ('write_bytes', (bytes(range(1, 34)),),
+     (264, '0102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f2021'),
+     (269, 'f808101820283038404850586068707880889098a0a8b0b8c0c8d0d8e0e8f0f9010c')),
+    ('write_string', ('tonsdk',), (48, '746f6e73646b'), (53, 'fba37b739b235c')),
+    ('write_address', (ADDRESS,),
+     (267, '80107bfaaa5cc6e5368e5f9799188bd798cd22e04ab16d1d8ea4fc37480741e63510'),
+     (272, 'fc0083dfd552e63729b472fcbcc8c45ebcc6691702558b68ec7527e1ba403a0f31a8')),
+    ('write_address', (None,), (2, '20'), (7, 'f9')),
+    ('write_coins', (0,), (4, '08'), (9, 'f840')),
+    ('write_coins', (10 ** 9 + 7,), (36, '43b9aca078'), (41, 'fa1dcd6503c0')),
+    ('write_grams', (2 ** 120 - 1,), (124, 'fffffffffffffffffffffffffffffff8'),
+     (129, 'ffffffffffffffffffffffffffffffffc0')),
+    ('write_bit_array', (b'1011001',), (7, 'b3'), (12, 'fd98')),
+    ('write_bit', (1,), (1, 'c0'), (6, 'fe')),
+    ('write_uint8', (0xa5,), (8, 'a5'), (13, 'fd2c')),
+]
+
+
+@pytest.mark.parametrize('method, args, aligned, unaligned', WRITES)
+def test_writes_match_previous_output(method, args, aligned, unaligned):
+    for skip, expected in ((0, aligned), (5, unaligned)):
+        bits = BitString(1023)
+        for _ in range(skip):
+            bits.write_bit(1)
+        getattr(bits, method)(*args)
+        assert (bits.cursor, bits.get_top_upped_array().hex()) == expected
+
+
+def test_write_bit_string():
+    another = BitString(1023)
+    another.write_uint(0b10110, 5)
+    bits = BitString(1023)
+    bits.write_uint(1, 3)
+    bits.write_bit_string(another)
+    bits.write_bytes(b'\xff')
+    assert (bits.cursor, bits.get_top_upped_array().hex()) == (16, '36ff')
+
+
+def test_writes_overwrite_set_bits():
+    bits = BitString(40)
+    bits.write_bytes(b'\xff' * 5)
+    bits.cursor = 3
+    bits.write_uint(0, 10)
+    bits.write_int(-2, 5)
+    assert bits.cursor == 18
+    assert bits.array.hex() == 'e007bfffff'
+    assert bits.get_top_upped_array().hex() == 'e007a0'
+
+
+@pytest.mark.parametrize('value, bit_length', [(0, 1), (1, 1), (0x5a5, 11), (2 ** 100 + 3, 101)])
+def test_write_bits_matches_write_bit(value, bit_length):
+    for skip in range(9):
+        expected = BitString(200)
+        bits = BitString(200)
+        for b in [1] * skip + [int(c) for c in format(value, f'0{bit_length}b')]:
+            expected.write_bit(b)
+        for _ in range(skip):
+            bits.write_bit(1)
+        bits.write_bits(value, bit_length)
+        assert (bits.cursor, bits.array) == (expected.cursor, expected.array)
+
+
+def test_write_overflow():
+    bits = BitString(10)
+    bits.write_uint(1, 8)
+    with pytest.raises(Exception, match='overflow'):
+        bits.write_uint(1, 3)
+    with pytest.raises(Exception, match='overflow'):
+        bits.write_bytes(b'\x01')
+    assert bits.cursor == 8
@@ -0,0 +1,107 @@
+import io
+import tempfile
+
+import pytest
+
+from tonsdk.boc import BocReader, BocWriter, Cell, CellArena, begin_cell, disable_cell_interning, \
+    enable_cell_interning
+from tonsdk.boc._cell import deserialize_boc
+from tonsdk.utils import crc32c
+
+
+def make_roots(n=50):
+    shared = begin_cell().store_uint(7, 8).end_cell()
+    return [begin_cell().store_uint(i, 32).store_ref(shared).end_cell() for i in range(n)]
+
+
+@pytest.mark.parametrize('options', [{}, {'has_idx': False}, {'hash_crc32': False}, {'has_cache_bits': True}])
+def test_boc_reader_reads_file_on_demand(options):
+    roots = make_roots()
+    writer = BocWriter(**options).add_roots(roots)
+    with tempfile.TemporaryFile() as fp:
+        fp.write(b'prefix')
+        writer.write(fp)
+        fp.seek(len(b'prefix'))
+        reader = BocReader(fp)
+        assert len(reader) == len(roots)
+        assert [cell.bytes_hash() for cell in reader] == [cell.bytes_hash() for cell in roots]
+
+
+def test_boc_reader_checks_file_crc32c():
+    data = bytearray(BocWriter().add_roots(make_roots()).to_bytes())
+    data[-10] ^= 1
+    with pytest.raises(Exception, match='Crc32c'):
+        BocReader(io.BytesIO(bytes(data)))
+
+
+def forge_stored_hash(cell, fake_hash):
+    """BoC of cell with fake_hash stored as its hash."""
+    data = bytes(cell.to_boc(store_hashes=True))
+    assert data.count(cell.bytes_hash()) == 1
+    data = data[:-4].replace(cell.bytes_hash(), fake_hash)
+    return data + crc32c(data)
+
+
+def test_stored_hashes_are_checked():
+    honest = begin_cell().store_bytes(bytes.fromhex('deadbeef')).end_cell()
+    forged = forge_stored_hash(begin_cell().store_bytes(bytes.fromhex('11111111')).end_cell(),
+                               honest.bytes_hash())
+    with pytest.raises(Exception, match='Stored cell hash'):
+        Cell.one_from_boc(forged)
+    with pytest.raises(Exception, match='Stored cell hash'):
+        list(BocReader(forged))
+
+    trusted = deserialize_boc(forged, trust_stored_hashes=True)[0]
+    assert trusted.bytes_hash() == honest.bytes_hash()
+
+    stored = bytes(honest.to_boc(store_hashes=True))
+    assert Cell.one_from_boc(stored).bytes_hash() == honest.bytes_hash()
+
+
+def test_interning_ignores_trusted_stored_hashes():
+    honest = begin_cell().store_bytes(bytes.fromhex('deadbeef')).end_cell()
+    forged = forge_stored_hash(begin_cell().store_bytes(bytes.fromhex('11111111')).end_cell(),
+                               honest.bytes_hash())
+    cache = enable_cell_interning()
+    try:
+        with pytest.raises(Exception):
+            Cell.one_from_boc(forged)
+        deserialize_boc(forged, trust_stored_hashes=True)
+        assert honest.bytes_hash() not in cache
+
+        cell = Cell.one_from_boc(honest.to_boc())
+        assert cell.begin_parse().read_bytes(4) == bytes.fromhex('deadbeef')
+        assert cache.get(honest.bytes_hash()) is cell
+    finally:
+        disable_cell_interning()
+
+
+def test_interned_cells_are_frozen():
+    leaf = begin_cell().store_uint(7, 8).end_cell()
+    boc = bytes(begin_cell().store_ref(leaf).store_ref(leaf).end_cell().to_boc())
+    cache = enable_cell_interning()
+    try:
+        first = Cell.one_from_boc(boc)
+        second = Cell.one_from_boc(boc)
+        assert second is first
+        with pytest.raises(Exception, match='Frozen'):
+            first.refs.append(leaf)
+        with pytest.raises(Exception, match='Frozen'):
+            first.refs[0].bits.off(0)
+
+        own = begin_cell().store_ref(begin_cell().store_uint(7, 8).end_cell()).end_cell()
+        own_refs = own.refs
+        assert cache.intern(own).refs[0] is first.refs[0]
+        assert own_refs[0] is not first.refs[0]
+    finally:
+        disable_cell_interning()
+
+
+def test_cache_bits_need_an_index():
+    leaf = begin_cell().store_uint(7, 8).end_cell()
+    root = begin_cell().store_ref(leaf).store_ref(leaf).end_cell()
+    for boc in (root.to_boc(has_idx=False, has_cache_bits=True),
+                CellArena.from_cells(root).to_boc(has_idx=False, has_cache_bits=True)):
+        assert not boc[4] & 32
+        assert Cell.one_from_boc(bytes(boc)).bytes_hash() == root.bytes_hash()
+    assert root.to_boc(has_cache_bits=True)[4] & 32
@@ -0,0 +1,101 @@
+import io
+import pickle
+from hashlib import sha256
+
+from tonsdk.boc import BocReader, Cell, CellArena, begin_cell
+
+
+def make_cell():
+    child = begin_cell().store_uint(1, 4).end_cell()
+    return begin_cell().store_uint(5, 8).store_ref(child).end_cell()
+
+
+def test_pickle_cell_with_refs():
+    cell = make_cell()
+    cell_hash = cell.bytes_hash()
+
+    restored = pickle.loads(pickle.dumps(cell))
+    assert restored.bytes_hash() == cell_hash
+    assert len(restored.refs) == 1
+
+    restored.refs.append(begin_cell().end_cell())
+    assert restored.bytes_hash() != cell_hash
+    assert cell.bytes_hash() == cell_hash
+
+
+def test_pickle_parsed_cell():
+    cell = make_cell()
+    restored = pickle.loads(pickle.dumps(Cell.one_from_boc(cell.to_boc())))
+    assert restored.bytes_hash() == cell.bytes_hash()
+
+
+def make_tree_cell(bit_length, *refs):
+    cell = Cell()
+    for i in range(bit_length):
+        cell.bits.write_bit(i % 3 == 0)
+    cell.refs.extend(refs)
+    return cell
+
+
+def make_trees():
+    leaf = make_tree_cell(7)
+    shared = make_tree_cell(9, leaf)
+    return {
+        'empty': make_tree_cell(0),
+        'one_bit': make_tree_cell(1),
+        'full': make_tree_cell(1023),
+        'shared': make_tree_cell(1, shared, make_tree_cell(8, shared, leaf), leaf),
+        'wide': make_tree_cell(3, *[make_tree_cell(i) for i in range(1, 5)]),
+        'deep': make_tree_cell(15, make_tree_cell(16, make_tree_cell(17, make_tree_cell(255, leaf, leaf)))),
+    }
+
+
+# to_boc(has_idx=False) of make_trees() before the linear serializer
+PREVIOUS_BOCS = {
+    'empty': 'b5ee9c724101010100020000004cacb9cd',
+    'one_bit': 'b5ee9c72410101010003000001c08ee9b6b6',
+    'full': 'b5ee9c724101010100820000ff' + '924' * 84 + '9249423948b7',
+    'shared': 'b5ee9c72410104010013000301c00201030202920203010392400300019339d53b47',
+    'wide': 'b5ee9c7241010501001300040190010203040001c00001a000019000019870623a06',
+    'deep': 'b5ee9c724101050100370001039249010104924902010592494003023f' + '924' * 20
+            + '92490404000193224eb374',
+}
+
+
+def test_to_boc_matches_previous_output():
+    for name, cell in make_trees().items():
+        expected = bytes.fromhex(PREVIOUS_BOCS[name])
+        assert bytes(cell.to_boc(False)) == expected
+        # without crc32c: the flag is cleared and the checksum dropped
+        assert bytes(cell.to_boc(False, False)) == expected[:4] + bytes([expected[4] & ~64]) + expected[5:-4]
+        assert Cell.one_from_boc(expected).bytes_hash() == cell.bytes_hash()
+
+
+def test_to_boc_of_deep_tree_matches_previous_output():
+    leaf = make_tree_cell(7)
+    chain = leaf
+    for i in range(60):
+        chain = make_tree_cell(i % 11, chain, make_tree_cell(i % 4))
+    assert sha256(chain.to_boc(False)).hexdigest() == \
+        '5666a4618fe572a19623f3b7698a2d2fb565f31592b69241904fcb8edc79c148'
+
+
+# to_boc() of make_trees() before the standard index: the index holds the size of every cell
+PREVIOUS_INDEXED_BOCS = {
+    'one_bit': 'b5ee9c72c1010101000300030001c044fe8088',
+    'shared': 'b5ee9c72c1010401001300060505030301c00201030202920203010392400300019355d29fa8',
+    'wide': 'b5ee9c72c10105010013000703030303040190010203040001c00001a000019000019899708189',
+    'deep': 'b5ee9c72c1010501003700050506240301039249010104924902010592494003023f' + '924' * 20
+            + '92490404000193540ea9a0',
+}
+
+
+def test_previous_indexes_are_read():
+    trees = make_trees()
+    for name, boc in PREVIOUS_INDEXED_BOCS.items():
+        boc = bytes.fromhex(boc)
+        cell = Cell.one_from_boc(boc)
+        assert cell.bytes_hash() == trees[name].bytes_hash()
+        assert bytes(cell.to_boc(False)) == bytes.fromhex(PREVIOUS_BOCS[name])
+        assert BocReader(io.BytesIO(boc)).root(0).bytes_hash() == cell.bytes_hash()
+        assert CellArena.from_boc(boc).roots()[0].bytes_hash() == cell.bytes_hash()
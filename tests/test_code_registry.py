@@ -0,0 +1,32 @@
+import pytest
+
+from tonsdk.boc import Cell, begin_cell
+from tonsdk.contract import CodeRegistry
+from tonsdk.contract.wallet import WalletV4ContractR2
+
+
+def test_code_cells_are_frozen():
+    registry = CodeRegistry()
+    registry.register('v4r2', WalletV4ContractR2.code)
+    code = registry.code('v4r2')
+    assert code is registry.code('v4r2')
+    assert code.bytes_hash() == Cell.one_from_boc(WalletV4ContractR2.code).bytes_hash()
+
+    with pytest.raises(Exception, match='Frozen'):
+        code.refs.append(begin_cell().end_cell())
+    with pytest.raises(Exception, match='Frozen'):
+        code.refs[0].bits.off(0)
+    with pytest.raises(Exception, match='Frozen'):
+        code.refs = []
+
+    parent = begin_cell().store_ref(code).end_cell()
+    parent.refs.append(begin_cell().end_cell())
+    assert code.bytes_hash() == registry.code_hash('v4r2')
+
+
+def test_unregistered_code_is_bounded():
+    registry = CodeRegistry(max_size=2)
+    bocs = [begin_cell().store_uint(i, 8).end_cell().to_boc() for i in range(4)]
+    cells = [registry.code(bytes(boc)) for boc in bocs]
+    assert registry.code(bytes(bocs[3])) is cells[3]
+    assert registry.code(bytes(bocs[0])) is not cells[0]
@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from tonsdk.boc import Cell, DictBuilder, DictView, begin_cell
+from tonsdk.boc.dict import dict_delete, dict_set, parse_dict, serialize_dict
+from tonsdk.boc.dict.serialize_dict import build_tree, write_edge
+
+
+# root hashes of these dictionaries as serialized before keys were kept as ints
+PREVIOUS_HASHES = {
+    1: '7e8b505b0fec0cd55fa76328105ff931004f54b5db465bd61ab0c8187b896da2',
+    7: '195a95af61dfb82cac6390dff076583af56f057ad107d524d9819bb8cda7a0ca',
+    8: '890ed3a7a344ad896e8a69bdc4a0dbf5fef8d6638de3d69ca3e0bb0c462d61d0',
+    32: '744ea409c6c1f399ac6b612d2c2ecf45bfa83ab42ed08ecc26022a7646f56d0d',
+    64: '45cbebb9b59cc336f2af49b5a2cea5a4f7e94177421677962fc5fdad1ef60b3d',
+    267: '4dbcc4639109f80bca56164b02c2179da9f99604a2702d4d0da5c8bf2c1b3c13',
+}
+
+
+def store_uint32(value, cell):
+    cell.bits.write_uint(value, 32)
+
+
+def random_dict(key_size):
+    rnd = random.Random(key_size)
+    return {rnd.getrandbits(key_size): i for i in range(min(50, 2 ** key_size))}
+
+
+@pytest.mark.parametrize('key_size', sorted(PREVIOUS_HASHES))
+def test_round_trip(key_size):
+    src = random_dict(key_size)
+    root = serialize_dict(src, key_size, store_uint32)
+    assert root.bytes_hash().hex() == PREVIOUS_HASHES[key_size]
+
+    root = Cell.one_from_boc(root.to_boc())
+    assert parse_dict(root, key_size, lambda s: s.read_uint(32)) == src
+
+
+def test_out_of_range_keys():
+    with pytest.raises(Exception):
+        serialize_dict({256: 0}, 8, store_uint32)
+    with pytest.raises(Exception):
+        serialize_dict({-1: 0}, 8, store_uint32)
+
+
+@pytest.mark.parametrize('key_size', [1, 8, 32, 267])
+def test_legacy_tree_helpers_match_serialize_dict(key_size):
+    src = random_dict(key_size)
+    legacy = Cell()
+    write_edge(build_tree(src, key_size), key_size, store_uint32, legacy)
+    assert legacy.bytes_hash() == serialize_dict(src, key_size, store_uint32).bytes_hash()
+
+
+def test_view_lookups():
+    src = random_dict(32)
+    view = DictView(serialize_dict(src, 32, store_uint32), 32, lambda s: s.read_uint(32))
+    assert list(view) == sorted(src)
+    assert len(view) == len(src)
+    for key, value in src.items():
+        assert key in view and view[key] == value
+    missing = next(key for key in range(2 ** 32) if key not in src)
+    assert view.get(missing) is None and missing not in view
+    assert view.get(2 ** 32) is None
+    with pytest.raises(KeyError):
+        view[missing]
+
+
+def test_read_dict_from_slice():
+    src = {1: 10, 5: 50, 255: 2550}
+    root = serialize_dict(src, 8, store_uint32)
+    cell = begin_cell().store_uint(1, 1).store_ref(root).store_uint(0, 1).end_cell()
+    s = cell.begin_parse()
+    view = s.read_dict(8, lambda value: value.read_uint(32))
+    assert dict(view.items()) == src
+    empty = s.read_dict(8)
+    assert not empty and len(empty) == 0 and 1 not in empty
+
+
+def value_cell(value):
+    return begin_cell().store_uint(value, 32).end_cell()
+
+
+@pytest.mark.parametrize('key_size', [8, 32, 267])
+def test_incremental_updates_match_a_rebuild(key_size):
+    rnd = random.Random(key_size)
+    builder = DictBuilder(key_size)
+    items = {}
+    for key, value in random_dict(key_size).items():
+        builder.set(key, value_cell(value))
+        items[key] = value
+    builder.end_dict()
+
+    for step in range(40):
+        if items and rnd.random() < 0.4:
+            key = rnd.choice(sorted(items))
+            builder.delete(key)
+            del items[key]
+        else:
+            key = rnd.choice(sorted(items)) if items and rnd.random() < 0.5 else rnd.getrandbits(key_size)
+            builder.set(key, value_cell(step))
+            items[key] = step
+        if step % 5 == 0:
+            root = builder.end_dict()
+            rebuilt = serialize_dict(items, key_size, store_uint32)
+            assert root.bytes_hash() == rebuilt.bytes_hash()
+
+
+def test_set_and_delete_leave_the_root_unchanged():
+    root = serialize_dict({1: 1, 2: 2, 3: 3}, 8, store_uint32)
+    root_hash = root.bytes_hash()
+    updated = dict_set(root, 8, 4, 4, store_uint32)
+    assert parse_dict(updated, 8, lambda s: s.read_uint(32)) == {1: 1, 2: 2, 3: 3, 4: 4}
+    assert dict_delete(updated, 8, 4).bytes_hash() == root_hash
+    assert dict_delete(root, 8, 200) is root
+    assert root.bytes_hash() == root_hash
+
+    single = dict_set(None, 8, 7, 70, store_uint32)
+    assert dict_delete(single, 8, 7) is None
@@ -0,0 +1,65 @@
+from hashlib import sha256
+
+import pytest
+
+from tonsdk.boc import Cell, CellType, begin_cell, create_library_cell, create_merkle_proof, \
+    create_merkle_update, create_pruned_branch
+
+
+def sample_tree():
+    leaf = begin_cell().store_uint(1, 8).end_cell()
+    return begin_cell().store_uint(0xdeadbeef, 32).store_ref(leaf).end_cell()
+
+
+def test_pruned_branch_hashes():
+    cell = sample_tree()
+    pruned = create_pruned_branch(cell)
+    # d1: exotic, level mask 1; d2: 36 full bytes; data: type, mask, hash, depth
+    data = bytes([CellType.PrunedBranch, 1]) + cell.bytes_hash() + (1).to_bytes(2, 'big')
+    assert pruned.bytes_hash() == sha256(bytes([8 | 32, 72]) + data).digest()
+    assert pruned.bytes_hash().hex() == '468785d692270ff74963b6fd4378f3d9e22310d5aa49508c38f0be1575ce8c62'
+    assert pruned.get_level_mask() == 1
+    assert pruned.get_hash(0) == cell.bytes_hash()
+    assert pruned.get_depth(0) == 1 and pruned.get_depth(3) == 0
+
+    # a parent sees the same level 0 hash through the pruned branch
+    parent = begin_cell().store_ref(cell).end_cell()
+    pruned_parent = begin_cell().store_ref(pruned).end_cell()
+    assert pruned_parent.get_level_mask() == 1
+    assert pruned_parent.get_hash(0) == parent.bytes_hash()
+    assert pruned_parent.bytes_hash() != parent.bytes_hash()
+
+
+def test_library_cell_hash():
+    library = create_library_cell(bytes(range(32)))
+    assert library.bytes_hash() == sha256(bytes([8, 66, CellType.Library]) + bytes(range(32))).digest()
+    assert library.bytes_hash().hex() == '642ec9201a5043d3c0d604ec9e1e64c72c75dbaed3d57828b7d13c5e578bc54d'
+    assert library.get_level_mask() == 0
+    with pytest.raises(Exception):
+        create_library_cell(b'short')
+
+
+def test_merkle_cells_lower_the_level():
+    cell = sample_tree()
+    pruned_parent = begin_cell().store_ref(create_pruned_branch(cell)).end_cell()
+    proof = create_merkle_proof(pruned_parent)
+    assert proof.get_level_mask() == 0
+    update = create_merkle_update(pruned_parent, pruned_parent)
+    assert update.get_level_mask() == 0
+
+
+def test_invalid_exotic_cells_are_rejected():
+    builder = begin_cell().store_uint(CellType.PrunedBranch, 8).store_uint(1, 8)
+    builder.is_exotic = True
+    with pytest.raises(Exception, match='pruned branch'):
+        builder.end_cell().bytes_hash()
+
+
+def test_exotic_cells_round_trip():
+    cell = sample_tree()
+    root = begin_cell().store_ref(create_pruned_branch(cell)).store_ref(create_library_cell(bytes(32))).end_cell()
+    proof = create_merkle_proof(root)
+    read = Cell.one_from_boc(proof.to_boc())
+    assert read.bytes_hash() == proof.bytes_hash()
+    assert read.refs[0].refs[0].is_exotic and read.refs[0].refs[0].get_type() == CellType.PrunedBranch
+    assert bytes(read.to_boc()) == bytes(proof.to_boc())
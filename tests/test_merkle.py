@@ -0,0 +1,81 @@
+import pytest
+
+from tonsdk.boc import Cell, CellType, DictView, begin_cell, build_merkle_proof, verify_merkle_proof
+from tonsdk.boc.dict import dict_set, serialize_dict
+from tonsdk.boc.dict.parse_dict import read_fork, read_label
+
+
+def store_uint32(value, cell):
+    cell.bits.write_uint(value, 32)
+
+
+def account_tree():
+    return serialize_dict({key: key * 10 for key in range(0, 256, 7)}, 8, store_uint32)
+
+
+def path_to(root, key, key_size=8):
+    """The cells on the path from root to the leaf of key."""
+    cells = [root]
+    cell = root
+    key_length = key_size
+    while True:
+        src = cell.begin_parse()
+        _, label_length = read_label(src, key_length)
+        key_length -= label_length
+        if not key_length:
+            return cells
+        left, right = read_fork(src)
+        key_length -= 1
+        cell = right if (key >> key_length) & 1 else left
+        cells.append(cell)
+
+
+def test_proof_round_trip():
+    root = account_tree()
+    proof = build_merkle_proof(root, path_to(root, 70))
+    assert proof.get_type() == CellType.MerkleProof
+    assert len(proof.to_boc()) < len(root.to_boc())
+
+    proven = verify_merkle_proof(proof.to_boc(), root.bytes_hash())
+    assert proven.get_hash(0) == root.bytes_hash()
+    assert DictView(proven, 8, lambda s: s.read_uint(32))[70] == 700
+
+
+def test_proof_with_predicate():
+    root = account_tree()
+    proof = build_merkle_proof(root, lambda path, cell: len(path) <= 1)
+    proven = verify_merkle_proof(proof, root.bytes_hash())
+    assert all(ref.get_type() == CellType.PrunedBranch for child in proven.refs for ref in child.refs)
+
+
+def test_wrong_root_hash_is_rejected():
+    root = account_tree()
+    proof = build_merkle_proof(root, [root])
+    with pytest.raises(Exception, match='does not match'):
+        verify_merkle_proof(proof, bytes(32))
+
+
+def test_tampered_proof_is_rejected():
+    root = account_tree()
+    proof = build_merkle_proof(root, path_to(root, 70))
+    # the same stored hash over a tree with another value at key 70
+    tampered_tree = dict_set(proof.refs[0], 8, 70, 701, store_uint32)
+    builder = begin_cell().store_uint(CellType.MerkleProof, 8)
+    builder.store_bytes(root.bytes_hash()).store_uint(proof.refs[0].get_depth(0), 16).store_ref(tampered_tree)
+    builder.is_exotic = True
+    tampered = builder.end_cell()
+    with pytest.raises(Exception, match='does not match'):
+        verify_merkle_proof(tampered, root.bytes_hash())
+
+    # a valid proof of another tree does not prove root
+    other = serialize_dict({70: 701}, 8, store_uint32)
+    with pytest.raises(Exception, match='does not match'):
+        verify_merkle_proof(build_merkle_proof(other, [other]), root.bytes_hash())
+
+
+def test_proof_must_be_a_merkle_proof():
+    root = account_tree()
+    with pytest.raises(Exception, match='not a Merkle proof'):
+        verify_merkle_proof(root, root.bytes_hash())
+    with pytest.raises(Exception):
+        verify_merkle_proof(Cell.one_from_boc(begin_cell().end_cell().to_boc()), bytes(32))
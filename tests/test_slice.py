@@ -0,0 +1,40 @@
+import pytest
+
+from tonsdk.boc import Cell, begin_cell
+
+
+def test_bits_is_deprecated_but_compatible():
+    s = begin_cell().store_uint(0xabc, 12).end_cell().begin_parse()
+    s.read_uint(4)
+    with pytest.deprecated_call():
+        bits = s.bits
+    assert bits.to01() == '10111100'
+
+    bits[0] = 0  # a copy
+    assert s.preload_uint(8) == 0xbc
+    with pytest.deprecated_call():
+        s.bits = bits[1:]
+    assert len(s) == 7 and s.read_uint(7) == 0x3c
+
+
+# a cell written with the pre-series BitString: a bit, uint5, int7, 3 bytes, an address, a null address,
+# coins, uint71, int45, 5 bits and a string, with a 2 bit ref
+READ_BOC = ('b5ee9c7241010201004400017bd6d807fa0c0083dfd552e63729b472fcbcc8c45ebcc6691702558b68ec7527e1ba403a0f31a8'
+            '10ee6b281e00000000000000002fbfffffffff6ce8c2d2d9010001e073f84a89')
+
+
+def test_reads_match_previous_output():
+    s = Cell.one_from_boc(READ_BOC).begin_parse()
+    assert len(s) == 495
+    assert [s.read_bit(), s.preload_uint(5), s.read_uint(5), s.read_int(7), s.read_bytes(3)] == \
+        [1, 21, 21, -37, b'\x00\xffA']
+    assert s.read_msg_addr().to_string(True, True, True) == 'EQCD39VS5jcptHL8vMjEXrzGaRcCVYto7HUn4bpAOg8xqB2N'
+    assert s.read_msg_addr() is None
+    assert s.read_coins() == 10 ** 9 + 7
+    assert s.read_uint(71) == 2 ** 70 + 5
+    assert s.preload_int(45) == -2 ** 40 - 3  # used to consume the bits
+    assert s.read_int(45) == -2 ** 40 - 3
+    assert s.read_bits(5).to01() == '10110'
+    assert s.read_string() == 'tail'
+    assert s.read_ref().bits.get_top_upped_array().hex() == 'e0'
+    s.end_parse()
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('tvm_valuetypes')
+
+from tonsdk.provider._tonlibjson._async._client import run_batch  # noqa: E402
+
+
+def test_identical_calls_run_once():
+    async def main():
+        ran = []
+
+        async def run_method(address, method, stack_data):
+            ran.append((address, method))
+            await asyncio.sleep(0)
+            return f'{address}.{method}{stack_data}'
+
+        calls = [('a', 'seqno', []), ('b', 'seqno', []), ('a', 'seqno', []),
+                 ('a', 'get', [['num', 1]]), ('b', 'seqno', [])]
+        results = await run_batch(calls, run_method, concurrency=2)
+        assert results == ['a.seqno[]', 'b.seqno[]', 'a.seqno[]', "a.get[['num', 1]]", 'b.seqno[]']
+        assert ran == [('a', 'seqno'), ('b', 'seqno'), ('a', 'get')]
+
+    asyncio.run(main())
+
+
+def test_errors_are_returned_per_call():
+    async def main():
+        async def run_method(address, method, stack_data):
+            if address == 'bad':
+                raise ValueError(address)
+            return address
+
+        results = await run_batch([('good', 'seqno', []), ('bad', 'seqno', []), ('bad', 'seqno', [])],
+                                  run_method, concurrency=10)
+        assert results[0] == 'good'
+        assert isinstance(results[1], ValueError) and results[2] is results[1]
+
+    asyncio.run(main())
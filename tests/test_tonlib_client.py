@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('tvm_valuetypes')
+
+from tonsdk.provider._tonlibjson import AsyncTonlibClient  # noqa: E402
+
+ADDRESS = '0:' + '0' * 64
+RUN_RESULT = {'@type': 'smc.runResult', 'gas_used': 0, 'stack': [], 'exit_code': 0}
+
+
+def make_client(tmp_path, wrapper, **kwargs):
+    client = AsyncTonlibClient({'liteservers': [{}]}, str(tmp_path), asyncio.get_event_loop(),
+                               ls_index=0, **kwargs)
+    client.tonlib_wrapper = wrapper
+    client.loaded_contracts_num = 0
+    return client
+
+
+def contract_handler(run_result=RUN_RESULT):
+    def handler(query):
+        if query['@type'] in ('smc.load', 'withBlock'):
+            return {'@type': 'smc.info', 'id': 1}
+        if query['@type'] == 'smc.runGetMethod':
+            return run_result
+        return {'@type': 'ok'}
+    return handler
+
+
+def test_contract_ids_hold_their_tonlib_instance(tmp_path, fake_wrapper):
+    async def main():
+        old = fake_wrapper(contract_handler(run_result=None))
+        client = make_client(tmp_path, old)
+        task = asyncio.ensure_future(client.raw_run_method(ADDRESS, 'seqno', []))
+        while not old.pending:
+            await asyncio.sleep(0)
+        assert old.holds == 1
+
+        # restarted: the running method still needs the old instance
+        new = fake_wrapper(contract_handler())
+        client.tonlib_wrapper = new
+        client.contracts.clear()
+        old.pending[0].set_result(RUN_RESULT)
+        assert await task == RUN_RESULT
+        await asyncio.sleep(0)
+        assert old.holds == 0
+        assert not new.requests
+
+    asyncio.run(main())
+
+
+def test_failed_loads_release_their_tonlib_instance(tmp_path, fake_wrapper):
+    async def main():
+        wrapper = fake_wrapper(lambda query: {'@type': 'error', 'code': 400, 'message': 'no account'})
+        client = make_client(tmp_path, wrapper)
+        with pytest.raises(Exception, match='smc.load failed'):
+            await client.raw_run_method(ADDRESS, 'seqno', [])
+        assert wrapper.holds == 0
+
+    asyncio.run(main())
+
+
+def test_latest_state_is_loaded_for_each_call(tmp_path, fake_wrapper):
+    async def main():
+        wrapper = fake_wrapper(contract_handler())
+        client = make_client(tmp_path, wrapper)
+        for _ in range(2):
+            assert await client.raw_run_method(ADDRESS, 'seqno', []) == RUN_RESULT
+        await asyncio.sleep(0)
+        assert len(wrapper.sent('smc.load')) == 2
+        assert len(wrapper.sent('smc.forget')) == 2
+
+    asyncio.run(main())
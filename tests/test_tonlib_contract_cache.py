@@ -0,0 +1,55 @@
+from tonsdk.provider._tonlibjson._utils import ContractCache
+
+
+def test_least_recently_used_ids_are_forgotten():
+    cache = ContractCache(max_size=2)
+    for seqno, contract_id in enumerate([1, 2], 100):
+        cache.add(('a', seqno), contract_id, pinned=True)
+        cache.release(('a', seqno), contract_id)
+    assert cache.acquire(('a', 100)) == 1
+    cache.release(('a', 100), 1)
+
+    cache.add(('a', 102), 3, pinned=True)
+    assert cache.drain() == [2]
+    assert cache.acquire(('a', 101)) is None
+    assert len(cache) == 2
+
+
+def test_ids_in_use_are_forgotten_once_released():
+    cache = ContractCache(max_size=1)
+    cache.add(('a', 100), 1, pinned=True)
+    assert cache.acquire(('a', 100)) == 1
+    cache.add(('b', 100), 2, pinned=True)
+    assert cache.drain() == []
+
+    cache.release(('a', 100), 1)
+    assert cache.drain() == []
+    cache.release(('a', 100), 1)
+    assert cache.drain() == [1]
+
+
+def test_latest_state_ids_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('tonsdk.provider._tonlibjson._utils.time.monotonic', lambda: now[0])
+    cache = ContractCache(ttl=5)
+    cache.add(('a', None), 1)
+    cache.release(('a', None), 1)
+    assert cache.acquire(('a', None)) == 1
+    cache.release(('a', None), 1)
+
+    now[0] += 5
+    assert cache.acquire(('a', None)) is None
+    assert cache.drain() == [1]
+
+
+def test_latest_state_ids_are_not_cached_by_default():
+    cache = ContractCache()
+    cache.add(('a', None), 1)
+    assert cache.acquire(('a', None)) is None
+    cache.release(('a', None), 1)
+    assert cache.drain() == [1]
+
+    cache.add(('a', 100), 2, pinned=True)
+    cache.release(('a', 100), 2)
+    assert cache.acquire(('a', 100)) == 2
+    assert cache.drain() == []
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from tonsdk.provider._tonlibjson._async._limiter import RequestLimiter, RequestPriorityEnum
+from tonsdk.provider._tonlibjson._utils import TonLibOverloaded
+
+
+async def wait_queued(limiter, queued):
+    while limiter.queued != queued:
+        await asyncio.sleep(0)
+
+
+def test_slots_go_by_priority():
+    async def main():
+        limiter = RequestLimiter(1)
+        await limiter.acquire()
+        order = []
+
+        async def request(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+            limiter.release()
+
+        tasks = [asyncio.ensure_future(request('low', RequestPriorityEnum.low)),
+                 asyncio.ensure_future(request('normal', RequestPriorityEnum.normal)),
+                 asyncio.ensure_future(request('high', RequestPriorityEnum.high))]
+        await wait_queued(limiter, 3)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        assert order == ['high', 'normal', 'low']
+        assert limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_after_getting_the_slot():
+    async def main():
+        limiter = RequestLimiter(1)
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await wait_queued(limiter, 1)
+        limiter.release()  # hands the slot to waiting
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.in_flight == 0
+        await asyncio.wait_for(limiter.acquire(), 1)
+
+    asyncio.run(main())
+
+
+def test_full_queue_sheds_less_urgent_requests():
+    async def main():
+        limiter = RequestLimiter(1, max_queued=1)
+        await limiter.acquire()
+        low = asyncio.ensure_future(limiter.acquire(RequestPriorityEnum.low))
+        await wait_queued(limiter, 1)
+
+        with pytest.raises(TonLibOverloaded):
+            await limiter.acquire(RequestPriorityEnum.low)
+        high = asyncio.ensure_future(limiter.acquire(RequestPriorityEnum.high))
+        with pytest.raises(TonLibOverloaded):
+            await low
+        limiter.release()
+        await high
+        assert limiter.stats()['shed'] == 2
+
+    asyncio.run(main())
+
+
+def test_no_queue():
+    async def main():
+        limiter = RequestLimiter(1, max_queued=0)
+        await limiter.acquire()
+        with pytest.raises(TonLibOverloaded):
+            await limiter.acquire(RequestPriorityEnum.high)
+        assert limiter.stats()['shed'] == 1
+        limiter.release()
+        await limiter.acquire()
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiters_are_not_shed():
+    async def main():
+        limiter = RequestLimiter(1, max_queued=1)
+        await limiter.acquire()
+        low = asyncio.ensure_future(limiter.acquire(RequestPriorityEnum.low))
+        await wait_queued(limiter, 1)
+        high = asyncio.ensure_future(limiter.acquire(RequestPriorityEnum.high))
+        low.cancel()  # still queued when high arrives
+        with pytest.raises(asyncio.CancelledError):
+            await low
+        assert limiter.queued == 1
+        assert limiter.stats()['shed'] == 0
+        limiter.release()
+        await high
+        assert limiter.in_flight == 1 and limiter.queued == 0
+
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('tvm_valuetypes')
+
+from tonsdk.provider._tonlibjson import AsyncTonlibPool, TonLibWrongResult  # noqa: E402
+
+
+def masterchain_info(seqno):
+    return {'@type': 'blocks.masterchainInfo',
+            'last': {'@type': 'ton.blockIdExt', 'workchain': -1, 'shard': '-9223372036854775808',
+                     'seqno': seqno, 'root_hash': '', 'file_hash': ''}}
+
+
+def make_pool(tmp_path, fake_wrapper, handlers, **kwargs):
+    pool = AsyncTonlibPool({'liteservers': [{}] * len(handlers)}, str(tmp_path),
+                           asyncio.get_event_loop(), **kwargs)
+    for i, handler in enumerate(handlers):
+        pool.clients[i].tonlib_wrapper = fake_wrapper(handler)
+        pool.clients[i].loaded_contracts_num = 0
+        pool._inited[i] = True
+    return pool
+
+
+def test_liteserver_errors_fail_over(tmp_path, fake_wrapper):
+    async def main():
+        pool = make_pool(tmp_path, fake_wrapper, [
+            lambda query: {'@type': 'error', 'code': 500, 'message': 'LITE_SERVER_NETWORK'},
+            lambda query: masterchain_info(10),
+        ])
+        assert (await pool.get_masterchain_info())['last']['seqno'] == 10
+        assert pool._down_until[0] > 0
+        assert not pool._down_until[1]
+
+    asyncio.run(main())
+
+
+def test_timeouts_fail_over(tmp_path, fake_wrapper):
+    async def main():
+        pool = make_pool(tmp_path, fake_wrapper, [
+            lambda query: None,
+            lambda query: masterchain_info(10),
+        ], request_timeout=0.01)
+        assert (await pool.get_masterchain_info())['last']['seqno'] == 10
+        assert pool._down_until[0] > 0
+
+    asyncio.run(main())
+
+
+def test_caller_errors_are_not_retried(tmp_path, fake_wrapper):
+    async def main():
+        not_found = {'@type': 'error', 'code': 400, 'message': 'account not found'}
+        pool = make_pool(tmp_path, fake_wrapper, [lambda query: not_found] * 2)
+        with pytest.raises(TonLibWrongResult, match='smc.load failed'):
+            await pool.raw_run_method('0:' + '0' * 64, 'seqno', [])
+        assert sum(len(client.tonlib_wrapper.requests) for client in pool.clients) == 1
+        assert pool._down_until == [0.0, 0.0]
+
+    asyncio.run(main())
+
+
+def test_sends_are_not_retried(tmp_path, fake_wrapper):
+    async def main():
+        pool = make_pool(tmp_path, fake_wrapper, [
+            lambda query: None,
+            lambda query: {'@type': 'ok'},
+        ], request_timeout=0.01)
+        pool.outstanding[1] = 1  # the first call goes to the stuck liteserver
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.raw_send_message(b'boc')
+        assert not pool.clients[1].tonlib_wrapper.requests
+
+    asyncio.run(main())
+
+
+def liteserver(seqno):
+    def handler(query):
+        if query['@type'] == 'blocks.getMasterchainInfo':
+            return masterchain_info(seqno)
+        if query['@type'] == 'withBlock':
+            if query['id']['seqno'] > seqno:
+                return {'@type': 'error', 'code': 651, 'message': 'LITE_SERVER_NOTREADY'}
+            return {'@type': 'smc.info', 'id': 1}
+        if query['@type'] == 'smc.runGetMethod':
+            return {'@type': 'smc.runResult', 'gas_used': 0, 'stack': [], 'exit_code': 0}
+        return {'@type': 'ok'}
+    return handler
+
+
+def test_batches_run_on_liteservers_having_the_block(tmp_path, fake_wrapper):
+    async def main():
+        pool = make_pool(tmp_path, fake_wrapper, [liteserver(100), liteserver(90), liteserver(101)])
+        calls = [(f'0:{i:064x}', 'seqno', []) for i in range(20)]
+        results = await pool.run_methods_batch(calls)
+        assert all(result['exit_code'] == 0 for result in results)
+
+        loads = [client.tonlib_wrapper.sent('withBlock') for client in pool.clients]
+        assert not loads[1]
+        assert {query['id']['seqno'] for query in loads[0] + loads[2]} == {100}
+        assert pool._down_until == [0.0, 0.0, 0.0]
+
+    asyncio.run(main())
+
+
+def test_lagging_liteservers_are_not_asked_for_newer_blocks(tmp_path, fake_wrapper):
+    async def main():
+        pool = make_pool(tmp_path, fake_wrapper, [liteserver(90), liteserver(100)])
+        pool.outstanding[1] = 1
+        block = masterchain_info(100)['last']
+        result = await pool.raw_run_method('0:' + '0' * 64, 'seqno', [], block=block)
+        assert result['exit_code'] == 0
+        assert not pool.clients[0].tonlib_wrapper.sent('withBlock')
+
+    asyncio.run(main())
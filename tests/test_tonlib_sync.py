@@ -0,0 +1,44 @@
+from collections import deque
+
+import pytest
+
+pytest.importorskip('tvm_valuetypes')
+
+from tonsdk.provider._tonlibjson import SyncTonlibClient  # noqa: E402
+
+
+class FakeSyncWrapper:
+    """Stands for SyncTonLibWrapper, answering queries in order."""
+
+    def __init__(self):
+        self.sent = []
+        self.contracts = set()
+        self._results = deque()
+
+    def send(self, query):
+        self.sent.append(query['@type'])
+        if query['@type'] == 'smc.load':
+            contract_id = len(self.sent)
+            self.contracts.add(contract_id)
+            result = {'@type': 'smc.info', 'id': contract_id}
+        elif query['@type'] == 'smc.forget':
+            self.contracts.remove(query['id'])
+            result = {'@type': 'ok'}
+        else:
+            result = {'@type': 'smc.runResult', 'gas_used': 0, 'stack': [], 'exit_code': 0}
+        self._results.append(dict(result, **{'@extra': query['@extra']}))
+
+    def receive(self, timeout=4):
+        return self._results.popleft() if self._results else None
+
+
+def test_contracts_are_forgotten_once_read():
+    client = SyncTonlibClient({'liteservers': [{}]}, '')
+    client.tonlib_wrapper = wrapper = FakeSyncWrapper()
+    for _ in range(3):
+        query_idx = client.raw_run_method('0:' + '0' * 64, 'seqno', [])
+        assert wrapper.contracts
+        assert client.read_result(query_idx)['exit_code'] == 0
+        assert not wrapper.contracts
+        assert wrapper.receive() is None
+    assert wrapper.sent.count('smc.forget') == 3
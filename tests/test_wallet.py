@@ -0,0 +1,57 @@
+from hashlib import sha256
+
+import pytest
+from nacl.bindings import crypto_sign_seed_keypair
+
+from tonsdk.contract.wallet import WalletV3ContractR2, WalletV4ContractR2
+
+DESTINATION = 'EQCD39VS5jcptHL8vMjEXrzGaRcCVYto7HUn4bpAOg8xqB2N'
+
+# external messages of create_transfer_message(DESTINATION, 10 ** 9 + 7, 7, payload).to_boc(False)
+# as serialized before the linear serializer, at time 1700000000
+PREVIOUS_TRANSFERS = {
+    (WalletV3ContractR2, 'hello'):
+        'b5ee9c724101020100b20001df8801c9f77b9d9b315ffbefae036caa20cc9ce46d9180207dd0598f77aa71d62a473403fa154a'
+        '2424e93eaa5d1c796518d32c8b969c32d14823e1d5fef875bf1c791cdf5464ab20e45b8ff9650098ce00bd0efaf8f6b6333593'
+        'b6274f7e3d1f7f5b38794d4d18bb2a9f89e0000000381c01007a620041efeaa9731b94da397e5e64622f5e63348b812ac5b476'
+        '3a93f0dd201d0798d421dcd65038000000000000000000000000000000000068656c6c6f9ed758d6',
+    (WalletV3ContractR2, b'\x01\x02\x03'):
+        'b5ee9c724101020100ac0001df8801c9f77b9d9b315ffbefae036caa20cc9ce46d9180207dd0598f77aa71d62a473406294a85'
+        '4f0cafd51331a1e0aa5dbc3d35d6de51dcf54393b8bfcc2df90ed7ffadb24d4aa16263fe79ac82968bfea8acda23312ef6f1ec'
+        '04371fadfcebb12518494d4d18bb2a9f89e0000000381c01006e620041efeaa9731b94da397e5e64622f5e63348b812ac5b476'
+        '3a93f0dd201d0798d421dcd6503800000000000000000000000000010203b0a3d1f4',
+    (WalletV4ContractR2, 'hello'):
+        'b5ee9c724101020100b30001e18801a6e287384df85a663c23d2adb7f5cc056922161660017ba1f1bfafb9b31a286c052b652d'
+        '60b0c63199b5a0f6a8b3dc143d9450c8f5c446a6dcc7b035b9589714659628a0b4fda5a27da1350e0528dc7e700bba81ddb030'
+        '4c7bfcc54f32debe58514d4d18bb2a9f89e000000038001c01007a620041efeaa9731b94da397e5e64622f5e63348b812ac5b4'
+        '763a93f0dd201d0798d421dcd65038000000000000000000000000000000000068656c6c6fbf6eaa43',
+    (WalletV4ContractR2, b'\x01\x02\x03'):
+        'b5ee9c724101020100ad0001e18801a6e287384df85a663c23d2adb7f5cc056922161660017ba1f1bfafb9b31a286c0023ba0a'
+        '6668278d06d7483b7c5c22c92d533ed35d30bd17a0eb01a848242b99b31c6099995988f0aa4eea100719936bbaa2125b8ad8e2'
+        '51978520fd2d023570314d4d18bb2a9f89e000000038001c01006e620041efeaa9731b94da397e5e64622f5e63348b812ac5b4'
+        '763a93f0dd201d0798d421dcd6503800000000000000000000000000010203fd59c094',
+}
+
+# sha256 of the same with seqno 0 and no payload, which carries the state init
+PREVIOUS_DEPLOYS = {
+    WalletV3ContractR2: 'f5fdb959d2bbccae41b0e81ac92c9fe200b49f9b50ddf9415491bc53a22dfb23',
+    WalletV4ContractR2: '06747f54003b57539f31fd80cff34ddf912a3df42eb90f4185e91fe96b254344',
+}
+
+
+def make_wallet(wallet_class):
+    public_key, private_key = crypto_sign_seed_keypair(bytes(range(32)))
+    return wallet_class(public_key=public_key, private_key=private_key, wc=0)
+
+
+@pytest.mark.parametrize('wallet_class, payload', list(PREVIOUS_TRANSFERS))
+def test_transfer_matches_previous_output(monkeypatch, wallet_class, payload):
+    monkeypatch.setattr('time.time', lambda: 1700000000)
+    query = make_wallet(wallet_class).create_transfer_message(DESTINATION, 10 ** 9 + 7, 7, payload=payload)
+    assert query['message'].to_boc(False).hex() == PREVIOUS_TRANSFERS[wallet_class, payload]
+
+
+@pytest.mark.parametrize('wallet_class', list(PREVIOUS_DEPLOYS))
+def test_deploy_transfer_matches_previous_output(wallet_class):
+    query = make_wallet(wallet_class).create_transfer_message(DESTINATION, 10 ** 9 + 7, 0)
+    assert sha256(query['message'].to_boc(False)).hexdigest() == PREVIOUS_DEPLOYS[wallet_class]
@@ -1,12 +1,24 @@
-from ._cell import Cell, deserialize_cell_data, parse_boc_header
+from ._cell import Cell, CellType, deserialize_cell_data, parse_boc_header
 from ._builder import Builder, begin_cell
 from ._dict_builder import DictBuilder, begin_dict
+from .dict import DictView, parse_dict
 from ._slice import Slice
+from ._boc import BocWriter, BocReader, iter_boc
+from ._cell_cache import CellCache, enable_cell_interning, disable_cell_interning, intern_cell
+from ._arena import CellArena, ArenaCell
+from ._exotic import create_pruned_branch, create_library_cell, create_merkle_proof, create_merkle_update
+from ._merkle import build_merkle_proof, verify_merkle_proof
 
 __all__ = [
-    'Cell', 'Slice',
+    'Cell', 'CellType', 'Slice',
+    'BocWriter', 'BocReader', 'iter_boc',
+    'CellArena', 'ArenaCell',
+    'CellCache', 'enable_cell_interning', 'disable_cell_interning', 'intern_cell',
+    'create_pruned_branch', 'create_library_cell', 'create_merkle_proof', 'create_merkle_update',
+    'build_merkle_proof', 'verify_merkle_proof',
     'Builder', 'begin_cell',
     'DictBuilder', 'begin_dict',
+    'DictView', 'parse_dict',
     'deserialize_cell_data',
     'parse_boc_header',
 ]
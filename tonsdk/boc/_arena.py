@@ -0,0 +1,287 @@
+import math
+from array import array
+from hashlib import sha256
+from typing import List
+
+from ._bit_string import BitString
+from ._boc import _boc_index, _boc_header
+from ._cell import Cell, _parse_boc_header, _stored_hashes_size
+from ._slice import Slice
+from ..utils import topological_sort, crc32c
+
+
+class CellArena:
+    """A tree of cells stored as columns of numbers instead of Cell objects.
+
+    Cells are numbered in BoC order (every cell before the cells it
+    references). The data of cell i is data[data_offsets[i]:data_offsets[i + 1]]
+    in top-upped form (as in a BoC), holding bit_lengths[i] bits, and its refs
+    are refs[ref_offsets[i]:ref_offsets[i + 1]]. Hashes and depths are computed
+    for the whole arena at once, on first use.
+
+    An arena is read-only: cell(i) and roots() return ArenaCell handles with
+    the read API of Cell, and to_cell() converts a tree back to Cell objects."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.data_offsets = array('Q', [0])
+        self.bit_lengths = array('H')
+        self.ref_offsets = array('Q', [0])
+        self.refs = array('L')
+        self.exotic = bytearray()
+        self.root_list = []
+        self._hashes = None  # 32 bytes per cell
+        self._depths = None
+        self._level_masks = None
+
+    def __len__(self) -> int:
+        return len(self.bit_lengths)
+
+    def __repr__(self):
+        return "<CellArena cells_num: %d, roots_num: %d>" % (len(self), len(self.root_list))
+
+    def _append(self, top_upped: bytes, bit_length: int, refs, is_exotic: bool):
+        self.data += top_upped
+        self.data_offsets.append(len(self.data))
+        self.bit_lengths.append(bit_length)
+        self.refs.extend(refs)
+        self.ref_offsets.append(len(self.refs))
+        self.exotic.append(is_exotic)
+
+    @classmethod
+    def from_boc(cls, serialized_boc) -> "CellArena":
+        """Reads all cells of a BoC without creating Cell objects."""
+        if type(serialized_boc) == str:
+            serialized_boc = bytes.fromhex(serialized_boc)
+
+        data = memoryview(serialized_boc)
+        header = _parse_boc_header(data)
+        cells_num = header['cells_num']
+        size_bytes = header['size_bytes']
+        pos = header['cells_offset']
+        end = pos + header['tot_cells_size']
+
+        arena = cls()
+        for ci in range(cells_num):
+            if end - pos < 2:
+                raise Exception("Not enough bytes to encode cell descriptors")
+            d1, d2 = data[pos], data[pos + 1]
+            pos += 2 + _stored_hashes_size(d1)
+            data_size = (d2 + 1) // 2
+            ref_num = d1 % 8
+            if end - pos < data_size + ref_num * size_bytes:
+                raise Exception("Not enough bytes to encode cell data")
+
+            top_upped = data[pos:pos + data_size]
+            bit_length = data_size * 8
+            if d2 % 2:
+                last_byte = top_upped[-1]
+                if not last_byte & 0x7f:
+                    raise Exception("Incorrect cell data padding")
+                bit_length -= (last_byte & -last_byte).bit_length()
+            pos += data_size
+
+            refs = []
+            for _ in range(ref_num):
+                r = int.from_bytes(data[pos:pos + size_bytes], 'big')
+                pos += size_bytes
+                if r <= ci:
+                    raise Exception("Topological order is broken")
+                if r >= cells_num:
+                    raise Exception("Invalid cell reference")
+                refs.append(r)
+            arena._append(top_upped, bit_length, refs, bool(d1 & 8))
+
+        if pos != end:
+            raise Exception("BoC cells data size mismatch")
+        arena.root_list = list(header['root_list'])
+        return arena
+
+    @classmethod
+    def from_cells(cls, *root_cells: Cell) -> "CellArena":
+        """Copies the trees of root_cells, storing every distinct cell once."""
+        topological_order, cells_index = topological_sort(*root_cells)
+        arena = cls()
+        for (_hash, cell) in topological_order:
+            arena._append(cell.bits.get_top_upped_array(), cell.bits.cursor,
+                          [cells_index[r.bytes_hash()] for r in cell.refs], cell.is_exotic)
+        arena.root_list = [cells_index[c.bytes_hash()] for c in root_cells]
+        return arena
+
+    def cell(self, index: int) -> "ArenaCell":
+        if not 0 <= index < len(self):
+            raise Exception("Invalid cell reference")
+        return ArenaCell(self, index)
+
+    def roots(self) -> List["ArenaCell"]:
+        return [ArenaCell(self, i) for i in self.root_list]
+
+    def _compute_hashes(self):
+        """Computes the representation hash and depth of every cell in a
+        single pass from the last cell to the first."""
+        cells_num = len(self)
+        if any(self.exotic):
+            # levels only come with exotic cells: leave them to Cell
+            cells = self._to_cells(range(cells_num))
+            self._hashes = b''.join(c.bytes_hash() for c in cells)
+            self._depths = array('H', (c.get_max_depth() for c in cells))
+            self._level_masks = bytes(c.get_level_mask() for c in cells)
+            return
+
+        data, data_offsets, bit_lengths = self.data, self.data_offsets, self.bit_lengths
+        refs, ref_offsets = self.refs, self.ref_offsets
+        hashes = [b''] * cells_num
+        depths = array('H', bytes(2 * cells_num))
+        for i in range(cells_num - 1, -1, -1):
+            bit_length = bit_lengths[i]
+            cell_refs = refs[ref_offsets[i]:ref_offsets[i + 1]]
+            repr_array = [
+                bytes((len(cell_refs), (bit_length + 7) // 8 + bit_length // 8)),
+                data[data_offsets[i]:data_offsets[i + 1]],
+            ]
+            depth = 0
+            for r in cell_refs:
+                ref_depth = depths[r]
+                repr_array.append(ref_depth.to_bytes(2, 'big'))
+                if ref_depth >= depth:
+                    depth = ref_depth + 1
+            repr_array += [hashes[r] for r in cell_refs]
+            hashes[i] = sha256(b''.join(repr_array)).digest()
+            depths[i] = depth
+
+        self._hashes = b''.join(hashes)
+        self._depths = depths
+        self._level_masks = bytes(cells_num)
+
+    def bytes_hash(self, index: int) -> bytes:
+        if self._hashes is None:
+            self._compute_hashes()
+        return self._hashes[32 * index:32 * (index + 1)]
+
+    def get_max_depth(self, index: int) -> int:
+        if self._hashes is None:
+            self._compute_hashes()
+        return self._depths[index]
+
+    def _to_cells(self, indexes) -> List[Cell]:
+        """Returns Cell objects for the given cells, building each cell of
+        their trees once. Cells get their hashes from the arena if known."""
+        data, data_offsets, bit_lengths = self.data, self.data_offsets, self.bit_lengths
+        refs, ref_offsets = self.refs, self.ref_offsets
+        needed = set()
+        stack = list(indexes)
+        while stack:
+            i = stack.pop()
+            if i not in needed:
+                needed.add(i)
+                stack.extend(refs[ref_offsets[i]:ref_offsets[i + 1]])
+
+        cells = {}
+        for i in sorted(needed, reverse=True):
+            bits = BitString(bit_lengths[i])
+            bits.set_top_upped_array(bytearray(data[data_offsets[i]:data_offsets[i + 1]]),
+                                     bit_lengths[i] % 8 == 0)
+            cell = Cell._from_parts(bits, [cells[r] for r in refs[ref_offsets[i]:ref_offsets[i + 1]]],
+                                    bool(self.exotic[i]))
+            if self._hashes is not None and not self._level_masks[i]:
+                cell._set_stored_hashes((self.bytes_hash(i),), (self._depths[i],), 0)
+            cells[i] = cell
+        return [cells[i] for i in indexes]
+
+    def to_boc(self, has_idx=True, hash_crc32=True, has_cache_bits=False, flags=0) -> bytearray:
+        """Serializes the arena with its roots, keeping the order of the cells."""
+        cells_num = len(self)
+        if not self.root_list:
+            raise Exception("BoC should have at least one root cell")
+        if any(self.exotic) and self._hashes is None:
+            self._compute_hashes()
+        level_masks = self._level_masks
+
+        data, data_offsets, bit_lengths = self.data, self.data_offsets, self.bit_lengths
+        refs, ref_offsets = self.refs, self.ref_offsets
+        s_bytes = max(math.ceil(cells_num.bit_length() / 8), 1)
+        cells_sizes = [2 + data_offsets[i + 1] - data_offsets[i] + (ref_offsets[i + 1] - ref_offsets[i]) * s_bytes
+                       for i in range(cells_num)]
+        full_size = sum(cells_sizes)
+
+        parents_num = None
+        if has_idx and has_cache_bits:
+            parents_num = [0] * cells_num
+            for r in refs:
+                parents_num[r] += 1
+        index = _boc_index(cells_sizes, parents_num) if has_idx else []
+        ser_arr, offset_bytes = _boc_header(cells_num, self.root_list, full_size, index, s_bytes,
+                                            hash_crc32, has_cache_bits, flags)
+        for offset in index:
+            ser_arr += offset.to_bytes(offset_bytes, 'big')
+
+        for i in range(cells_num):
+            bit_length = bit_lengths[i]
+            ref_start, ref_end = ref_offsets[i], ref_offsets[i + 1]
+            d1 = ref_end - ref_start + self.exotic[i] * 8
+            if level_masks is not None:
+                d1 += level_masks[i] * 32
+            ser_arr.append(d1)
+            ser_arr.append((bit_length + 7) // 8 + bit_length // 8)
+            ser_arr += data[data_offsets[i]:data_offsets[i + 1]]
+            for r in refs[ref_start:ref_end]:
+                ser_arr += r.to_bytes(s_bytes, 'big')
+
+        if hash_crc32:
+            ser_arr += crc32c(ser_arr)
+        return ser_arr
+
+
+class ArenaCell:
+    """Handle of one cell of a CellArena, read like a Cell."""
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena: CellArena, index: int):
+        self.arena = arena
+        self.index = index
+
+    def __repr__(self):
+        return "<ArenaCell index: %d, refs_num: %d, bits: %d>" % (
+            self.index, len(self.refs), self.arena.bit_lengths[self.index])
+
+    def __eq__(self, other):
+        return isinstance(other, ArenaCell) and other.arena is self.arena and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.arena), self.index))
+
+    def _data(self) -> bytes:
+        arena = self.arena
+        return bytes(arena.data[arena.data_offsets[self.index]:arena.data_offsets[self.index + 1]])
+
+    @property
+    def bits(self) -> BitString:
+        """A copy of the cell data."""
+        bits = BitString(self.arena.bit_lengths[self.index])
+        bits.set_top_upped_array(bytearray(self._data()), bits.length % 8 == 0)
+        return bits
+
+    @property
+    def refs(self) -> List["ArenaCell"]:
+        arena = self.arena
+        return [ArenaCell(arena, r) for r in arena.refs[arena.ref_offsets[self.index]:arena.ref_offsets[self.index + 1]]]
+
+    @property
+    def is_exotic(self) -> bool:
+        return bool(self.arena.exotic[self.index])
+
+    def begin_parse(self) -> Slice:
+        return Slice._from_bytes(self._data(), self.arena.bit_lengths[self.index], self.refs)
+
+    def bytes_hash(self) -> bytes:
+        return self.arena.bytes_hash(self.index)
+
+    def get_max_depth(self) -> int:
+        return self.arena.get_max_depth(self.index)
+
+    def to_cell(self) -> Cell:
+        """Returns the tree of this cell as Cell objects."""
+        return self.arena._to_cells([self.index])[0]
+
+    def to_boc(self, has_idx=True, hash_crc32=True, has_cache_bits=False, flags=0) -> bytearray:
+        return self.to_cell().to_boc(has_idx, hash_crc32, has_cache_bits, flags)
@@ -1,22 +1,68 @@
-import copy
 import math
 from typing import Union, Optional
 
 from ..utils._address import Address
 
+# Bumped on every write to a bit string (or cell refs list) that some cached
+# cell hash was computed from. Cells use it to tell whether their cached
+# hashes may still be trusted without revalidation.
+_generation = 0
+
+
+def next_generation() -> int:
+    global _generation
+    _generation += 1
+    return _generation
+
+
+def current_generation() -> int:
+    return _generation
+
 
 class BitString:
+    # True for the bit strings of frozen cells, see _freeze_tree()
+    _frozen = False
+
     def __init__(self, length: int):
         self.array = bytearray(math.ceil(length / 8))
         self.cursor = 0
         self.length = length
+        # incremented on every write, see Cell._update_hashes()
+        self.version = 0
+        # True once a cell hash depends on this bit string
+        self._observed = False
+        # True while array is shared with another BitString, see share()
+        self._shared = False
 
     def __repr__(self):
         return str(self.get_top_upped_array())
 
+    def share(self) -> "BitString":
+        """Returns a BitString with the same contents without copying them.
+        Both strings copy the underlying array on their next write."""
+        other = BitString.__new__(BitString)
+        other.array = self.array
+        other.cursor = self.cursor
+        other.length = self.length
+        other.version = 0
+        other._observed = False
+        other._shared = self._shared = True
+        return other
+
+    def _freeze(self):
+        # every write goes through _unshare() first
+        self._frozen = self._shared = True
+
+    def _unshare(self):
+        if self._frozen:
+            raise Exception("Frozen BitString can not be modified")
+        self.array = bytearray(self.array)
+        self._shared = False
+
     def __iter__(self):
+        array = self.array
         for i in range(self.cursor):
-            yield self.get(i)
+            yield (array[i >> 3] >> (7 - (i & 7))) & 1
 
     def __getitem__(self, key):
         if isinstance(key, slice):
@@ -43,13 +89,25 @@ class BitString:
 
     def off(self, n):
         """Sets next from cursor n bits to 0. Does not move cursor."""
+        global _generation
         self.check_range(n)
+        if self._shared:
+            self._unshare()
         self.array[(n // 8) | 0] &= ~(1 << (7 - (n % 8)))
+        self.version += 1
+        if self._observed:
+            _generation += 1
 
     def on(self, n):
         """Sets next from cursor n bits to 1. Does not move cursor."""
+        global _generation
         self.check_range(n)
+        if self._shared:
+            self._unshare()
         self.array[(n // 8) | 0] |= 1 << (7 - (n % 8))
+        self.version += 1
+        if self._observed:
+            _generation += 1
 
     def check_range(self, n: int) -> None:
         """Throws an exception if the cursor + n is out of range."""
@@ -57,38 +115,36 @@ class BitString:
             raise Exception("BitString overflow")
 
     def set_top_upped_array(self, array: bytearray, fullfilled_bytes=True):
+        if self._frozen:
+            raise Exception("Frozen BitString can not be modified")
         self.length = len(array) * 8
         self.array = array
+        self._shared = False
         self.cursor = self.length
+        self.version += 1
+        if self._observed:
+            next_generation()
 
         if fullfilled_bytes or not self.length:
             return
 
-        else:
-            found_end_bit = False
-            for c in range(7):
-                self.cursor -= 1
-
-                if self.get(self.cursor):
-                    found_end_bit = True
-                    self.off(self.cursor)
-                    break
-
-            if not found_end_bit:
-                raise Exception(
-                    f"Incorrect TopUppedArray {array}, {fullfilled_bytes}")
+        # the completion tag is the lowest set bit of the last byte
+        last_byte = array[-1]
+        if not last_byte & 0x7f:
+            raise Exception(
+                f"Incorrect TopUppedArray {array}, {fullfilled_bytes}")
+        tag_size = (last_byte & -last_byte).bit_length()
+        self.cursor -= tag_size
+        array[-1] = last_byte ^ (1 << (tag_size - 1))
 
     def get_top_upped_array(self) -> bytearray:
-        ret = copy.deepcopy(self)
-        tu = math.ceil(ret.cursor / 8) * 8 - ret.cursor
+        size = math.ceil(self.cursor / 8)
+        ret = self.array[:size]
+        tu = size * 8 - self.cursor
         if tu > 0:
-            tu -= 1
-            ret.write_bit(1)
-            while tu > 0:
-                tu -= 1
-                ret.write_bit(0)
-        ret.array = ret.array[:math.ceil(ret.cursor / 8)]
-        return ret.array
+            # keep the used bits, then the completion tag: a single 1 and zeros
+            ret[-1] = (ret[-1] & (0xff << tu) & 0xff) | (1 << (tu - 1))
+        return ret
 
     def get_free_bits(self) -> int:
         """Returns the number of not used bits in the BitString."""
@@ -97,91 +153,145 @@ class BitString:
     def get_used_bits(self):
         return self.cursor
 
+    def write_bits(self, value: int, bit_length: int):
+        """Writes the lowest bit_length bits of a non-negative int at the cursor
+        as a single big-endian word and moves the cursor."""
+        global _generation
+        if bit_length <= 0:
+            return
+
+        cursor = self.cursor
+        end = cursor + bit_length
+        if end > self.length:
+            raise Exception("BitString overflow")
+
+        if self._shared:
+            self._unshare()
+        start_byte = cursor >> 3
+        end_byte = (end + 7) >> 3
+        pad = (end_byte << 3) - end
+        array = self.array
+        if not cursor & 7 and not pad:
+            array[start_byte:end_byte] = value.to_bytes(end_byte - start_byte, 'big')
+        else:
+            word = int.from_bytes(array[start_byte:end_byte], 'big')
+            mask = ((1 << bit_length) - 1) << pad
+            word = (word & ~mask) | ((value << pad) & mask)
+            array[start_byte:end_byte] = word.to_bytes(end_byte - start_byte, 'big')
+
+        self.cursor = end
+        self.version += 1
+        if self._observed:
+            _generation += 1
+
     def write_bit_array(self, ba: bytearray):
-        """Writes a bytearray as a bit array one bit by one."""
-        for b in ba.decode('utf-8'):
-            self.write_bit(b)
+        """Writes a bytearray of '0' and '1' characters as a bit array."""
+        bits = ba.decode('utf-8')
+        if bits.strip('01'):
+            for b in bits:
+                self.write_bit(b)
+            return
+        if bits:
+            self.write_bits(int(bits, 2), len(bits))
 
     def write_bit(self, b: Union[str, int]):
         b = int(b)
-        if b == 1:
-            self.on(self.cursor)
-        elif b == 0:
-            self.off(self.cursor)
-        else:
+        if b != 0 and b != 1:
             raise Exception("BitString can only write 1 or 0")
-
-        self.cursor += 1
+        self.write_bits(b, 1)
 
     def write_uint(self, number: int, bit_length: int):
-        if bit_length == 0 or len("{0:b}".format(number)) > bit_length:
+        if bit_length == 0 or number.bit_length() > bit_length:
             if number == 0:
                 return
 
             raise Exception(
                 f"bitLength is too small for number, got number={number},bitLength={bit_length}")
+        if number < 0:
+            raise Exception(f"Can't write negative number={number} as uint")
 
-        for i in range(bit_length, 0, -1):
-            k = (2 ** (i - 1))
-            if number // k == 1:
-                self.write_bit(1)
-                number -= k
-            else:
-                self.write_bit(0)
+        self.write_bits(number, bit_length)
 
     def write_uint8(self, ui8: int):
         """Just as write_uint(n, 8), but only write_uint8(n) (?)."""
         self.write_uint(ui8, 8)
 
     def write_int(self, number: int, bit_length: int):
-        if bit_length == 1:
-            if number == -1:
-                self.write_bit(1)
-                return
-
+        if bit_length == 0:
             if number == 0:
-                self.write_bit(0)
                 return
+            raise Exception("Bitlength is too small for number")
 
+        limit = 1 << (bit_length - 1)
+        if not -limit <= number < limit:
             raise Exception("Bitlength is too small for number")
-        else:
-            if number < 0:
-                self.write_bit(1)
-                s = 2 ** (bit_length - 1)
-                self.write_uint(s + number, bit_length - 1)
-            else:
-                self.write_bit(0)
-                self.write_uint(number, bit_length - 1)
+
+        self.write_bits(number & ((limit << 1) - 1), bit_length)
 
     def write_string(self, value: str):
         self.write_bytes(bytes(value, encoding="utf-8"))
 
     def write_bytes(self, ui8_array: bytes):
-        for ui8 in ui8_array:
-            self.write_uint8(ui8)
+        if not isinstance(ui8_array, (bytes, bytearray)):
+            ui8_array = bytes(ui8_array)
+        if not ui8_array:
+            return
+
+        if self.cursor & 7:
+            self.write_bits(int.from_bytes(ui8_array, 'big'), len(ui8_array) * 8)
+            return
+
+        # byte-aligned cursor: plain slice copy
+        global _generation
+        start_byte = self.cursor >> 3
+        end = self.cursor + len(ui8_array) * 8
+        if end > self.length:
+            raise Exception("BitString overflow")
+        if self._shared:
+            self._unshare()
+        self.array[start_byte:start_byte + len(ui8_array)] = ui8_array
+        self.cursor = end
+        self.version += 1
+        if self._observed:
+            _generation += 1
 
     def write_bit_string(self, another_bit_string: "BitString"):
-        for bit in another_bit_string:
-            self.write_bit(bit)
+        used = another_bit_string.cursor
+        if not used:
+            return
+
+        size = (used + 7) >> 3
+        data = another_bit_string.array[:size]
+        if not used & 7:
+            self.write_bytes(data)
+        else:
+            self.write_bits(int.from_bytes(data, 'big') >> ((size << 3) - used), used)
 
     def write_address(self, address: Optional[Address]):
         """Writes an address, maybe zero-address (None) to the BitString."""
         if address is None:
             self.write_uint(0, 2)
         else:
-            self.write_uint(2, 2)
-            self.write_uint(0, 1)  # anycast
-            self.write_int(address.wc, 8)
-            self.write_bytes(address.hash_part)
+            # addr_std$10 anycast:(Maybe Anycast) workchain_id:int8 address:bits256
+            if not -128 <= address.wc < 128:
+                raise Exception("Bitlength is too small for number")
+            hash_part = address.hash_part
+            hash_bits = len(hash_part) * 8
+            self.write_bits(
+                (0b100 << (8 + hash_bits)) | ((address.wc & 0xff) << hash_bits)
+                | int.from_bytes(hash_part, 'big'),
+                3 + 8 + hash_bits)
 
     def write_grams(self, amount: int):
         if amount == 0:
             self.write_uint(0, 4)
         else:
             amount = int(amount)
-            l = math.ceil(len(hex(amount)[2:]) / 2)  # ? [2:] removes 0x
+            if amount < 0:
+                raise Exception(f"Can't write negative amount={amount} as grams")
+            l = (amount.bit_length() + 7) // 8
             self.write_uint(l, 4)
-            self.write_uint(amount, l * 8)
+            self.write_bits(amount, l * 8)
 
     def write_coins(self, amount):
         self.write_grams(amount)
@@ -0,0 +1,288 @@
+import itertools
+import math
+from typing import Iterator, List
+
+from ._cell import Cell, _deserialize_cell, _boc_header_size, _parse_boc_header, _cells_ends, \
+    _stored_hashes_size, _use_stored_hashes
+from ..utils import topological_sort, Crc32c
+
+
+def _boc_index(cells_sizes, parents_num=None) -> List[int]:
+    """BoC index entries: the end offset of every cell, doubled and with a
+    cache flag for the cells with several parents if parents_num is given."""
+    index = list(itertools.accumulate(cells_sizes))
+    if parents_num is not None:
+        index = [offset << 1 | (parents_num[i] > 1) for i, offset in enumerate(index)]
+    return index
+
+
+def _boc_header(cells_num, root_indexes, full_size, index, s_bytes, hash_crc32, has_cache_bits, flags):
+    """Returns the BoC header up to the index and the size of the offsets.
+    Cache bits are only flagged along with an index, as they are stored in
+    it."""
+    offset_bytes = max(math.ceil(max(index + [full_size]).bit_length() / 8), 1)
+    header = bytearray(Cell.REACH_BOC_MAGIC_PREFIX)
+    header.append(bool(index) << 7 | bool(hash_crc32) << 6 | bool(index and has_cache_bits) << 5
+                  | (flags & 3) << 3 | s_bytes)
+    header.append(offset_bytes)
+    header += cells_num.to_bytes(s_bytes, 'big')
+    header += len(root_indexes).to_bytes(s_bytes, 'big')
+    header += (0).to_bytes(s_bytes, 'big')  # Complete BOCs only
+    header += full_size.to_bytes(offset_bytes, 'big')
+    for root_index in root_indexes:
+        header += root_index.to_bytes(s_bytes, 'big')
+    return header, offset_bytes
+
+
+class BocWriter:
+    """Serializes any number of root cells into a single BoC.
+
+    Subtrees shared between roots are stored once. write() streams the BoC
+    to a binary file-like object chunk by chunk, so the serialized cells are
+    never held in memory all at once."""
+
+    def __init__(self, has_idx=True, hash_crc32=True, has_cache_bits=False, flags=0, store_hashes=False):
+        self.has_idx = has_idx
+        self.hash_crc32 = hash_crc32
+        # with cache bits, the index marks the cells referenced more than once
+        self.has_cache_bits = has_cache_bits
+        self.flags = flags
+        # store every cell's hash and depth, so that reading the BoC back
+        # does not need to compute them
+        self.store_hashes = store_hashes
+        self.roots = []
+
+    def add_root(self, cell: Cell) -> "BocWriter":
+        self.roots.append(cell)
+        return self
+
+    def add_roots(self, cells) -> "BocWriter":
+        self.roots.extend(cells)
+        return self
+
+    def iter_chunks(self, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+        """Yields the BoC as consecutive chunks of about chunk_size bytes."""
+        if not self.roots:
+            raise Exception("BoC should have at least one root cell")
+
+        topological_order, cells_index = topological_sort(*self.roots)
+        cells_num = len(topological_order)
+        # Minimal number of bytes to represent reference
+        s_bytes = max(math.ceil(cells_num.bit_length() / 8), 1)
+        cells_sizes = [2 + (cell.bits.cursor + 7) // 8 + len(cell.refs) * s_bytes
+                       for (_hash, cell) in topological_order]
+        if self.store_hashes:
+            # a hash and a depth for level 0 and every level of the cell
+            for i, (_hash, cell) in enumerate(topological_order):
+                cells_sizes[i] += (bin(cell.get_level_mask()).count('1') + 1) * (32 + 2)
+        full_size = sum(cells_sizes)
+
+        parents_num = None
+        if self.has_idx and self.has_cache_bits:
+            parents_num = [0] * cells_num
+            for (_hash, cell) in topological_order:
+                for ref in cell.refs:
+                    parents_num[cells_index[ref.bytes_hash()]] += 1
+        index = _boc_index(cells_sizes, parents_num) if self.has_idx else []
+        root_indexes = [cells_index[root.bytes_hash()] for root in self.roots]
+        chunk, offset_bytes = _boc_header(cells_num, root_indexes, full_size, index, s_bytes,
+                                          self.hash_crc32, self.has_cache_bits, self.flags)
+
+        crc = Crc32c() if self.hash_crc32 else None
+        for offset in index:
+            chunk += offset.to_bytes(offset_bytes, 'big')
+            if len(chunk) >= chunk_size:
+                if crc is not None:
+                    crc.update(chunk)
+                yield bytes(chunk)
+                chunk = bytearray()
+
+        for (_hash, cell) in topological_order:
+            chunk += cell.serialize_for_boc(cells_index, s_bytes, self.store_hashes)
+            if len(chunk) >= chunk_size:
+                if crc is not None:
+                    crc.update(chunk)
+                yield bytes(chunk)
+                chunk = bytearray()
+
+        if crc is not None:
+            crc.update(chunk)
+            chunk += crc.digest()
+        if chunk:
+            yield bytes(chunk)
+
+    def write(self, fp, chunk_size: int = 1 << 16) -> int:
+        """Writes the BoC to the binary file-like object fp and returns the
+        number of bytes written."""
+        written = 0
+        for chunk in self.iter_chunks(chunk_size):
+            fp.write(chunk)
+            written += len(chunk)
+        return written
+
+    def to_bytes(self) -> bytearray:
+        ser_arr = bytearray()
+        for chunk in self.iter_chunks():
+            ser_arr += chunk
+        return ser_arr
+
+
+class BocReader:
+    """Reads the root cells of a BoC one by one.
+
+    Cells are only built when a root (or cell(i)) needs them. While iterating,
+    cells which no remaining root can reference are dropped, so replaying an
+    archive of many messages does not keep all of its cells in memory.
+    source is a bytes-like object, a hex string or a binary file-like object.
+    From a seekable file only the header and index are read up front (and the
+    whole file streamed once to check its crc32c); each cell is then read
+    from the file when it is built. Other file-like objects are read whole.
+    Hashes stored in the BoC are checked against the cell data, or used as
+    they are if trust_stored_hashes is set, see deserialize_boc()."""
+
+    def __init__(self, source, check_hashes=False, trust_stored_hashes=False):
+        self._fp = None
+        if type(source) == str:
+            source = bytes.fromhex(source)
+        elif hasattr(source, 'read'):
+            if hasattr(source, 'seekable') and source.seekable():
+                self._fp = source
+            else:
+                source = source.read()
+
+        self.check_hashes = check_hashes
+        self.trust_stored_hashes = trust_stored_hashes
+        if self._fp is None:
+            self._data = memoryview(source)
+            self._size = len(self._data)
+            self.header = _parse_boc_header(self._data)
+        else:
+            self._base = source.tell()
+            self._size = source.seek(0, 2) - self._base
+            header_data = b''
+            while True:
+                header_size = min(_boc_header_size(header_data), self._size)
+                if header_size <= len(header_data):
+                    break
+                header_data = self._read(0, header_size)
+            self.header = _parse_boc_header(header_data, self._size)
+            if self.header['hash_crc32']:
+                self._check_crc32c()
+        self._cells_offset = self.header['cells_offset']
+        self._cells_starts = self._read_cells_starts()
+        self._cells = {}  # index -> built cell
+
+    def __len__(self) -> int:
+        return self.header['roots_num']
+
+    def _read(self, pos: int, size: int):
+        """Returns size bytes of the BoC starting at pos."""
+        if self._fp is None:
+            data = self._data[pos:pos + size]
+        else:
+            self._fp.seek(self._base + pos)
+            data = self._fp.read(size)
+        if len(data) != size:
+            raise Exception("Not enough bytes for cells data")
+        return data
+
+    def _check_crc32c(self, chunk_size=1 << 16):
+        crc = Crc32c()
+        end = self._size - 4
+        for pos in range(0, end, chunk_size):
+            crc.update(self._read(pos, min(chunk_size, end - pos)))
+        if crc.digest() != bytes(self._read(end, 4)):
+            raise Exception("Crc32c hashsum mismatch")
+
+    def _read_cells_starts(self) -> List[int]:
+        """Start offset of every cell relative to the cells data."""
+        cells_num = self.header['cells_num']
+        cells_ends = _cells_ends(self.header)
+        if cells_ends is not None:
+            return [0] + cells_ends[:-1]
+
+        # no index: only decode the descriptors to find the cells
+        size_bytes = self.header['size_bytes']
+        starts = []
+        pos = self._cells_offset
+        end = pos + self.header['tot_cells_size']
+        for _ in range(cells_num):
+            if end - pos < 2:
+                raise Exception("Not enough bytes to encode cell descriptors")
+            starts.append(pos - self._cells_offset)
+            d1, d2 = self._read(pos, 2)
+            pos += 2 + _stored_hashes_size(d1) + (d2 + 1) // 2 + (d1 % 8) * size_bytes
+        if pos != end:
+            raise Exception("BoC cells data size mismatch")
+        return starts
+
+    def _cell_data(self, index: int):
+        """The serialized cell number index."""
+        starts = self._cells_starts
+        start = starts[index]
+        end = starts[index + 1] if index + 1 < len(starts) else self.header['tot_cells_size']
+        return self._read(self._cells_offset + start, end - start)
+
+    def cell(self, index: int) -> Cell:
+        """Returns cell number index with all of its references, parsing
+        only the cells of its subtree that are not built yet."""
+        cells_num = self.header['cells_num']
+        if not 0 <= index < cells_num:
+            raise Exception("Invalid cell reference")
+
+        cells = self._cells
+        if index in cells:
+            return cells[index]
+
+        size_bytes = self.header['size_bytes']
+        # (index, None) before the cell is parsed, then
+        # (index, (cell, refs indexes, descriptor hashes)) once its refs are pushed
+        stack = [(index, None)]
+        while stack:
+            ci, refs = stack.pop()
+            if refs is None:
+                if ci in cells:
+                    continue
+                data = self._cell_data(ci)
+                cell, refs, pos, stored = _deserialize_cell(data, 0, size_bytes)
+                if pos != len(data):
+                    raise Exception("BoC index does not match cells data")
+                for r in refs:
+                    if r <= ci:
+                        raise Exception("Topological order is broken")
+                    if r >= cells_num:
+                        raise Exception("Invalid cell reference")
+                stack.append((ci, (cell, refs, stored)))
+                for r in refs:
+                    if r not in cells:
+                        stack.append((r, None))
+                continue
+            cell, refs, stored = refs
+            cell.refs = [cells[r] for r in refs]
+            if self.check_hashes or stored[1] is not None:
+                _use_stored_hashes(cell, stored, self.check_hashes, self.trust_stored_hashes)
+            cells[ci] = cell
+
+        return cells[index]
+
+    def root(self, i: int) -> Cell:
+        return self.cell(self.header['root_list'][i])
+
+    def __iter__(self) -> Iterator[Cell]:
+        root_list = self.header['root_list']
+        # cells are only referenced by cells with a smaller index: once no
+        # remaining root is below index i, cells below i can be dropped
+        floors = list(root_list)
+        for i in range(len(floors) - 2, -1, -1):
+            floors[i] = min(floors[i], floors[i + 1])
+
+        for root_index, floor in zip(root_list, floors):
+            cells = self._cells
+            if cells and min(cells) < floor:
+                self._cells = {ci: cell for ci, cell in cells.items() if ci >= floor}
+            yield self.cell(root_index)
+
+
+def iter_boc(source, check_hashes=False, trust_stored_hashes=False) -> Iterator[Cell]:
+    """Yields the root cells of a BoC, see BocReader."""
+    return iter(BocReader(source, check_hashes, trust_stored_hashes))
@@ -75,9 +75,9 @@ class Builder:
         return self
 
     def end_cell(self):
-        cell = Cell()
-        cell.write_cell(self)
-        return cell
+        """Returns a cell with the builder's data. The bit buffer is shared
+        copy-on-write, so the builder can keep being used afterwards."""
+        return Cell._from_parts(self.bits.share(), self.refs, self.is_exotic)
 
 
 def begin_cell():
@@ -1,29 +1,329 @@
-import copy
+import itertools
 import math
 from hashlib import sha256
 
-from ._bit_string import BitString
-from ..utils import concat_bytes, tree_walk, crc32c, read_n_bytes_uint_from_array, compare_bytes
+from ._bit_string import BitString, next_generation, current_generation
+from ._cell_cache import get_cell_cache
+from ..utils import concat_bytes, topological_sort, crc32c
+
+
+class CellType:
+    """Cell types: an exotic cell stores its type in the first byte of its data."""
+    Ordinary = -1
+    PrunedBranch = 1
+    Library = 2
+    MerkleProof = 3
+    MerkleUpdate = 4
+
+
+def _hash_index(level_mask, level):
+    """Index of the hash of the given level among the hashes of a cell with
+    level_mask: a cell only has distinct hashes for the levels in its mask."""
+    return bin(level_mask & ((1 << level) - 1)).count('1')
+
+
+class RefList(list):
+    """List of cell references which invalidates cached cell hashes
+    whenever it is modified."""
+    __slots__ = ('_observed',)
+
+    def __init__(self, values=()):
+        super().__init__(values)
+        # True once a cell hash depends on this list
+        self._observed = False
+
+    def __reduce__(self):
+        # items go through __init__: extend() must not run before _observed is set
+        return type(self), (list(self),), (None, {'_observed': self._observed})
+
+    def _touch(self):
+        if self._observed:
+            next_generation()
+
+    def append(self, value):
+        self._touch()
+        super().append(value)
+
+    def extend(self, values):
+        self._touch()
+        super().extend(values)
+
+    def insert(self, index, value):
+        self._touch()
+        super().insert(index, value)
+
+    def pop(self, index=-1):
+        self._touch()
+        return super().pop(index)
+
+    def remove(self, value):
+        self._touch()
+        super().remove(value)
+
+    def clear(self):
+        self._touch()
+        super().clear()
+
+    def reverse(self):
+        self._touch()
+        super().reverse()
+
+    def sort(self, *args, **kwargs):
+        self._touch()
+        super().sort(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        self._touch()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._touch()
+        super().__delitem__(key)
+
+    def __iadd__(self, values):
+        self._touch()
+        return super().__iadd__(values)
+
+    def __imul__(self, n):
+        self._touch()
+        return super().__imul__(n)
+
+
+class _FrozenRefList(RefList):
+    """References of a frozen cell, see _freeze_tree()."""
+    __slots__ = ()
+
+    def _touch(self):
+        raise Exception("Frozen cell can not be modified")
 
 
 class Cell:
     REACH_BOC_MAGIC_PREFIX = bytes.fromhex('B5EE9C72')
     LEAN_BOC_MAGIC_PREFIX = bytes.fromhex('68ff65f3')
     LEAN_BOC_MAGIC_PREFIX_CRC = bytes.fromhex('acc3a728')
+    # True for the cells of a tree shared read-only, see _freeze_tree()
+    _frozen = False
 
     def __init__(self):
+        # (generation, key, hashes, depths, level mask), see _hashes()
+        self._hashes_cache = None
         self.bits = BitString(1023)
         self.refs = []
         self.is_exotic = False
 
+    @classmethod
+    def _from_parts(cls, bits: BitString, refs, is_exotic=False):
+        """Creates a cell around an existing bit string without copying it."""
+        cell = cls.__new__(cls)
+        cell._bits = bits
+        cell._refs = RefList(refs)
+        cell._is_exotic = is_exotic
+        cell._hashes_cache = None
+        return cell
+
     def __repr__(self):
         return "<Cell refs_num: %d, %s>" % (len(self.refs), repr(self.bits))
 
     def __bool__(self):
         return bool(self.bits.cursor) or bool(self.refs)
 
+    @property
+    def bits(self) -> BitString:
+        return self._bits
+
+    @bits.setter
+    def bits(self, value: BitString):
+        if self._hashes_cache is not None:
+            if self._frozen:
+                raise Exception("Frozen cell can not be modified")
+            next_generation()
+        self._bits = value
+
+    @property
+    def refs(self) -> RefList:
+        return self._refs
+
+    @refs.setter
+    def refs(self, value):
+        if self._hashes_cache is not None:
+            if self._frozen:
+                raise Exception("Frozen cell can not be modified")
+            next_generation()
+        self._refs = value if isinstance(value, RefList) else RefList(value)
+
+    @property
+    def is_exotic(self):
+        return self._is_exotic
+
+    @is_exotic.setter
+    def is_exotic(self, value):
+        if self._hashes_cache is not None:
+            if self._frozen:
+                raise Exception("Frozen cell can not be modified")
+            next_generation()
+        self._is_exotic = value
+
+    def _hashes(self):
+        """Returns (hashes, depths, level mask) of the cell, with one hash and
+        one depth for level 0 and for every level in the mask.
+
+        Values are cached per cell and computed bottom-up in a single pass
+        over the stale part of the tree. A cached value is reused as-is while
+        no bit string or refs list that some cached hash depends on has been
+        written since it was validated (writes to cells that were never hashed,
+        e.g. while building new ones, do not count); otherwise it is
+        revalidated against the cell's data and the children's hashes, and
+        sha256 is only recomputed for cells that actually changed.
+        """
+        generation = current_generation()
+        cache = self._hashes_cache
+        if cache is not None and cache[0] == generation:
+            return cache[2:]
+
+        stack = [(self, False)]
+        while stack:
+            cell, children_ready = stack.pop()
+            cache = cell._hashes_cache
+            if cache is not None and cache[0] == generation:
+                continue
+            if not children_ready:
+                stack.append((cell, True))
+                for r in cell.refs:
+                    stack.append((r, False))
+                continue
+            cell._update_hashes(generation)
+
+        return self._hashes_cache[2:]
+
+    def _hashes_key(self, refs_cache):
+        """What the cached hashes were computed from: while it is unchanged,
+        they are still valid."""
+        bits = self.bits
+        # from now on writes to them have to invalidate cached hashes
+        bits._observed = True
+        self._refs._observed = True
+        return (bits, bits.version, bits.cursor, self.is_exotic,
+                tuple(c[2] for c in refs_cache))
+
+    def _set_stored_hashes(self, hashes, depths, level_mask):
+        """Uses hashes stored in a BoC instead of computing them. The hashes
+        of the references have to be known already."""
+        generation = current_generation()
+        for r in self.refs:
+            r._hashes()
+        key = self._hashes_key([r._hashes_cache for r in self.refs])
+        self._hashes_cache = (generation, key, tuple(hashes), tuple(depths), level_mask)
+
+    def _exotic_level_mask(self, refs_cache):
+        """Checks the data of an exotic cell against its type and returns
+        (type, level mask, (hashes, depths) stored in a pruned branch)."""
+        cell_type = self.get_type()
+        bits_num = self.bits.cursor
+        data = self.bits.array
+        refs_num = len(refs_cache)
+
+        if cell_type == CellType.PrunedBranch:
+            level_mask = data[1] if bits_num >= 16 else 0
+            hash_count = bin(level_mask).count('1')
+            if refs_num or not 1 <= level_mask <= 7 or bits_num != 16 + hash_count * (256 + 16):
+                raise Exception("Invalid pruned branch cell")
+            pos = 2 + 32 * hash_count
+            hashes = [bytes(data[2 + 32 * i:2 + 32 * (i + 1)]) for i in range(hash_count)]
+            depths = [int.from_bytes(data[pos + 2 * i:pos + 2 * (i + 1)], 'big') for i in range(hash_count)]
+            return cell_type, level_mask, (hashes, depths)
+
+        if cell_type == CellType.Library:
+            if refs_num or bits_num != 8 + 256:
+                raise Exception("Invalid library cell")
+            return cell_type, 0, None
+
+        if cell_type == CellType.MerkleProof:
+            if refs_num != 1 or bits_num != 8 + 256 + 16:
+                raise Exception("Invalid Merkle proof cell")
+            _check_merkle_ref(data, 1, 33, refs_cache[0])
+            return cell_type, refs_cache[0][4] >> 1, None
+
+        if cell_type == CellType.MerkleUpdate:
+            if refs_num != 2 or bits_num != 8 + 2 * 256 + 2 * 16:
+                raise Exception("Invalid Merkle update cell")
+            _check_merkle_ref(data, 1, 65, refs_cache[0])
+            _check_merkle_ref(data, 33, 67, refs_cache[1])
+            return cell_type, (refs_cache[0][4] | refs_cache[1][4]) >> 1, None
+
+        raise Exception(f"Unknown exotic cell type {cell_type}")
+
+    def _update_hashes(self, generation):
+        refs_cache = [r._hashes_cache for r in self.refs]
+        key = self._hashes_key(refs_cache)
+        cache = self._hashes_cache
+        if cache is not None and cache[1] == key:
+            self._hashes_cache = (generation,) + cache[1:]
+            return
+
+        pruned = None
+        if self.is_exotic:
+            cell_type, level_mask, pruned = self._exotic_level_mask(refs_cache)
+        else:
+            cell_type = CellType.Ordinary
+            level_mask = 0
+            for c in refs_cache:
+                level_mask |= c[4]
+            if not level_mask:
+                # the usual case: a single level 0 hash
+                repr_array = [
+                    bytes([len(refs_cache)]),
+                    self.get_bits_descriptor(),
+                    self.bits.get_top_upped_array(),
+                ]
+                repr_array += [c[3][0].to_bytes(2, 'big') for c in refs_cache]
+                repr_array += [c[2][0] for c in refs_cache]
+                depth = max((c[3][0] for c in refs_cache), default=-1) + 1
+                self._hashes_cache = (generation, key, (sha256(b''.join(repr_array)).digest(),), (depth,), 0)
+                return
+
+        if pruned is not None:
+            # the lower level hashes are the ones stored in the branch,
+            # only the top level is computed from the cell itself
+            levels = [level_mask.bit_length()]
+        else:
+            levels = [0] + [i + 1 for i in range(3) if level_mask >> i & 1]
+        # Merkle proofs and updates use the hashes of their children one
+        # level higher, which is what removes the level added by the proof
+        child_shift = cell_type in (CellType.MerkleProof, CellType.MerkleUpdate)
+        d1 = len(self.refs) + self.is_exotic * 8
+        d2 = self.get_bits_descriptor()
+
+        hashes, depths = [], []
+        for level in levels:
+            child_level = level + child_shift
+            child_indexes = [_hash_index(c[4], child_level) for c in refs_cache]
+            repr_array = [
+                bytes([d1 + (level_mask & ((1 << level) - 1)) * 32]),
+                d2,
+                # higher levels hash the previous level's hash instead of the data
+                hashes[-1] if hashes else self.bits.get_top_upped_array(),
+            ]
+            repr_array += [c[3][i].to_bytes(2, 'big') for c, i in zip(refs_cache, child_indexes)]
+            repr_array += [c[2][i] for c, i in zip(refs_cache, child_indexes)]
+            hashes.append(sha256(b''.join(repr_array)).digest())
+            depths.append(max((c[3][i] for c, i in zip(refs_cache, child_indexes)), default=-1) + 1)
+
+        if pruned is not None:
+            hashes = pruned[0] + hashes
+            depths = pruned[1] + depths
+        self._hashes_cache = (generation, key, tuple(hashes), tuple(depths), level_mask)
+
     def bytes_hash(self):
-        return sha256(self.bytes_repr()).digest()
+        """Representation hash of the cell, that is its hash of level 3."""
+        return self._hashes()[0][-1]
+
+    def get_hash(self, level=3) -> bytes:
+        hashes, _, level_mask = self._hashes()
+        return hashes[_hash_index(level_mask, level)]
+
+    def get_depth(self, level=3) -> int:
+        _, depths, level_mask = self._hashes()
+        return depths[_hash_index(level_mask, level)]
 
     def bytes_repr(self):
         repr_array = list()
@@ -58,117 +358,74 @@ class Cell:
 
     def get_refs_descriptor(self):
         d1 = bytearray([0])
-        d1[0] = len(self.refs) + self.is_exotic * 8 + self.get_max_level() * 32
+        d1[0] = len(self.refs) + self.is_exotic * 8 + self.get_level_mask() * 32
         return d1
 
+    def get_type(self) -> int:
+        """CellType.Ordinary, or the type of an exotic cell."""
+        if not self.is_exotic:
+            return CellType.Ordinary
+        if self.bits.cursor < 8:
+            raise Exception("Exotic cell should have at least 8 bits of data")
+        return self.bits.array[0]
+
+    def get_level_mask(self) -> int:
+        return self._hashes()[2]
+
     def get_max_level(self):
-        if self.is_exotic:
-            raise NotImplementedError("Calculating max level for exotic cells is not implemented")
-        max_level = 0
-        for r in self.refs:
-            r_max_level = r.get_max_level()
-            if r_max_level > max_level:
-                max_level = r_max_level
-        return max_level
+        return self._hashes()[2].bit_length()
 
     def get_max_depth_as_array(self):
         max_depth = self.get_max_depth()
         return bytearray([max_depth // 256, max_depth % 256])
 
     def get_max_depth(self):
-        max_depth = 0
-        if len(self.refs) > 0:
-            for r in self.refs:
-                r_max_depth = r.get_max_depth()
-                if r_max_depth > max_depth:
-                    max_depth = r_max_depth
-            max_depth += 1
-        return max_depth
+        return self._hashes()[1][-1]
 
     def tree_walk(self):
-        return tree_walk(self, [], {})
+        return topological_sort(self)
 
     def is_explicitly_stored_hashes(self):
         return 0
 
-    def serialize_for_boc(self, cells_index, ref_size):
+    def serialize_for_boc(self, cells_index, ref_size, with_hashes=False):
         repr_arr = []
 
-        repr_arr.append(self.get_data_with_descriptors())
-        if self.is_explicitly_stored_hashes():
-            raise NotImplementedError("Cell hashes explicit storing is not implemented")
+        if with_hashes or self.is_explicitly_stored_hashes():
+            d1 = self.get_refs_descriptor()
+            d1[0] |= 16
+            repr_arr.append(d1)
+            repr_arr.append(self.get_bits_descriptor())
+            hashes, depths, _ = self._hashes()
+            repr_arr += hashes
+            repr_arr += [depth.to_bytes(2, 'big') for depth in depths]
+            repr_arr.append(self.bits.get_top_upped_array())
+        else:
+            repr_arr.append(self.get_data_with_descriptors())
 
         for ref in self.refs:
             ref_hash = ref.bytes_hash()
             ref_index_int = cells_index[ref_hash]
-            ref_index_hex = format(ref_index_int, 'x')
-            if len(ref_index_hex) % 2:
-                ref_index_hex = '0' + ref_index_hex
-            reference = bytes.fromhex(ref_index_hex)
-            repr_arr.append(reference)
+            repr_arr.append(ref_index_int.to_bytes(ref_size, 'big'))
 
-        x = b''
-        for data in repr_arr:
-            x = concat_bytes(x, data)
-
-        return x
+        return b''.join(repr_arr)
 
     def boc_serialization_size(self, cells_index, ref_size):
         return len(self.serialize_for_boc(cells_index, ref_size))
 
-    def to_boc(self, has_idx=True, hash_crc32=True, has_cache_bits=False, flags=0):
-        root_cell = copy.deepcopy(self)
-
-        all_cells = root_cell.tree_walk()
-        topological_order = all_cells[0]
-        cells_index = all_cells[1]
-
-        cells_num = len(topological_order)
-        # Minimal number of bits to represent reference (unused?)
-        s = len("{0:b}".format(cells_num))
-        s_bytes = max(math.ceil(s / 8), 1)
-        full_size = 0
-        cell_sizes = {}
-        for (_hash, subcell) in topological_order:
-            cell_sizes[_hash] = subcell.boc_serialization_size(cells_index, s_bytes)
-            full_size += cell_sizes[_hash]
-
-        offset_bits = len("{0:b}".format(full_size))
-        offset_bytes = max(math.ceil(offset_bits / 8), 1)
-
-        serialization = BitString(
-            (1023 + 32 * 4 + 32 * 3) * len(topological_order))
-        serialization.write_bytes(Cell.REACH_BOC_MAGIC_PREFIX)
-        settings = bytes(''.join(['1' if i else '0' for i in [
-                         has_idx, hash_crc32, has_cache_bits]]), 'utf-8')
-        serialization.write_bit_array(settings)
-        serialization.write_uint(flags, 2)
-        serialization.write_uint(s_bytes, 3)
-        serialization.write_uint8(offset_bytes)
-        serialization.write_uint(cells_num, s_bytes * 8)
-        serialization.write_uint(1, s_bytes * 8)  # One root for now
-        serialization.write_uint(0, s_bytes * 8)  # Complete BOCs only
-        serialization.write_uint(full_size, offset_bytes * 8)
-        serialization.write_uint(0, s_bytes * 8)  # Root shoulh have index 0
-
-        if has_idx:
-            for (_hash, subcell) in topological_order:
-                serialization.write_uint(cell_sizes[_hash], offset_bytes * 8)
-
-        for cell_info in topological_order:
-            ref_cell_ser = cell_info[1].serialize_for_boc(cells_index, s_bytes)
-            serialization.write_bytes(ref_cell_ser)
-
-        ser_arr = serialization.get_top_upped_array()
-        if hash_crc32:
-            ser_arr += crc32c(ser_arr)
-
-        return ser_arr
+    def to_boc(self, has_idx=True, hash_crc32=True, has_cache_bits=False, flags=0, store_hashes=False):
+        from ._boc import BocWriter
+        return BocWriter(has_idx, hash_crc32, has_cache_bits, flags, store_hashes).add_root(self).to_bytes()
 
     def begin_parse(self):
         from ._slice import Slice
         return Slice(self)
 
+    @staticmethod
+    def from_boc(serialized_boc):
+        """Returns all root cells of a BoC."""
+        return deserialize_boc(serialized_boc)
+
     @staticmethod
     def one_from_boc(serialized_boc):
         cells = deserialize_boc(serialized_boc)
@@ -179,122 +436,195 @@ class Cell:
         return cells[0]
 
 
-def deserialize_cell_data(cell_data, reference_index_size):
-    if len(cell_data) < 2:
+def _freeze_tree(cell: Cell) -> Cell:
+    """Makes a cell tree read-only, to be shared between its users: any
+    later write to its bits, refs or type raises an exception."""
+    cell.bytes_hash()
+    stack = [cell]
+    while stack:
+        c = stack.pop()
+        if c._frozen:
+            continue
+        c.bits._freeze()
+        c._refs = _FrozenRefList(c._refs)
+        c._frozen = True
+        stack.extend(c.refs)
+    return cell
+
+
+def _check_merkle_ref(data, hash_pos, depth_pos, ref_cache):
+    """Checks the level 0 hash and depth of a Merkle proof or update
+    reference against the ones stored at data[hash_pos] and data[depth_pos]."""
+    if bytes(data[hash_pos:hash_pos + 32]) != ref_cache[2][0] \
+            or int.from_bytes(data[depth_pos:depth_pos + 2], 'big') != ref_cache[3][0]:
+        raise Exception("Merkle cell hash does not match its reference")
+
+
+def _stored_hashes_size(d1):
+    """Size of the hashes and depths stored after the descriptors of a cell
+    with refs descriptor d1: one 32 byte hash and one 2 byte depth for
+    every level of the cell's level mask, plus level 0."""
+    if not d1 & 16:
+        return 0
+    return (bin(d1 >> 5).count('1') + 1) * (32 + 2)
+
+
+def _deserialize_cell(data, pos, reference_index_size):
+    """Reads one cell starting at data[pos].
+
+    Returns the cell, the indexes of its references, the position right
+    after the cell and (level mask, hashes, depths) read from the cell's
+    descriptors, without hashes and depths if none were stored. Only the
+    cell's own data bytes are copied."""
+    if len(data) - pos < 2:
         raise Exception("Not enough bytes to encode cell descriptors")
 
-    d1, d2 = cell_data[0], cell_data[1]
-    cell_data = cell_data[2:]
-    level = math.floor(d1 / 32)
-    is_exotic = d1 & 8
+    d1, d2 = data[pos], data[pos + 1]
+    pos += 2
+    is_exotic = bool(d1 & 8)
     ref_num = d1 % 8
-    data_bytes_size = math.ceil(d2 / 2)
+    data_bytes_size = (d2 + 1) // 2
     fullfilled_bytes = not (d2 % 2)
 
-    cell = Cell()
-    cell.is_exotic = is_exotic
-
-    if len(cell_data) < data_bytes_size + reference_index_size * ref_num:
+    stored = (d1 >> 5, None, None)
+    hashes_size = _stored_hashes_size(d1)
+    if hashes_size:
+        if len(data) - pos < hashes_size:
+            raise Exception("Not enough bytes to encode cell hashes")
+        hash_count = hashes_size // (32 + 2)
+        hashes = [bytes(data[pos + 32 * i:pos + 32 * (i + 1)]) for i in range(hash_count)]
+        pos += 32 * hash_count
+        depths = [int.from_bytes(data[pos + 2 * i:pos + 2 * (i + 1)], 'big') for i in range(hash_count)]
+        pos += 2 * hash_count
+        stored = (d1 >> 5, hashes, depths)
+
+    if len(data) - pos < data_bytes_size + reference_index_size * ref_num:
         raise Exception("Not enough bytes to encode cell data")
 
+    cell = Cell()
+    cell.is_exotic = is_exotic
     cell.bits.set_top_upped_array(
-        bytearray(cell_data[:data_bytes_size]), fullfilled_bytes)
-    cell_data = cell_data[data_bytes_size:]
+        bytearray(data[pos:pos + data_bytes_size]), fullfilled_bytes)
+    pos += data_bytes_size
+
+    refs = []
     for r in range(ref_num):
-        cell.refs.append(read_n_bytes_uint_from_array(
-            reference_index_size, cell_data))
-        cell_data = cell_data[reference_index_size:]
+        refs.append(int.from_bytes(data[pos:pos + reference_index_size], 'big'))
+        pos += reference_index_size
+
+    return cell, refs, pos, stored
+
+
+def deserialize_cell_data(cell_data, reference_index_size):
+    cell, refs, pos, _ = _deserialize_cell(cell_data, 0, reference_index_size)
+    cell.refs.extend(refs)
 
     return {
         "cell": cell,
-        "residue": cell_data
+        "residue": cell_data[pos:]
     }
 
 
-def parse_boc_header(serialized_boc):
-    if len(serialized_boc) < 4 + 1:
+def _boc_header_size(data):
+    """Size of the BOC header (up to the cells data) whose first bytes are
+    data, or a lower bound of it if data is too short to tell: reading that
+    many bytes and calling again eventually gives the exact size."""
+    if len(data) < 4 + 1 + 1:
+        return 4 + 1 + 1
+    size_bytes = data[4] if bytes(data[:4]) != Cell.REACH_BOC_MAGIC_PREFIX else data[4] % 8
+    offset_bytes = data[5]
+    size = 4 + 1 + 1 + 3 * size_bytes + offset_bytes
+    if len(data) < size:
+        return size
+    cells_num = int.from_bytes(data[6:6 + size_bytes], 'big')
+    roots_num = int.from_bytes(data[6 + size_bytes:6 + 2 * size_bytes], 'big')
+    has_idx = bytes(data[:4]) != Cell.REACH_BOC_MAGIC_PREFIX or data[4] & 128
+    return size + roots_num * size_bytes + (cells_num * offset_bytes if has_idx else 0)
+
+
+def _parse_boc_header(data, boc_size=None):
+    """Parses the BOC header of a bytes-like object without copying it.
+
+    Same result as parse_boc_header(), except that instead of 'cells_data'
+    it holds 'cells_offset': the position of the first cell in data.
+    If boc_size is given, data only has to hold the header of a BoC of
+    boc_size bytes, and its crc32c is left for the caller to check."""
+    if boc_size is None:
+        boc_size = len(data)
+    if len(data) < 4 + 1:
         raise Exception("Not enough bytes for magic prefix")
 
-    input_data = serialized_boc
-    prefix = serialized_boc[:4]
-    serialized_boc = serialized_boc[4:]
-    if compare_bytes(prefix, Cell.REACH_BOC_MAGIC_PREFIX):
-        flags_byte = serialized_boc[0]
+    prefix = bytes(data[:4])
+    if prefix == Cell.REACH_BOC_MAGIC_PREFIX:
+        flags_byte = data[4]
         has_idx = flags_byte & 128
         hash_crc32 = flags_byte & 64
         has_cache_bits = flags_byte & 32
         flags = (flags_byte & 16) * 2 + (flags_byte & 8)
         size_bytes = flags_byte % 8
-
-    if compare_bytes(prefix, Cell.LEAN_BOC_MAGIC_PREFIX):
+    elif prefix == Cell.LEAN_BOC_MAGIC_PREFIX:
         has_idx = 1
         hash_crc32 = 0
         has_cache_bits = 0
         flags = 0
-        size_bytes = serialized_boc[0]
-
-    if compare_bytes(prefix, Cell.LEAN_BOC_MAGIC_PREFIX_CRC):
+        size_bytes = data[4]
+    elif prefix == Cell.LEAN_BOC_MAGIC_PREFIX_CRC:
         has_idx = 1
         hash_crc32 = 1
         has_cache_bits = 0
         flags = 0
-        size_bytes = serialized_boc[0]
+        size_bytes = data[4]
+    else:
+        raise Exception("Unknown BoC magic prefix")
 
-    serialized_boc = serialized_boc[1:]
-
-    if len(serialized_boc) < 1 + 5 * size_bytes:
+    pos = 5
+    if len(data) - pos < 1 + 5 * size_bytes:
         raise Exception("Not enough bytes for encoding cells counters")
 
-    offset_bytes = serialized_boc[0]
-    serialized_boc = serialized_boc[1:]
-    cells_num = read_n_bytes_uint_from_array(
-        size_bytes, serialized_boc)
-    serialized_boc = serialized_boc[size_bytes:]
-    roots_num = read_n_bytes_uint_from_array(
-        size_bytes, serialized_boc)
-    serialized_boc = serialized_boc[size_bytes:]
-    absent_num = read_n_bytes_uint_from_array(
-        size_bytes, serialized_boc)
-    serialized_boc = serialized_boc[size_bytes:]
-    tot_cells_size = read_n_bytes_uint_from_array(
-        offset_bytes, serialized_boc)
-    serialized_boc = serialized_boc[offset_bytes:]
-
-    if len(serialized_boc) < roots_num * size_bytes:
+    offset_bytes = data[pos]
+    pos += 1
+
+    def read_uint(size):
+        nonlocal pos
+        value = int.from_bytes(data[pos:pos + size], 'big')
+        pos += size
+        return value
+
+    cells_num = read_uint(size_bytes)
+    roots_num = read_uint(size_bytes)
+    absent_num = read_uint(size_bytes)
+    tot_cells_size = read_uint(offset_bytes)
+
+    if len(data) - pos < roots_num * size_bytes:
         raise Exception("Not enough bytes for encoding root cells hashes")
 
     root_list = []
     for c in range(roots_num):
-        root_list.append(read_n_bytes_uint_from_array(
-            size_bytes, serialized_boc))
-        serialized_boc = serialized_boc[size_bytes:]
+        root_list.append(read_uint(size_bytes))
 
     index = False
     if has_idx:
         index = []
-        if len(serialized_boc) < offset_bytes * cells_num:
+        if len(data) - pos < offset_bytes * cells_num:
             raise Exception("Not enough bytes for index encoding")
         for c in range(cells_num):
-            index.append(read_n_bytes_uint_from_array(
-                offset_bytes, serialized_boc))
-            serialized_boc = serialized_boc[offset_bytes:]
+            index.append(read_uint(offset_bytes))
 
-    if len(serialized_boc) < tot_cells_size:
+    if boc_size - pos < tot_cells_size:
         raise Exception("Not enough bytes for cells data")
-    cells_data = serialized_boc[:tot_cells_size]
-    serialized_boc = serialized_boc[tot_cells_size:]
+    cells_offset = pos
+    pos += tot_cells_size
 
     if hash_crc32:
-        if len(serialized_boc) < 4:
+        if boc_size - pos < 4:
             raise Exception("Not enough bytes for crc32c hashsum")
 
-        length = len(input_data)
-        if not compare_bytes(crc32c(input_data[:length-4]), serialized_boc[:4]):
+        if boc_size == len(data) and crc32c(data[:pos]) != bytes(data[pos:pos + 4]):
             raise Exception("Crc32c hashsum mismatch")
 
-        serialized_boc = serialized_boc[4:]
+        pos += 4
 
-    if len(serialized_boc):
+    if boc_size - pos:
         raise Exception("Too much bytes in BoC serialization")
 
     return {
@@ -310,33 +640,104 @@ def parse_boc_header(serialized_boc):
         'tot_cells_size': tot_cells_size,
         'root_list': root_list,
         'index': index,
-        'cells_data': cells_data,
+        'cells_offset': cells_offset,
     }
 
 
-def deserialize_boc(serialized_boc):
+def parse_boc_header(serialized_boc):
+    header = _parse_boc_header(memoryview(serialized_boc))
+    cells_offset = header.pop('cells_offset')
+    header['cells_data'] = serialized_boc[cells_offset:cells_offset + header['tot_cells_size']]
+    return header
+
+
+def _cells_ends(header):
+    """Returns the end offset of every cell (relative to the cells data)
+    taken from the BOC index, or None if there is no usable index.
+
+    Standard BOCs store cumulative end offsets (doubled, plus a cache flag
+    if the BoC has cache bits), while BOCs written by older versions of
+    Cell.to_boc() store the size of each cell; both are accepted."""
+    index = header['index']
+    if not index:
+        return None
+
+    tot_cells_size = header['tot_cells_size']
+    candidates = [index]
+    if header['has_cache_bits']:
+        candidates.insert(0, [offset >> 1 for offset in index])
+    for offsets in candidates:
+        if offsets[-1] == tot_cells_size and all(a < b for a, b in zip(offsets, offsets[1:])):
+            return offsets
+        if sum(offsets) == tot_cells_size:
+            return list(itertools.accumulate(offsets))
+    raise Exception("BoC index does not match cells data")
+
+
+def _use_stored_hashes(cell, stored, check_hashes, trust_stored_hashes=False):
+    """Compares the hashes and depths stored for the cell in the BoC, and
+    its level mask, with the computed ones. If trust_stored_hashes is set
+    (and check_hashes is not), the stored hashes are given to the cell
+    instead, without computing them."""
+    level_mask, hashes, depths = stored
+    if trust_stored_hashes and not check_hashes:
+        if hashes is not None:
+            cell._set_stored_hashes(hashes, depths, level_mask)
+        return
+    computed = cell._hashes()
+    if computed[2] != level_mask:
+        raise Exception("Cell level mask does not match cell data")
+    if hashes is not None and computed[:2] != (tuple(hashes), tuple(depths)):
+        raise Exception("Stored cell hash does not match cell data")
+
+
+def deserialize_boc(serialized_boc, check_hashes=False, trust_stored_hashes=False):
+    """Returns the root cells of a BoC. Hashes stored in the BoC are checked
+    against the cell data; with check_hashes, the hashes and level masks of
+    all cells are. trust_stored_hashes uses the stored hashes as they are,
+    which is only safe for BoCs written by the caller itself. If cell
+    interning is enabled, the cells are interned, see enable_cell_interning(),
+    except for the trees of a BoC whose stored hashes were trusted."""
     if type(serialized_boc) == str:
         serialized_boc = bytes.fromhex(serialized_boc)
 
-    header = parse_boc_header(serialized_boc)
-    cells_data = header['cells_data']
-    cells_array = []
-
-    for ci in range(header["cells_num"]):
-        dd = deserialize_cell_data(cells_data, header["size_bytes"])
-        cells_data = dd["residue"]
-        cells_array.append(dd["cell"])
+    data = memoryview(serialized_boc)
+    header = _parse_boc_header(data)
+    cells_num = header["cells_num"]
+    size_bytes = header["size_bytes"]
+    pos = header['cells_offset']
+    cells_ends = _cells_ends(header)
 
-    for ci in reversed(range(header["cells_num"])):
-        c = cells_array[ci]
-        for ri in range(len(c.refs)):
-            r = c.refs[ri]
-            if (r < ci):
+    cells_array = []
+    refs_array = []
+    stored_array = []
+    for ci in range(cells_num):
+        cell, refs, pos, stored = _deserialize_cell(data, pos, size_bytes)
+        if cells_ends is not None and pos - header['cells_offset'] != cells_ends[ci]:
+            raise Exception("BoC index does not match cells data")
+        cells_array.append(cell)
+        refs_array.append(refs)
+        stored_array.append(stored)
+
+    for ci in reversed(range(cells_num)):
+        refs = refs_array[ci]
+        for r in refs:
+            if r <= ci:
                 raise Exception("Topological order is broken")
-            c.refs[ri] = cells_array[r]
+            if r >= cells_num:
+                raise Exception("Invalid cell reference")
+        cells_array[ci].refs = [cells_array[r] for r in refs]
+        if check_hashes or stored_array[ci][1] is not None:
+            _use_stored_hashes(cells_array[ci], stored_array[ci], check_hashes, trust_stored_hashes)
 
     root_cells = []
     for ri in header["root_list"]:
         root_cells.append(cells_array[ri])
 
+    cell_cache = get_cell_cache()
+    # a forged stored hash must not make it into the cache
+    trusted = trust_stored_hashes and not check_hashes and any(
+        stored[1] is not None for stored in stored_array)
+    if cell_cache is not None and not trusted:
+        root_cells = [cell_cache.intern(c) for c in root_cells]
     return root_cells
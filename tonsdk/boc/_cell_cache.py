@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class CellCache:
+    """Interning table of cells keyed by representation hash.
+
+    intern() returns the one cell object kept for a given structure, so
+    identical trees share their cells and cached hashes, and a BoC writer
+    meets shared subtrees as the very same objects. At most max_size cells
+    are kept, the least recently used ones are dropped first.
+
+    Interned cells are shared between all of their users, so they are
+    frozen: modifying them raises an exception."""
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cells = OrderedDict()  # hash -> cell
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __contains__(self, cell_hash: bytes) -> bool:
+        return cell_hash in self._cells
+
+    def get(self, cell_hash: bytes):
+        """Returns the interned cell with cell_hash, or None."""
+        with self._lock:
+            cell = self._cells.get(cell_hash)
+            if cell is not None:
+                self._cells.move_to_end(cell_hash)
+            return cell
+
+    def _add(self, cell_hash: bytes, cell):
+        with self._lock:
+            self._cells[cell_hash] = cell
+            while len(self._cells) > self.max_size:
+                self._cells.popitem(last=False)
+
+    def intern(self, cell):
+        """Returns the interned cell equal to cell. If there is none yet,
+        cell is frozen and interned itself, after its references are."""
+        # _cell imports this module
+        from ._cell import RefList, _freeze_tree
+
+        cached = self.get(cell.bytes_hash())
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        # (cell, refs interned) in post-order
+        stack = [(cell, False)]
+        while stack:
+            c, refs_done = stack.pop()
+            if not refs_done:
+                stack.append((c, True))
+                for r in c.refs:
+                    if r.bytes_hash() not in self._cells:
+                        stack.append((r, False))
+                continue
+            if c.bytes_hash() in self._cells:
+                continue  # met twice in the tree
+
+            refs = [self.get(r.bytes_hash()) for r in c.refs]
+            if any(canonical is not r for canonical, r in zip(refs, c.refs)):
+                # same hashes: the cached hashes of c stay valid, so the refs
+                # are replaced without invalidating them, in a list of c's own
+                c._refs = RefList(r if canonical is None else canonical
+                                  for canonical, r in zip(refs, c.refs))
+            _freeze_tree(c)
+            self.misses += 1
+            self._add(c.bytes_hash(), c)
+
+        return cell
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+
+
+_cell_cache: Optional[CellCache] = None
+
+
+def get_cell_cache() -> Optional[CellCache]:
+    """Returns the process-wide cell cache, None unless interning is enabled."""
+    return _cell_cache
+
+
+def enable_cell_interning(max_size: int = 100000) -> CellCache:
+    """Makes every cell tree read from a BoC interned in a process-wide
+    CellCache of max_size cells, and returns it."""
+    global _cell_cache
+    _cell_cache = CellCache(max_size)
+    return _cell_cache
+
+
+def disable_cell_interning():
+    global _cell_cache
+    _cell_cache = None
+
+
+def intern_cell(cell):
+    """Interns cell in the process-wide cache, if interning is enabled."""
+    cache = _cell_cache
+    return cache.intern(cell) if cache is not None else cell
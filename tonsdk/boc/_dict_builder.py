@@ -1,43 +1,77 @@
-from .dict import serialize_dict
+from .dict import serialize_dict, dict_set, dict_delete
 from ._cell import Cell
 
+
+def _write_value(src, dest):
+    dest.write_cell(src)
+
+
 class DictBuilder:
     def __init__(self, key_size: int):
         self.key_size = key_size
         self.items = {}
         self.ended = False
+        # root built by the last end_dict() and the keys changed since then
+        self._root = None
+        self._changed = set()
 
-    def store_cell(self, index, value: Cell):
-        assert self.ended is False, 'Already ended'
+    @staticmethod
+    def _index(index):
         if type(index) == bytes:
             index = int(index.hex(), 16)
 
         assert type(index) == int, 'Invalid index type'
+        return index
+
+    def store_cell(self, index, value: Cell):
+        index = self._index(index)
         assert not (index in self.items), f'Item {index} already exist'
-        self.items[index] = value
-        return self
+        return self.set(index, value)
 
     def store_ref(self, index, value: Cell):
-        assert self.ended is False, 'Already ended'
-
         cell = Cell()
         cell.refs.append(value)
         self.store_cell(index, cell)
         return self
 
+    def set(self, index, value: Cell):
+        """Stores value at index, replacing the previous value if any."""
+        index = self._index(index)
+        self.items[index] = value
+        self._changed.add(index)
+        return self
+
+    def delete(self, index):
+        """Removes index from the dictionary."""
+        index = self._index(index)
+        del self.items[index]
+        self._changed.add(index)
+        return self
+
     def end_dict(self) -> Cell:
-        assert self.ended is False, 'Already ended'
+        """Returns the dictionary root cell.
+
+        The builder can keep being updated afterwards. The next end_dict()
+        only rebuilds the cells on the paths to the changed keys and shares
+        the rest of the tree with the previous root."""
         self.ended = True
         if not self.items:
+            self._root = None
+            self._changed.clear()
             return Cell()  # ?
 
-        def default_serializer(src, dest):
-            dest.write_cell(src)
-
-        return serialize_dict(self.items, self.key_size, default_serializer)
+        if self._root is None:
+            self._root = serialize_dict(self.items, self.key_size, _write_value)
+        else:
+            for index in sorted(self._changed):
+                if index in self.items:
+                    self._root = dict_set(self._root, self.key_size, index, self.items[index], _write_value)
+                else:
+                    self._root = dict_delete(self._root, self.key_size, index)
+        self._changed.clear()
+        return self._root
 
     def end_cell(self) -> Cell:
-        assert self.ended is False, 'Already ended'
         assert self.items, 'Dict is empty'
         return self.end_dict()
 
@@ -0,0 +1,52 @@
+from typing import Optional
+
+from ._builder import begin_cell
+from ._cell import Cell, CellType
+
+
+def _exotic_cell(builder) -> Cell:
+    builder.is_exotic = True
+    cell = builder.end_cell()
+    cell.bytes_hash()  # checks the cell data
+    return cell
+
+
+def create_pruned_branch(cell: Cell, level: Optional[int] = None) -> Cell:
+    """Returns a pruned branch standing for cell: it has the same hashes as
+    cell below level (by default one above the level of cell), without any
+    of its data."""
+    level_mask = cell.get_level_mask()
+    if level is None:
+        level = level_mask.bit_length() + 1
+    if not level_mask.bit_length() < level <= 3:
+        raise Exception(f"Pruned branch level should be in range ({level_mask.bit_length()}, 3]")
+
+    builder = begin_cell().store_uint(CellType.PrunedBranch, 8).store_uint(level_mask | 1 << (level - 1), 8)
+    levels = [0] + [i + 1 for i in range(level_mask.bit_length()) if level_mask >> i & 1]
+    for i in levels:
+        builder.store_bytes(cell.get_hash(i))
+    for i in levels:
+        builder.store_uint(cell.get_depth(i), 16)
+    return _exotic_cell(builder)
+
+
+def create_library_cell(code_hash: bytes) -> Cell:
+    """Returns a library cell referencing the library cell with code_hash."""
+    if len(code_hash) != 32:
+        raise Exception("Library cell hash should be 32 bytes long")
+    return _exotic_cell(begin_cell().store_uint(CellType.Library, 8).store_bytes(code_hash))
+
+
+def create_merkle_proof(cell: Cell) -> Cell:
+    """Returns a Merkle proof of cell, usually a tree with pruned branches."""
+    builder = begin_cell().store_uint(CellType.MerkleProof, 8)
+    builder.store_bytes(cell.get_hash(0)).store_uint(cell.get_depth(0), 16)
+    return _exotic_cell(builder.store_ref(cell))
+
+
+def create_merkle_update(old: Cell, new: Cell) -> Cell:
+    """Returns a Merkle update from the old to the new tree."""
+    builder = begin_cell().store_uint(CellType.MerkleUpdate, 8)
+    builder.store_bytes(old.get_hash(0)).store_bytes(new.get_hash(0))
+    builder.store_uint(old.get_depth(0), 16).store_uint(new.get_depth(0), 16)
+    return _exotic_cell(builder.store_ref(old).store_ref(new))
@@ -0,0 +1,78 @@
+from typing import Callable, Collection, Tuple, Union
+
+from ._cell import Cell, CellType, deserialize_boc
+from ._exotic import create_pruned_branch, create_merkle_proof
+
+
+def _prune(root: Cell, is_kept: Callable[[Tuple[int, ...], Cell], bool]) -> Cell:
+    """Copies the tree of root, replacing the cells that are not kept by
+    pruned branches. Subtrees left whole are shared with the original tree."""
+    results = []
+    # (cell, path from the root, number of Merkle cells above, refs pushed)
+    stack = [(root, (), 0, False)]
+    while stack:
+        cell, path, merkle_depth, expanded = stack.pop()
+        if expanded:
+            refs_num = len(cell.refs)
+            refs = results[len(results) - refs_num:]
+            del results[len(results) - refs_num:]
+            if all(new is old for new, old in zip(refs, cell.refs)):
+                results.append(cell)
+            else:
+                results.append(Cell._from_parts(cell.bits.share(), refs, cell.is_exotic))
+            continue
+
+        if cell.get_type() == CellType.PrunedBranch:
+            results.append(cell)
+            continue
+        if path and not is_kept(path, cell):
+            results.append(create_pruned_branch(cell, merkle_depth + 1))
+            continue
+
+        stack.append((cell, path, merkle_depth, True))
+        if cell.get_type() in (CellType.MerkleProof, CellType.MerkleUpdate):
+            merkle_depth += 1
+        for i in reversed(range(len(cell.refs))):
+            stack.append((cell.refs[i], path + (i,), merkle_depth, False))
+
+    return results[0]
+
+
+def build_merkle_proof(root: Cell, keep: Union[Collection, Callable[[Tuple[int, ...], Cell], bool]]) -> Cell:
+    """Returns a Merkle proof of root which only holds the cells to keep;
+    every other cell is replaced by a pruned branch of its hashes.
+
+    keep is either the cells (or their hashes) that were visited, or a
+    predicate keep(path, cell) where path holds the ref indexes leading to
+    cell from root. A cell is only kept if its parent is. root always is."""
+    if callable(keep):
+        is_kept = keep
+    else:
+        hashes = {c if isinstance(c, (bytes, bytearray)) else c.bytes_hash() for c in keep}
+
+        def is_kept(path, cell):
+            return cell.bytes_hash() in hashes
+
+    return create_merkle_proof(_prune(root, is_kept))
+
+
+def verify_merkle_proof(proof: Union[Cell, bytes], expected_hash: bytes) -> Cell:
+    """Checks that proof is a Merkle proof of a tree with expected_hash and
+    returns that tree, in which the cells left out are pruned branches.
+
+    Only the cells present in the proof are hashed. proof can be a BoC, whose
+    stored hashes are then checked too; hashes stored in a BoC that was
+    loaded with trust_stored_hashes are trusted as they are."""
+    if not isinstance(proof, Cell):
+        cells = deserialize_boc(proof, check_hashes=True)
+        if len(cells) != 1:
+            raise Exception("Expected 1 root cell")
+        proof = cells[0]
+
+    if proof.get_type() != CellType.MerkleProof:
+        raise Exception("Cell is not a Merkle proof")
+    # checks the hash stored in the proof against the proven tree
+    proof.get_level_mask()
+    if bytes(proof.bits.array[1:33]) != bytes(expected_hash):
+        raise Exception("Merkle proof hash does not match the expected hash")
+    return proof.refs[0]
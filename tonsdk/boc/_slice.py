@@ -1,85 +1,156 @@
 import bitarray
+import warnings
 from typing import Optional
 
 from ._cell import Cell
+from .dict import DictView
 from ..utils._address import Address
 
 
 class Slice:
-    """Slice like an analog of slice in FunC. Used only for reading."""
+    """Slice like an analog of slice in FunC. Used only for reading.
+
+    Keeps an immutable snapshot of the cell data (as bytes and as one int)
+    and an integer bit cursor, so reads never move the remaining bits and
+    clone() is free."""
     def __init__(self, cell: Cell):
-        self.bits = bitarray.bitarray()
-        self.bits.frombytes(cell.bits.array)
-        self.bits = self.bits[:cell.bits.cursor]
+        self._data = bytes(memoryview(cell.bits.array)[:(cell.bits.cursor + 7) // 8])
+        self._word = int.from_bytes(self._data, 'big')
+        self._word_bits = len(self._data) * 8
+        self._offset = 0
+        self._end = cell.bits.cursor
         self.refs = cell.refs
         self.ref_offset = 0
 
+    @classmethod
+    def _from_bytes(cls, data: bytes, bit_length: int, refs) -> "Slice":
+        """Creates a slice over the first bit_length bits of data."""
+        s = cls.__new__(cls)
+        s._data = data
+        s._word = int.from_bytes(data, 'big')
+        s._word_bits = len(data) * 8
+        s._offset = 0
+        s._end = bit_length
+        s.refs = refs
+        s.ref_offset = 0
+        return s
+
     def __len__(self):
-        return len(self.bits)
+        return self._end - self._offset
 
     def __repr__(self):
-        return hex(int(self.bits.to01(), 2))[2:].upper()
+        return hex(self._preload(len(self)))[2:].upper()
+
+    @property
+    def bits(self) -> bitarray.bitarray:
+        """Deprecated: a copy of the remaining bits of the slice. Changing
+        it does not change the slice anymore, assign it back to do so; use
+        preload_bits(len(slice)) instead."""
+        warnings.warn("Slice.bits is deprecated and returns a copy, use preload_bits(len(slice))",
+                      DeprecationWarning, stacklevel=2)
+        return self.preload_bits(len(self))
+
+    @bits.setter
+    def bits(self, value: bitarray.bitarray):
+        warnings.warn("Setting Slice.bits is deprecated", DeprecationWarning, stacklevel=2)
+        padded = bitarray.bitarray(value)
+        padded.fill()
+        self._data = padded.tobytes()
+        self._word = int.from_bytes(self._data, 'big')
+        self._word_bits = len(self._data) * 8
+        self._offset = 0
+        self._end = len(value)
+
+    def clone(self) -> "Slice":
+        """Returns an independent slice at the same position without copying the data."""
+        clone = Slice.__new__(Slice)
+        clone._data = self._data
+        clone._word = self._word
+        clone._word_bits = self._word_bits
+        clone._offset = self._offset
+        clone._end = self._end
+        clone.refs = self.refs
+        clone.ref_offset = self.ref_offset
+        return clone
 
     def is_empty(self) -> bool:
-        return len(self.bits) == 0
+        return self._offset == self._end
 
     def end_parse(self):
         """Throws an exception if the slice is not empty."""
         if not self.is_empty() or self.ref_offset != len(self.refs):
             raise Exception("Slice is not empty.")
 
+    def _check_bits(self, bit_count: int):
+        if bit_count < 0 or self._offset + bit_count > self._end:
+            raise Exception(f"Not enough bits in the slice to read {bit_count}, {len(self)} left.")
+
+    def _preload(self, bit_length: int) -> int:
+        """Returns next bit_length bits as an unsigned int. Does not move the cursor."""
+        offset = self._offset
+        end = offset + bit_length
+        if bit_length <= 0 or end > self._end:
+            self._check_bits(bit_length)
+            return 0
+        return (self._word >> (self._word_bits - end)) & ((1 << bit_length) - 1)
+
     def read_bit(self) -> int:
         """Reads single bit from the slice."""
-        bit = self.bits[0]
-        del self.bits[0]
+        bit = self._preload(1)
+        self._offset += 1
         return bit
 
     def preload_bit(self) -> int:
-        return self.bits[0]
+        return self._preload(1)
 
     def read_bits(self, bit_count: int) -> bitarray.bitarray:
-        bits = self.bits[:bit_count]
-        del self.bits[:bit_count]
+        bits = self.preload_bits(bit_count)
+        self._offset += bit_count
         return bits
 
     def preload_bits(self, bit_count: int) -> bitarray.bitarray:
-        return self.bits[:bit_count]
+        self._check_bits(bit_count)
+        start_byte = self._offset >> 3
+        bits = bitarray.bitarray()
+        bits.frombytes(self._data[start_byte:(self._offset + bit_count + 7) >> 3])
+        shift = self._offset - (start_byte << 3)
+        return bits[shift:shift + bit_count]
 
     def skip_bits(self, bit_count: int):
-        del self.bits[:bit_count]
+        self._check_bits(bit_count)
+        self._offset += bit_count
 
     def read_uint(self, bit_length: int) -> int:
-        value = self.bits[:bit_length]
-        del self.bits[:bit_length]
-        return int(value.to01(), 2)
+        end = self._offset + bit_length
+        if bit_length <= 0 or end > self._end:
+            self._check_bits(bit_length)
+            return 0
+        self._offset = end
+        return (self._word >> (self._word_bits - end)) & ((1 << bit_length) - 1)
 
     def preload_uint(self, bit_length: int) -> int:
-        value = self.bits[:bit_length]
-        return int(value.to01(), 2)
+        return self._preload(bit_length)
 
     def read_bytes(self, bytes_count: int) -> bytes:
         length = bytes_count * 8
-        value = self.bits[:length]
-        del self.bits[:length]
-        return value.tobytes()
+        self._check_bits(length)
+        offset = self._offset
+        self._offset += length
+        if not offset & 7:
+            return self._data[offset >> 3:(offset >> 3) + bytes_count]
+        self._offset = offset
+        return self.read_uint(length).to_bytes(bytes_count, 'big')
 
     def read_int(self, bit_length: int) -> int:
-        if bit_length == 1:
-            # if num is -1 then bit is 1. if 0 then 1. see _bit_string.py
-            return - self.read_bit()
-        else:
-            is_negative = self.read_bit()
-            value = self.read_uint(bit_length - 1)
-            if is_negative == 1:
-                # ones complement
-                return - (2 ** (bit_length - 1) - value)
-            else:
-                return value
+        value = self.preload_int(bit_length)
+        self._offset += bit_length
+        return value
 
     def preload_int(self, bit_length: int) -> int:
-        tmp = self.bits
-        value = self.read_int(bit_length)
-        self.bits = tmp
+        value = self._preload(bit_length)
+        if bit_length and value >> (bit_length - 1):
+            # two's complement
+            value -= 1 << bit_length
         return value
 
     def read_msg_addr(self) -> Optional[Address]:
@@ -88,9 +159,9 @@ class Slice:
         if self.read_uint(2) == 0:
             return None
         self.read_bit()  # anycast
-        workchain_id = hex(self.read_int(8)).replace('0x', '')
-        hashpart = self.read_bytes(32).hex()
-        return Address(workchain_id + ":" + hashpart)
+        workchain_id = self.read_int(8)
+        hashpart = self.read_bytes(32)
+        return Address._from_parts(workchain_id, hashpart, False, False, False, False)
 
     def read_coins(self) -> int:
         """Reads an amount of coins from the slice. Returns nanocoins."""
@@ -108,7 +179,7 @@ class Slice:
         """Reads string from the slice.
         If length is 0, then reads string until the end of the slice."""
         if length == 0:
-            length = len(self.bits) // 8
+            length = len(self) // 8
         return self.read_bytes(length).decode("utf-8")
 
     def read_ref(self) -> Cell:
@@ -138,3 +209,8 @@ class Slice:
 
     def skip_dict(self):
         self.load_dict()
+
+    def read_dict(self, key_size: int, value_parser=None) -> DictView:
+        """Reads a dictionary (HashmapE) from the slice as a lazy DictView,
+        which is empty if the dictionary was null()."""
+        return DictView(self.load_dict(), key_size, value_parser)
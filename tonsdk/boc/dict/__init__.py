@@ -1,2 +1,4 @@
 from .find_common_prefix import find_common_prefix
 from .serialize_dict import serialize_dict
+from .parse_dict import parse_dict, DictView
+from .update_dict import dict_set, dict_delete
@@ -0,0 +1,130 @@
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from .._cell import Cell
+
+
+def read_label(src, key_length: int) -> Tuple[int, int]:
+    """Reads an HmLabel from the slice src and returns (label, label_length).
+    key_length is the number of key bits left at this edge."""
+    if not src.read_bit():
+        # hml_short$0 len:(Unary ~n) s:(n * Bit)
+        label_length = 0
+        while src.read_bit():
+            label_length += 1
+        label = src.read_uint(label_length)
+    elif not src.read_bit():
+        # hml_long$10 n:(#<= m) s:(n * Bit)
+        label_length = src.read_uint(key_length.bit_length())
+        label = src.read_uint(label_length)
+    else:
+        # hml_same$11 v:Bit n:(#<= m)
+        value = src.read_bit()
+        label_length = src.read_uint(key_length.bit_length())
+        label = (1 << label_length) - 1 if value else 0
+
+    if label_length > key_length:
+        raise Exception(f"Dictionary label of {label_length} bits is longer than the key")
+    return label, label_length
+
+
+def read_fork(src):
+    if len(src.refs) - src.ref_offset < 2:
+        raise Exception("Dictionary fork should have two references")
+    return src.read_ref(), src.read_ref()
+
+
+class DictView:
+    """Read-only view of a Hashmap cell with key_size bit keys.
+
+    Nothing is parsed up front: get() only descends the cells on the path
+    to the key, and iteration walks the tree lazily in key order. Values are
+    returned as the leaf Slice, or as value_parser(slice) if it is given.
+    A None root is an empty dictionary."""
+
+    def __init__(self, root: Optional[Cell], key_size: int,
+                 value_parser: Optional[Callable[[Any], Any]] = None):
+        self.root = root
+        self.key_size = key_size
+        self.value_parser = value_parser
+
+    def __repr__(self):
+        return "<DictView key_size: %d, %s>" % (self.key_size, repr(self.root))
+
+    def _value(self, src):
+        return self.value_parser(src) if self.value_parser else src
+
+    def _find(self, key: int):
+        """Returns the leaf slice of key, positioned at the value, or None."""
+        if self.root is None or key < 0 or key.bit_length() > self.key_size:
+            return None
+
+        cell = self.root
+        key_length = self.key_size
+        while True:
+            src = cell.begin_parse()
+            label, label_length = read_label(src, key_length)
+            key_length -= label_length
+            if (key >> key_length) & ((1 << label_length) - 1) != label:
+                return None
+            if key_length == 0:
+                return src
+            left, right = read_fork(src)
+            key_length -= 1
+            cell = right if (key >> key_length) & 1 else left
+
+    def get(self, key: int, default=None):
+        src = self._find(key)
+        if src is None:
+            return default
+        return self._value(src)
+
+    def __getitem__(self, key: int):
+        src = self._find(key)
+        if src is None:
+            raise KeyError(key)
+        return self._value(src)
+
+    def __contains__(self, key: int) -> bool:
+        return self._find(key) is not None
+
+    def items(self) -> Iterator[Tuple[int, Any]]:
+        """Yields (key, value) pairs in ascending key order."""
+        if self.root is None:
+            return
+        # (cell, key bits read so far, number of key bits left)
+        stack = [(self.root, 0, self.key_size)]
+        while stack:
+            cell, prefix, key_length = stack.pop()
+            src = cell.begin_parse()
+            label, label_length = read_label(src, key_length)
+            prefix = (prefix << label_length) | label
+            key_length -= label_length
+            if key_length == 0:
+                yield prefix, self._value(src)
+                continue
+            left, right = read_fork(src)
+            stack.append((right, (prefix << 1) | 1, key_length - 1))
+            stack.append((left, prefix << 1, key_length - 1))
+
+    def keys(self) -> Iterator[int]:
+        for key, _ in self.items():
+            yield key
+
+    def values(self) -> Iterator[Any]:
+        for _, value in self.items():
+            yield value
+
+    def __iter__(self) -> Iterator[int]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.items())
+
+    def __bool__(self) -> bool:
+        return self.root is not None
+
+
+def parse_dict(cell: Optional[Cell], key_size: int,
+               value_parser: Optional[Callable[[Any], Any]] = None) -> Dict[int, Any]:
+    """Parses a whole Hashmap cell into {int key: value}, see DictView."""
+    return dict(DictView(cell, key_size, value_parser).items())
@@ -1,9 +1,95 @@
+from bisect import bisect_left
+from math import ceil, log2
+
 from .find_common_prefix import find_common_prefix
 from .._cell import Cell
 
-from math import ceil, log2
+
+# Keys are kept as sorted ints: the keys of an edge all share their upper
+# bits, so the common prefix of a range is given by XOR of its first and last
+# key, and the fork point by a binary search for the next bit set.
+
+def _label_length_bits(key_length: int) -> int:
+    """Number of bits needed to store a label length of at most key_length,
+    i.e. ceil(log2(key_length + 1))."""
+    return key_length.bit_length()
+
+
+def _write_label(label: int, label_length: int, key_length: int, to):
+    """Writes an HmLabel of label_length bits with the shortest encoding.
+    key_length is the number of key bits left at this edge."""
+    len_len = _label_length_bits(key_length)
+
+    # hml_short$0 len:(Unary ~n) s:(n * Bit)
+    kind = 'short'
+    kind_length = 2 * label_length + 2
+
+    # hml_long$10 n:(#<= m) s:(n * Bit)
+    long_length = 2 + len_len + label_length
+    if long_length < kind_length:
+        kind_length = long_length
+        kind = 'long'
+
+    # hml_same$11 v:Bit n:(#<= m)
+    if label == 0 or label == (1 << label_length) - 1:
+        same_length = 3 + len_len
+        if same_length < kind_length:
+            kind = 'same'
+
+    if kind == 'short':
+        unary = ((1 << label_length) - 1) << 1
+        to.write_bits((unary << label_length) | label, 2 * label_length + 2)
+    elif kind == 'long':
+        to.write_bits((0b10 << (len_len + label_length)) | (label_length << label_length) | label,
+                      2 + len_len + label_length)
+    else:
+        value = 1 if label_length and label & 1 else 0
+        to.write_bits((0b11 << (len_len + 1)) | (value << len_len) | label_length, 3 + len_len)
 
 
+def _write_edges(keys, values, lo, hi, key_length, serializer, to):
+    """Writes the edge holding keys[lo:hi], which only differ in their lowest
+    key_length bits, into the cell to."""
+    first = keys[lo]
+    if hi - lo == 1:
+        label_length = key_length
+    else:
+        label_length = key_length - ((first ^ keys[hi - 1]).bit_length())
+    rest = key_length - label_length
+    label = (first >> rest) & ((1 << label_length) - 1)
+    _write_label(label, label_length, key_length, to.bits)
+
+    if hi - lo == 1:
+        serializer(values[lo], to)
+        return
+
+    # the range forks on bit rest - 1: the first key has it unset
+    split = bisect_left(keys, ((first >> (rest - 1)) | 1) << (rest - 1), lo, hi)
+    left_cell = Cell()
+    right_cell = Cell()
+    _write_edges(keys, values, lo, split, rest - 1, serializer, left_cell)
+    _write_edges(keys, values, split, hi, rest - 1, serializer, right_cell)
+    to.refs.append(left_cell)
+    to.refs.append(right_cell)
+
+
+def serialize_dict(src, key_size, serializer):
+    """Serializes {int key: value} into a Hashmap cell of key_size bit keys,
+    calling serializer(value, cell) to write each value into its leaf."""
+    assert len(src) > 0, 'Internal inconsistency'
+    keys = sorted(src)
+    if keys[0] < 0 or keys[-1].bit_length() > key_size:
+        raise Exception(f"Dictionary keys should be in range [0, 2^{key_size})")
+    values = [src[key] for key in keys]
+
+    dest = Cell()
+    _write_edges(keys, values, 0, len(keys), key_size, serializer, dest)
+    return dest
+
+
+# Trees of binary string keys, as built before keys were kept as ints. Kept
+# for compatibility, serialize_dict does not use them anymore.
+
 def pad(src: str, size: int) -> str:
     while len(src) < size:
         src = '0' + src
@@ -159,13 +245,7 @@ def detect_label_type(src, key_size):
 
 
 def write_label(src, key_size, to):
-    type = detect_label_type(src, key_size)
-    if type == 'short':
-        write_label_short(src, to)
-    elif type == 'long':
-        write_label_long(src, key_size, to)
-    elif type == 'same':
-        write_label_same(src[0] == '1', len(src), key_size, to)
+    _write_label(int(src, 2) if src else 0, len(src), key_size, to)
 
 
 def write_node(src, key_size, serializer, to):
@@ -184,10 +264,3 @@ def write_node(src, key_size, serializer, to):
 def write_edge(src, key_size, serializer, to):
     write_label(src['label'], key_size, to.bits)
     write_node(src['node'], key_size - len(src['label']), serializer, to)
-
-
-def serialize_dict(src, key_size, serializer):
-    tree = build_tree(src, key_size)
-    dest = Cell()
-    write_edge(tree, key_size, serializer, dest)
-    return dest
@@ -0,0 +1,112 @@
+from typing import Any, Callable, Optional
+
+from .._cell import Cell
+from .parse_dict import read_label, read_fork
+from .serialize_dict import _write_label
+
+
+# Dictionaries are persistent: an update returns a new root and only rebuilds
+# the cells on the path to the key (at most key_size + 1 of them). All other
+# cells, with their cached hashes, are shared with the previous root.
+
+def _edge_cell(label: int, label_length: int, key_length: int, body=None, refs=()) -> Cell:
+    """Makes an edge cell with the given label, followed by the rest of the
+    slice body (a leaf value or nothing) and refs."""
+    cell = Cell()
+    _write_label(label, label_length, key_length, cell.bits)
+    if body is not None:
+        bits_left = len(body)
+        if bits_left:
+            cell.bits.write_bits(body.read_uint(bits_left), bits_left)
+        refs = body.refs[body.ref_offset:]
+    if refs:
+        cell.refs.extend(refs)
+    return cell
+
+
+def _leaf_cell(label: int, label_length: int, value, serializer) -> Cell:
+    cell = Cell()
+    _write_label(label, label_length, label_length, cell.bits)
+    serializer(value, cell)
+    return cell
+
+
+def _set(cell: Cell, key_length: int, key: int, value, serializer) -> Cell:
+    src = cell.begin_parse()
+    label, label_length = read_label(src, key_length)
+    rest = key_length - label_length
+    key_label = key >> rest
+
+    if key_label != label:
+        # the key leaves this edge: fork it after the common part of the label
+        common = label_length - (key_label ^ label).bit_length()
+        fork_rest = key_length - common - 1
+        old_length = label_length - common - 1
+        old_edge = _edge_cell(label & ((1 << old_length) - 1), old_length, fork_rest, src)
+        new_edge = _leaf_cell(key & ((1 << fork_rest) - 1), fork_rest, value, serializer)
+        refs = (old_edge, new_edge) if (key >> fork_rest) & 1 else (new_edge, old_edge)
+        return _edge_cell(key >> (fork_rest + 1), common, key_length, refs=refs)
+
+    if rest == 0:
+        return _leaf_cell(label, label_length, value, serializer)
+
+    left, right = read_fork(src)
+    rest -= 1
+    sub_key = key & ((1 << rest) - 1)
+    if (key >> rest) & 1:
+        right = _set(right, rest, sub_key, value, serializer)
+    else:
+        left = _set(left, rest, sub_key, value, serializer)
+    return _edge_cell(label, label_length, key_length, refs=(left, right))
+
+
+def _delete(cell: Cell, key_length: int, key: int) -> Optional[Cell]:
+    src = cell.begin_parse()
+    label, label_length = read_label(src, key_length)
+    rest = key_length - label_length
+    if key >> rest != label:
+        return cell
+    if rest == 0:
+        return None
+
+    left, right = read_fork(src)
+    rest -= 1
+    bit = (key >> rest) & 1
+    child = right if bit else left
+    new_child = _delete(child, rest, key & ((1 << rest) - 1))
+    if new_child is child:
+        return cell
+
+    if new_child is None:
+        # a fork with a single branch left: merge that branch into this edge
+        sibling = (left if bit else right).begin_parse()
+        sibling_label, sibling_length = read_label(sibling, rest)
+        merged = (((label << 1) | (bit ^ 1)) << sibling_length) | sibling_label
+        return _edge_cell(merged, label_length + 1 + sibling_length, key_length, sibling)
+
+    refs = (left, new_child) if bit else (new_child, right)
+    return _edge_cell(label, label_length, key_length, refs=refs)
+
+
+def _check_key(key: int, key_size: int):
+    if key < 0 or key.bit_length() > key_size:
+        raise Exception(f"Dictionary keys should be in range [0, 2^{key_size})")
+
+
+def dict_set(root: Optional[Cell], key_size: int, key: int, value: Any,
+             serializer: Callable[[Any, Cell], None]) -> Cell:
+    """Returns the root of the dictionary root (None if empty) with key set
+    to value. root itself is left unchanged."""
+    _check_key(key, key_size)
+    if root is None:
+        return _leaf_cell(key, key_size, value, serializer)
+    return _set(root, key_size, key, value, serializer)
+
+
+def dict_delete(root: Optional[Cell], key_size: int, key: int) -> Optional[Cell]:
+    """Returns the root of the dictionary root without key, None if it
+    becomes empty, or root itself if there was no such key."""
+    _check_key(key, key_size)
+    if root is None:
+        return None
+    return _delete(root, key_size, key)
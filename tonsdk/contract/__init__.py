@@ -1,5 +1,6 @@
 from abc import ABC
 
+from ._code_registry import CodeRegistry, code_registry, code_cell, register_code
 from ..boc import Cell
 from ..utils import Address
 
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Union
+
+from ..boc import Cell
+from ..boc._cell import _freeze_tree
+
+
+class CodeRegistry:
+    """Contract code cells parsed once and shared by all contracts.
+
+    Code is given either as a BoC (bytes or hex string) or as the name it
+    was registered under. Each BoC is parsed on first use only, and the
+    resulting cell (with its representation hash) is returned on every
+    later call. Registered code is kept for good, other BoCs up to max_size
+    of them: the least recently used ones are dropped first.
+
+    The cells are shared between all contracts using the same code, so they
+    are frozen: modifying them raises an exception."""
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._names: Dict[str, Union[str, bytes]] = {}  # name -> boc
+        self._named: Dict[str, Cell] = {}  # name -> cell
+        self._bocs: OrderedDict = OrderedDict()  # boc as given -> cell
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def register(self, name: str, code_boc: Union[str, bytes]):
+        """Registers code_boc under name, replacing the code registered
+        before under the same name."""
+        with self._lock:
+            self._names[name] = code_boc
+            self._named.pop(name, None)
+
+    def code(self, name_or_boc: Union[str, bytes]) -> Cell:
+        """Returns the code cell of a registered name or of a BoC."""
+        if isinstance(name_or_boc, (bytearray, memoryview)):
+            name_or_boc = bytes(name_or_boc)
+        cell = self._named.get(name_or_boc)
+        if cell is not None:
+            return cell
+
+        with self._lock:
+            code_boc = self._names.get(name_or_boc)
+            if code_boc is None:
+                cell = self._bocs.get(name_or_boc)
+                if cell is not None:
+                    self._bocs.move_to_end(name_or_boc)
+                    return cell
+                code_boc = name_or_boc
+
+        cell = _freeze_tree(Cell.one_from_boc(code_boc))
+        with self._lock:
+            if name_or_boc in self._names:
+                self._named[name_or_boc] = cell
+            else:
+                self._bocs[name_or_boc] = cell
+                while len(self._bocs) > self.max_size:
+                    self._bocs.popitem(last=False)
+        return cell
+
+    def code_hash(self, name_or_boc: Union[str, bytes]) -> bytes:
+        """Returns the representation hash of a code cell."""
+        return self.code(name_or_boc).bytes_hash()
+
+
+code_registry = CodeRegistry()
+
+
+def code_cell(name_or_boc: Union[str, bytes]) -> Cell:
+    """Returns the shared code cell of a registered name or of a BoC,
+    see CodeRegistry."""
+    return code_registry.code(name_or_boc)
+
+
+def register_code(name: str, code_boc: Union[str, bytes]):
+    """Registers custom contract code under name, for code_cell(name)."""
+    code_registry.register(name, code_boc)
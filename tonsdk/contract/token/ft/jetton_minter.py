@@ -1,7 +1,7 @@
 
 
 from ..nft.nft_utils import create_offchain_uri_cell
-from ... import Contract
+from ... import Contract, code_cell, register_code
 from ....boc import Cell
 from ....utils import Address
 
@@ -11,7 +11,7 @@ class JettonMinter(Contract):
 
     def __init__(self, **kwargs):
         self.code = kwargs.get('code') or self.code
-        kwargs['code'] = Cell.one_from_boc(self.code)
+        kwargs['code'] = code_cell(self.code)
         super().__init__(**kwargs)
 
     def create_data_cell(self) -> Cell:
@@ -19,7 +19,7 @@ class JettonMinter(Contract):
         cell.bits.write_grams(0)  # total supply
         cell.bits.write_address(self.options['admin_address'])
         cell.refs.append(create_offchain_uri_cell(self.options['jetton_content_uri']))
-        cell.refs.append(Cell.one_from_boc(self.options['jetton_wallet_code_hex']))
+        cell.refs.append(code_cell(self.options['jetton_wallet_code_hex']))
         return cell
 
     def create_mint_body(self, destination: Address, jetton_amount: int, amount: int = 50000000, query_id: int = 0) -> Cell:
@@ -55,3 +55,5 @@ class JettonMinter(Contract):
         body.refs.append(create_offchain_uri_cell(jetton_content_uri))
         return body
 
+
+register_code('jetton_minter', JettonMinter.code)
@@ -1,6 +1,6 @@
 
 
-from ... import Contract
+from ... import Contract, code_cell, register_code
 from ....boc import Cell
 from ....utils import Address
 
@@ -10,7 +10,7 @@ class JettonWallet(Contract):
 
     def __init__(self, **kwargs):
         self.code = kwargs.get('code') or self.code
-        kwargs["code"] = Cell.one_from_boc(self.code)
+        kwargs["code"] = code_cell(self.code)
         super().__init__(**kwargs)
 
     def create_transfer_body(
@@ -52,3 +52,6 @@ class JettonWallet(Contract):
         cell.bits.write_grams(jetton_amount)
         cell.bits.write_address(response_address)
         return cell
+
+
+register_code('jetton_wallet', JettonWallet.code)
@@ -2,7 +2,7 @@ from math import floor
 from typing import List, Tuple
 
 from .nft_utils import create_offchain_uri_cell, serialize_uri
-from ... import Contract
+from ... import Contract, code_cell, register_code
 from ....boc import Cell, DictBuilder
 from ....utils import Address
 
@@ -12,7 +12,7 @@ class NFTCollection(Contract):
 
     def __init__(self, **kwargs):
         self.code = kwargs.get('code') or self.code
-        kwargs["code"] = Cell.one_from_boc(self.code)
+        kwargs["code"] = code_cell(self.code)
         super().__init__(**kwargs)
         self.options['royalty_base'] = self.options.get('royalty_base', 1000)
         self.options['royalty_factor'] = floor(self.options.get('royalty', 0) * self.options['royalty_base'])
@@ -41,7 +41,7 @@ class NFTCollection(Contract):
         cell.bits.write_address(self.options['owner_address'])
         cell.bits.write_uint(0, 64)  # next_item_index
         cell.refs.append(self.create_content_cell(self.options))
-        cell.refs.append(Cell.one_from_boc(self.options['nft_item_code_hex']))
+        cell.refs.append(code_cell(self.options['nft_item_code_hex']))
         cell.refs.append(self.create_royalty_cell(self.options))
         return cell
 
@@ -110,3 +110,4 @@ class NFTCollection(Contract):
         return body
 
 
+register_code('nft_collection', NFTCollection.code)
@@ -1,4 +1,4 @@
-from ... import Contract
+from ... import Contract, code_cell, register_code
 from ....boc import Cell
 from ....utils import Address
 
@@ -8,7 +8,7 @@ class NFTItem(Contract):
 
     def __init__(self, **kwargs):
         self.code = kwargs.get('code') or self.code
-        kwargs["code"] = Cell.one_from_boc(self.code)
+        kwargs["code"] = code_cell(self.code)
         super().__init__(**kwargs)
 
     def create_data_cell(self) -> Cell:
@@ -45,4 +45,4 @@ class NFTItem(Contract):
         return cell
 
 
-
+register_code('nft_item', NFTItem.code)
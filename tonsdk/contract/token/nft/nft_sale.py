@@ -1,6 +1,6 @@
 
 
-from ... import Contract
+from ... import Contract, code_cell, register_code
 from ....boc import Cell
 
 
@@ -9,7 +9,7 @@ class NFTSale(Contract):
 
     def __init__(self, **kwargs):
         self.code = kwargs.get('code') or self.code
-        kwargs["code"] = Cell.one_from_boc(self.code)
+        kwargs["code"] = code_cell(self.code)
         super().__init__(**kwargs)
 
     def create_data_cell(self) -> Cell:
@@ -33,3 +33,4 @@ class NFTSale(Contract):
         return cell
 
 
+register_code('nft_sale', NFTSale.code)
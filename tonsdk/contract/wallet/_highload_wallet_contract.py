@@ -1,7 +1,7 @@
 import time
 import decimal
 
-from .. import Contract
+from .. import Contract, code_cell, register_code
 from ._wallet_contract import WalletContract
 from ...boc import Cell, begin_cell, begin_dict
 from ...utils import Address, sign_message
@@ -22,10 +22,11 @@ class HighloadWalletContractBase(WalletContract):
 
 
 class HighloadWalletV2Contract(HighloadWalletContractBase):
+    # https://github.com/akifoq/highload-wallet/blob/master/highload-wallet-v2-code.fc
+    code = "B5EE9C720101090100E5000114FF00F4A413F4BCF2C80B010201200203020148040501EAF28308D71820D31FD33FF823AA1F5320B9F263ED44D0D31FD33FD3FFF404D153608040F40E6FA131F2605173BAF2A207F901541087F910F2A302F404D1F8007F8E16218010F4786FA5209802D307D43001FB009132E201B3E65B8325A1C840348040F4438AE63101C8CB1F13CB3FCBFFF400C9ED54080004D03002012006070017BD9CE76A26869AF98EB85FFC0041BE5F976A268698F98E99FE9FF98FA0268A91040207A0737D098C92DBFC95DD1F140034208040F4966FA56C122094305303B9DE2093333601926C21E2B3"
+
     def __init__(self, **kwargs) -> None:
-        # https://github.com/akifoq/highload-wallet/blob/master/highload-wallet-v2-code.fc
-        self.code = "B5EE9C720101090100E5000114FF00F4A413F4BCF2C80B010201200203020148040501EAF28308D71820D31FD33FF823AA1F5320B9F263ED44D0D31FD33FD3FFF404D153608040F40E6FA131F2605173BAF2A207F901541087F910F2A302F404D1F8007F8E16218010F4786FA5209802D307D43001FB009132E201B3E65B8325A1C840348040F4438AE63101C8CB1F13CB3FCBFFF400C9ED54080004D03002012006070017BD9CE76A26869AF98EB85FFC0041BE5F976A268698F98E99FE9FF98FA0268A91040207A0737D098C92DBFC95DD1F140034208040F4966FA56C122094305303B9DE2093333601926C21E2B3"
-        kwargs["code"] = Cell.one_from_boc(self.code)
+        kwargs["code"] = code_cell(self.code)
         super().__init__(**kwargs)
         if "wallet_id" not in kwargs:
             self.options["wallet_id"] = 698983191 + self.options["wc"]
@@ -121,3 +122,6 @@ class HighloadWalletV2Contract(HighloadWalletContractBase):
             "code": code,
             "data": data,
         }
+
+
+register_code('hv2', HighloadWalletV2Contract.code)
@@ -1,12 +1,15 @@
 from ._address import prepare_address, address_state
 from ._exceptions import ResponseError
 from ._toncenter import ToncenterClient, ToncenterWrongResult
-from ._tonlibjson import AsyncTonlibClient, SyncTonlibClient, TonLibWrongResult
+from ._tonlibjson import AsyncTonlibClient, AsyncTonlibPool, SyncTonlibClient, RequestPriorityEnum, \
+    TonLibWrongResult, TonLibOverloaded
 from ._utils import parse_response
 
 all = [
     'AsyncTonlibClient',
+    'AsyncTonlibPool',
     'SyncTonlibClient',
+    'RequestPriorityEnum',
     'ToncenterClient',
 
     'prepare_address',
@@ -16,5 +19,6 @@ all = [
 
     'ResponseError',
     'TonLibWrongResult',
+    'TonLibOverloaded',
     'ToncenterWrongResult',
 ]
@@ -1,5 +1,7 @@
 import base64
 
+from ..utils import crc16
+
 
 bounceable_tag, non_bounceable_tag = b'\x11', b'\x51'
 b64_abc = set(
@@ -25,20 +27,7 @@ def is_hex(x):
 
 
 def calcCRC(message):
-    poly = 0x1021
-    reg = 0
-    message += b'\x00\x00'
-    for byte in message:
-        mask = 0x80
-        while(mask > 0):
-            reg <<= 1
-            if byte & mask:
-                reg += 1
-            mask >>= 1
-            if reg > 0xffff:
-                reg &= 0xffff
-                reg ^= poly
-    return reg.to_bytes(2, "big")
+    return bytes(crc16(message))
 
 
 def account_forms(raw_form, test_only=False):
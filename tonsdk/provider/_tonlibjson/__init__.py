@@ -1,9 +1,12 @@
-from ._async import AsyncTonlibClient
+from ._async import AsyncTonlibClient, AsyncTonlibPool, RequestPriorityEnum
 from ._sync import SyncTonlibClient
-from ._utils import TonLibWrongResult
+from ._utils import TonLibWrongResult, TonLibOverloaded
 
 all = [
     'AsyncTonlibClient',
+    'AsyncTonlibPool',
+    'RequestPriorityEnum',
     'SyncTonlibClient',
-    'TonLibWrongResult'
+    'TonLibWrongResult',
+    'TonLibOverloaded',
 ]
@@ -1,7 +1,12 @@
 from ._client import AsyncTonlibClient
+from ._limiter import RequestLimiter, RequestPriorityEnum
 from ._wrapper import AsyncTonLibJsonWrapper
+from ._pool import AsyncTonlibPool
 
 __all__ = [
     'AsyncTonlibClient',
     'AsyncTonLibJsonWrapper',
+    'AsyncTonlibPool',
+    'RequestLimiter',
+    'RequestPriorityEnum',
 ]
\ No newline at end of file
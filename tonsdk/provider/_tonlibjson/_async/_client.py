@@ -1,5 +1,6 @@
 import asyncio
 import codecs
+import functools
 import json
 import logging
 import random
@@ -8,32 +9,86 @@ from pathlib import Path
 
 from tvm_valuetypes import render_tvm_stack, deserialize_boc
 
+from ._limiter import RequestLimiter, RequestPriorityEnum
 from ._wrapper import AsyncTonLibJsonWrapper
-from .._utils import b64str_to_hex, hex_to_b64str, hash_to_hex, CtypesStdoutCapture, TonLibWrongResult
+from .._utils import b64str_to_hex, hex_to_b64str, hash_to_hex, CtypesStdoutCapture, TonLibWrongResult, \
+    ContractCache
 from ..._address import prepare_address, detect_address
 
 logger = logging.getLogger(__name__)
 
 
+async def run_batch(calls, run_method, concurrency):
+    """Runs run_method(address, method, stack_data) for each distinct call
+    with at most concurrency of them at once, see run_methods_batch."""
+    unique = {}  # call key -> index in distinct_calls
+    distinct_calls = []
+    indexes = []
+    for address, method, stack_data in calls:
+        key = (address, method, json.dumps(stack_data, sort_keys=True, default=str))
+        if key not in unique:
+            unique[key] = len(distinct_calls)
+            distinct_calls.append((address, method, stack_data))
+        indexes.append(unique[key])
+
+    results = [None] * len(distinct_calls)
+    pending = iter(range(len(distinct_calls)))
+
+    async def worker():
+        for i in pending:
+            try:
+                results[i] = await run_method(*distinct_calls[i])
+            except Exception as e:
+                results[i] = e
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(distinct_calls)))))
+    return [results[i] for i in indexes]
+
+
 class AsyncTonlibClient:
+    """Tonlib client of one liteserver.
+
+    At most max_parallel_requests requests run at once, the others wait in a
+    queue of at most max_queued_requests, see RequestLimiter.
+
+    raw_run_method keeps the contracts it loads in a ContractCache of
+    contract_cache_size ids, so that later calls skip smc.load. Contracts
+    loaded at a given block (block=..., run_methods_batch) are always
+    cached. Contracts loaded at the latest block are only cached with a
+    contract_cache_ttl, for that many seconds, as their state gets older
+    meanwhile: by default each such call loads the contract again and costs
+    two round-trips."""
+
     def __init__(self,
                  config,
                  keystore,
                  loop,
                  cdll_path=None,
-                 verbosity_level=0):
-        self.ls_index = random.randrange(0, len(config['liteservers']))
+                 verbosity_level=0,
+                 ls_index=None,
+                 max_parallel_requests=None,
+                 max_queued_requests=None,
+                 contract_cache_size=1000,
+                 contract_cache_ttl=0):
+        if ls_index is None:
+            ls_index = random.randrange(0, len(config['liteservers']))
+        self.ls_index = ls_index
         self.config = config
         self.keystore = keystore
         self.cdll_path = cdll_path
         self.loop = loop
         self.verbosity_level = verbosity_level
-        self.max_parallel_requests = config['liteservers'][0].get(
-            "max_parallel_requests", 50)
-
-        self.semaphore = None
+        if max_parallel_requests is None:
+            max_parallel_requests = config['liteservers'][ls_index].get(
+                "max_parallel_requests", 50)
+        self.max_parallel_requests = max_parallel_requests
+        # kept across reconnects, so queued requests survive them
+        self.limiter = RequestLimiter(max_parallel_requests, max_queued_requests)
+        self.contracts = ContractCache(contract_cache_size, contract_cache_ttl)
+        self.last_block_seqno = None  # of the latest known masterchain block
         self.tonlib_wrapper = None
         self.loaded_contracts_num = None
+        self._loading_contracts = {}  # cache key -> future of the smc.load in progress
 
     @property
     def local_config(self):
@@ -67,9 +122,8 @@ class AsyncTonlibClient:
         :param key: base64 pub key of liteserver node
         :return: None
         """
-        self.semaphore = asyncio.Semaphore(self.max_parallel_requests)
-
         self.loaded_contracts_num = 0
+        self.contracts.clear()
         wrapper = AsyncTonLibJsonWrapper(self.loop, self.ls_index, self.cdll_path)
         keystore_obj = {
             '@type': 'keyStoreTypeDirectory',
@@ -106,6 +160,13 @@ class AsyncTonlibClient:
 
         return init_result
 
+    async def _execute(self, request, priority=RequestPriorityEnum.normal, wrapper=None):
+        await self.limiter.acquire(priority)
+        try:
+            return await (wrapper or self.tonlib_wrapper).execute(request)
+        finally:
+            self.limiter.release()
+
     async def set_verbosity_level(self, level):
         request = {
             '@type': 'setLogVerbosityLevel',
@@ -157,7 +218,7 @@ class AsyncTonlibClient:
                 'hash': from_transaction_hash
             }
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request, RequestPriorityEnum.low)
 
     async def raw_get_account_state(self, address: str):
         """
@@ -184,7 +245,7 @@ class AsyncTonlibClient:
             }
         }
 
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request)
 
     async def generic_get_account_state(self, address: str):
         # TODO: understand why this is not used
@@ -195,9 +256,9 @@ class AsyncTonlibClient:
                 'account_address': address
             }
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request)
 
-    async def _load_contract(self, address):
+    async def _load_contract(self, address, block=None, wrapper=None):
         # TODO: understand why this is not used
         account_address = prepare_address(address)
         request = {
@@ -206,15 +267,82 @@ class AsyncTonlibClient:
                 'account_address': address
             }
         }
-        result = await self.tonlib_wrapper.execute(request)
+        if block is not None:
+            request = {
+                '@type': 'withBlock',
+                'id': block,
+                'function': request
+            }
+        result = await self._execute(request, wrapper=wrapper)
         if result.get('@type', 'error') == 'error':
             raise TonLibWrongResult("smc.load failed", result)
         self.loaded_contracts_num += 1
         return result["id"]
 
-    async def raw_run_method(self, address, method, stack_data, output_layout=None):
+    async def _acquire_contract(self, address, block=None):
+        """Returns (cache key, contract id, wrapper) of the contract at
+        address, as of block (a ton.blockIdExt) or of the latest block,
+        loading it only if it is not cached. The id is only valid in the
+        tonlib instance of wrapper, which is held until the id is released
+        with _release_contract."""
+        key = (address, block['seqno'] if block is not None else self.last_block_seqno)
+        while True:
+            wrapper = self.tonlib_wrapper
+            contract_id = self.contracts.acquire(key)
+            if contract_id is not None:
+                wrapper.hold()
+                return key, contract_id, wrapper
+            loading = self._loading_contracts.get(key)
+            if loading is None:
+                break
+            await asyncio.shield(loading)  # then take its id from the cache
+
+        loading = self.loop.create_future()
+        self._loading_contracts[key] = loading
+        wrapper.hold()
+        try:
+            contract_id = await self._load_contract(address, block, wrapper)
+            # the cache only holds ids of the current tonlib instance
+            if wrapper is self.tonlib_wrapper:
+                self.contracts.add(key, contract_id, pinned=block is not None)
+        except BaseException:
+            wrapper.release()
+            raise
+        finally:
+            del self._loading_contracts[key]
+            loading.set_result(None)
+        self._forget_contracts()
+        return key, contract_id, wrapper
+
+    def _release_contract(self, key, contract_id, wrapper):
+        if wrapper is self.tonlib_wrapper:
+            self.contracts.release(key, contract_id)
+            self._forget_contracts()
+        wrapper.release()
+
+    def _forget_contracts(self):
+        # the cached ids are those of the current tonlib instance
+        for contract_id in self.contracts.drain():
+            asyncio.ensure_future(self._forget_contract(contract_id, self.tonlib_wrapper), loop=self.loop)
+
+    async def _forget_contract(self, contract_id, wrapper):
+        """
+          smc.forget id:int53 = Ok;
+        """
+        request = {
+            '@type': 'smc.forget',
+            'id': contract_id
+        }
+        try:
+            # local to tonlib, no need to queue it
+            await wrapper.execute(request)
+        except Exception as e:
+            logger.debug(f"smc.forget failed: {e}")
+
+    async def raw_run_method(self, address, method, stack_data, output_layout=None, block=None):
         """
           For numeric data only
+          Runs on the state of the account as of block (ton.blockIdExt), if given.
           TL Spec:
             smc.runGetMethod id:int53 method:smc.MethodId stack:vector<tvm.StackEntry> = smc.RunResult;
 
@@ -241,15 +369,33 @@ class AsyncTonlibClient:
             method = {'@type': 'smc.methodIdNumber', 'number': method}
         else:
             method = {'@type': 'smc.methodIdName', 'name': str(method)}
-        contract_id = await self._load_contract(address)
-        request = {
-            '@type': 'smc.runGetMethod',
-            'id': contract_id,
-            'method': method,
-            'stack': stack_data
-        }
+        key, contract_id, wrapper = await self._acquire_contract(address, block)
+        try:
+            request = {
+                '@type': 'smc.runGetMethod',
+                'id': contract_id,
+                'method': method,
+                'stack': stack_data
+            }
+            return await self._execute(request, wrapper=wrapper)
+        finally:
+            self._release_contract(key, contract_id, wrapper)
 
-        return await self.tonlib_wrapper.execute(request)
+    async def run_methods_batch(self, calls, block=None, concurrency=None):
+        """
+        Runs get-methods on many accounts as of one masterchain block.
+
+        :param calls: list of (address, method, stack_data) as for raw_run_method
+        :param block: ton.blockIdExt to run at, the latest masterchain block by default
+        :param concurrency: calls run at once, max_parallel_requests by default
+        :return: the raw_run_method results in the order of calls; a call that
+            raised gets its exception instead. Identical calls run once and
+            share their result.
+        """
+        if block is None:
+            block = (await self.get_masterchain_info())['last']
+        return await run_batch(calls, functools.partial(self.raw_run_method, block=block),
+                               concurrency or self.max_parallel_requests)
 
     async def raw_send_message(self, serialized_boc):
         """
@@ -263,7 +409,7 @@ class AsyncTonlibClient:
             '@type': 'raw.sendMessage',
             'body': serialized_boc
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request, RequestPriorityEnum.high)
 
     async def _raw_create_query(self, destination, body, init_code=b'', init_data=b''):
         """
@@ -288,7 +434,7 @@ class AsyncTonlibClient:
                 'account_address': destination
             }
         }
-        result = await self.tonlib_wrapper.execute(request)
+        result = await self._execute(request)
         if result.get('@type', 'error') == 'error':
             raise TonLibWrongResult("raw.createQuery failed", result)
         return result
@@ -301,7 +447,7 @@ class AsyncTonlibClient:
             '@type': 'query.send',
             'id': query_info['id']
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request, RequestPriorityEnum.high)
 
     async def raw_create_and_send_query(self, destination, body, init_code=b'', init_data=b''):
         query_info = await self._raw_create_query(destination, body, init_code, init_data)
@@ -326,7 +472,7 @@ class AsyncTonlibClient:
             'initial_account_state': initial_account_state,
             'data': body
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request, RequestPriorityEnum.high)
 
     async def raw_estimate_fees(self, destination, body, init_code=b'', init_data=b'', ignore_chksig=True):
         query_info = await self._raw_create_query(destination, body, init_code, init_data)
@@ -335,7 +481,7 @@ class AsyncTonlibClient:
             'id': query_info['id'],
             'ignore_chksig': ignore_chksig
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request)
 
     async def raw_get_block_transactions(self, fullblock, count, after_tx):
         request = {
@@ -345,7 +491,7 @@ class AsyncTonlibClient:
             'count': count,
             'after': after_tx
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request, RequestPriorityEnum.low)
 
     async def raw_get_block_transactions_ext(self, fullblock, count, after_tx):
         request = {
@@ -355,7 +501,7 @@ class AsyncTonlibClient:
             'count': count,
             'after': after_tx
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request, RequestPriorityEnum.low)
 
     async def get_transactions(self, account,
                                from_transaction_lt=None,
@@ -475,9 +621,10 @@ class AsyncTonlibClient:
         request = {
             '@type': 'blocks.getMasterchainInfo'
         }
-        result = await self.tonlib_wrapper.execute(request)
+        result = await self._execute(request)
         if result.get('@type', 'error') == 'error':
             raise TonLibWrongResult("blocks.getMasterchainInfo failed", result)
+        self.last_block_seqno = max(self.last_block_seqno or 0, result['last']['seqno'])
         return result
 
     async def lookup_block(self, workchain, shard, seqno=None, lt=None, unixtime=None, *args, **kwargs):
@@ -501,7 +648,7 @@ class AsyncTonlibClient:
             'lt': lt,
             'utime': unixtime
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request)
 
     async def get_shards(self, master_seqno=None, lt=None, unixtime=None, *args, **kwargs):
         assert master_seqno or lt or unixtime, "Seqno, LT or unixtime should be defined"
@@ -511,7 +658,7 @@ class AsyncTonlibClient:
             '@type': 'blocks.getShards',
             'id': fullblock
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request)
 
     async def get_block_transactions(self, workchain, shard, seqno, count, root_hash=None, file_hash=None, after_lt=None, after_hash=None, *args, **kwargs):
         if root_hash and file_hash:
@@ -640,7 +787,7 @@ class AsyncTonlibClient:
             '@type': 'blocks.getBlockHeader',
             'id': fullblock
         }
-        return await self.tonlib_wrapper.execute(request)
+        return await self._execute(request)
 
     async def try_locate_tx_by_incoming_message(self, source, destination, creation_lt, *args, **kwargs):
         src = detect_address(source)
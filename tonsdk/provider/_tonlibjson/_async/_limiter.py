@@ -0,0 +1,102 @@
+import asyncio
+from collections import deque
+from enum import Enum
+
+from .._utils import TonLibOverloaded
+
+
+class RequestPriorityEnum(int, Enum):
+    high = 0  # sending messages
+    normal = 1
+    low = 2  # history and block scans
+
+
+class RequestLimiter:
+    """Admission control for tonlib requests.
+
+    At most max_parallel requests run at once. The others wait in a queue
+    and are let in by priority (lower values first), then in arrival order.
+    If max_queued is set, a request arriving at a full queue sheds the
+    newest of the least urgent waiting requests, or is shed itself if none
+    is less urgent. A shed request raises TonLibOverloaded."""
+
+    def __init__(self, max_parallel: int, max_queued: int = None):
+        self.max_parallel = max_parallel
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self._queues = {}  # priority -> deque of futures
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'queued_by_priority': {p: len(q) for p, q in sorted(self._queues.items())},
+            'peak_queued': self.peak_queued,
+            'admitted': self.admitted,
+            'shed': self.shed,
+        }
+
+    def _shed_for(self, priority):
+        while True:
+            # nothing queued (max_queued=0): the new request is shed
+            worst = max(self._queues, default=priority)
+            if priority >= worst:
+                self.shed += 1
+                raise TonLibOverloaded(f"Request queue is full ({self.queued} waiting)")
+            victim = self._pop(worst, newest=True)
+            if victim.done():
+                # cancelled, its waiter did not run yet: that frees the place
+                if self.queued < self.max_queued:
+                    return
+                continue
+            self.shed += 1
+            victim.set_exception(TonLibOverloaded("Request shed for a more urgent one"))
+            return
+
+    def _pop(self, priority, newest=False):
+        queue = self._queues[priority]
+        future = queue.pop() if newest else queue.popleft()
+        if not queue:
+            del self._queues[priority]
+        self.queued -= 1
+        return future
+
+    async def acquire(self, priority=RequestPriorityEnum.normal):
+        if self.in_flight < self.max_parallel and not self.queued:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self.max_queued is not None and self.queued >= self.max_queued:
+            self._shed_for(priority)
+
+        future = asyncio.get_event_loop().create_future()
+        self._queues.setdefault(priority, deque()).append(future)
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            await future  # release() hands its slot over
+        except BaseException:
+            if not future.done() or future.cancelled():
+                queue = self._queues.get(priority)
+                if queue is not None and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._queues[priority]
+                    self.queued -= 1
+            elif future.exception() is None:
+                self.release()  # cancelled right after getting the slot
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        while self._queues:
+            future = self._pop(min(self._queues))
+            if not future.done():
+                future.set_result(None)
+                self.in_flight += 1
+                self.admitted += 1
+                return
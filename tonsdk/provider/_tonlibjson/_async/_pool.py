@@ -0,0 +1,230 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+
+from ._client import AsyncTonlibClient, run_batch
+from .._utils import TonLibOverloaded, TonLibWrongResult
+
+logger = logging.getLogger(__name__)
+
+
+def _is_liteserver_error(result):
+    return isinstance(result, dict) and result.get('@type') == 'error' and result.get('code', 0) >= 500
+
+
+def _is_liteserver_failure(error):
+    """Whether error comes from the liteserver or the connection to it,
+    rather than from the call itself."""
+    if isinstance(error, (asyncio.TimeoutError, OSError)):
+        return True
+    return isinstance(error, TonLibWrongResult) and _is_liteserver_error(error.result)
+
+
+def _pooled(name, retry=True):
+    method = getattr(AsyncTonlibClient, name)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await self._call(name, *args, retry=retry, **kwargs)
+    return wrapper
+
+
+class AsyncTonlibPool:
+    """AsyncTonlibClient over all liteservers of a config.
+
+    Runs one tonlib client per liteserver and sends each call to the client
+    with the fewest requests in flight (routing='outstanding') or with the
+    lowest expected latency (routing='latency', an EWMA of response times
+    weighted by the requests in flight). A call that times out, loses its
+    connection or gets a liteserver error (code >= 500) is retried on
+    another client, and the failed client is avoided for retry_delay
+    seconds. Other errors are raised at once. Messages are never sent
+    twice: a send that fails that way is not retried, as it may have
+    reached the network already.
+    The request limits and the contract cache options apply to each
+    client, see AsyncTonlibClient and ContractCache: by default only the
+    contracts loaded at a given block are cached.
+
+    A call runs as a whole on one client, so requests depending on each
+    other (smc.load and smc.runGetMethod, paged transactions) go to the
+    same liteserver."""
+
+    def __init__(self,
+                 config,
+                 keystore,
+                 loop,
+                 cdll_path=None,
+                 verbosity_level=0,
+                 ls_indexes=None,
+                 routing='outstanding',
+                 request_timeout=10,
+                 max_attempts=3,
+                 retry_delay=5,
+                 max_parallel_requests=None,
+                 max_queued_requests=None,
+                 contract_cache_size=1000,
+                 contract_cache_ttl=0):
+        if routing not in ('outstanding', 'latency'):
+            raise ValueError(f"Unknown routing: {routing}")
+        if ls_indexes is None:
+            ls_indexes = range(len(config['liteservers']))
+        self.config = config
+        self.loop = loop
+        self.routing = routing
+        self.request_timeout = request_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # every tonlib instance gets a keystore directory of its own
+        self.clients = [AsyncTonlibClient(config, os.path.join(keystore, f'ls_{i:03d}'), loop,
+                                          cdll_path, verbosity_level, ls_index=i,
+                                          max_parallel_requests=max_parallel_requests,
+                                          max_queued_requests=max_queued_requests,
+                                          contract_cache_size=contract_cache_size,
+                                          contract_cache_ttl=contract_cache_ttl)
+                        for i in ls_indexes]
+        self.outstanding = [0] * len(self.clients)
+        self.latency = [None] * len(self.clients)  # EWMA, seconds
+        self._down_until = [0.0] * len(self.clients)
+        self._inited = [False] * len(self.clients)
+
+    async def init(self, max_restarts=None):
+        """Inits the clients of all liteservers. Clients that fail to init
+        are left out; raises if all of them fail."""
+        # one at a time: init redirects the process stdout while it awaits
+        results = []
+        for i, client in enumerate(self.clients):
+            try:
+                results.append(await client.init(max_restarts))
+                self._inited[i] = True
+            except Exception as e:
+                logger.error(f'TonLib #{client.ls_index:03d} init failed: {e}')
+                results.append(e)
+        if not any(self._inited):
+            raise TonLibWrongResult("No liteserver could be inited")
+        return results
+
+    def _alive(self, seqno=None):
+        """Indexes of the running clients, known to have the masterchain
+        block seqno if given."""
+        return [i for i, client in enumerate(self.clients)
+                if self._inited[i] and client.tonlib_wrapper is not None
+                and (seqno is None or (client.last_block_seqno or 0) >= seqno)]
+
+    def _choose(self, tried, seqno=None):
+        now = time.monotonic()
+        alive = [i for i in self._alive(seqno) if i not in tried]
+        candidates = [i for i in alive if self._down_until[i] <= now] or alive
+        if not candidates:
+            return None
+        if self.routing == 'latency':
+            return min(candidates, key=lambda i: (self.latency[i] or 0) * (self.outstanding[i] + 1))
+        return min(candidates, key=lambda i: (self.outstanding[i], self.latency[i] or 0))
+
+    def _succeeded(self, i, latency, alpha=0.2):
+        ewma = self.latency[i]
+        self.latency[i] = latency if ewma is None else ewma + alpha * (latency - ewma)
+        self._down_until[i] = 0.0
+
+    def _failed(self, i, error):
+        logger.warning(f'TonLib #{self.clients[i].ls_index:03d} request failed: {error!r}')
+        self._down_until[i] = time.monotonic() + self.retry_delay
+
+    async def _call(self, name, *args, retry=True, seqno=None, **kwargs):
+        tried = set()
+        result = error = None
+        for _ in range(self.max_attempts):
+            i = self._choose(tried, seqno)
+            if i is None:
+                break
+            tried.add(i)
+            self.outstanding[i] += 1
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(getattr(self.clients[i], name)(*args, **kwargs),
+                                                self.request_timeout)
+            except TonLibOverloaded as e:
+                error = e  # the liteserver is fine, only busy
+                continue
+            except Exception as e:
+                if not _is_liteserver_failure(e):
+                    raise
+                self._failed(i, e)
+                if not retry:
+                    raise
+                error = e
+                continue
+            finally:
+                self.outstanding[i] -= 1
+
+            if _is_liteserver_error(result):
+                self._failed(i, result)
+                if not retry:
+                    return result
+                error = None
+                continue
+            self._succeeded(i, time.monotonic() - start)
+            return result
+
+        if error is not None:
+            raise error
+        if result is None:
+            raise TonLibWrongResult("No liteserver available")
+        return result
+
+    async def _update_last_blocks(self, seqno=None):
+        """Fetches the latest masterchain block of the clients not known to
+        have seqno (of all of them by default), returns the ones fetched."""
+        clients = [self.clients[i] for i in self._alive()
+                   if seqno is None or (self.clients[i].last_block_seqno or 0) < seqno]
+        results = await asyncio.gather(*(asyncio.wait_for(client.get_masterchain_info(), self.request_timeout)
+                                         for client in clients), return_exceptions=True)
+        return [result['last'] for result in results if not isinstance(result, BaseException)]
+
+    async def raw_run_method(self, address, method, stack_data, output_layout=None, block=None):
+        """See AsyncTonlibClient.raw_run_method. With block, runs only on
+        clients known to have it: a lagging liteserver can not load the
+        account state as of a block it has not seen yet."""
+        if block is None:
+            return await self._call('raw_run_method', address, method, stack_data, output_layout)
+        if not self._alive(block['seqno']):
+            await self._update_last_blocks(block['seqno'])
+        return await self._call('raw_run_method', address, method, stack_data, output_layout,
+                                block=block, seqno=block['seqno'])
+
+    async def run_methods_batch(self, calls, block=None, concurrency=None):
+        """Runs get-methods on many accounts as of one masterchain block,
+        spread over the clients having it, see
+        AsyncTonlibClient.run_methods_batch. By default the block is the
+        latest one at least half of the clients have, and concurrency is the
+        sum of the limits of the clients having it."""
+        if block is None:
+            blocks = sorted(await self._update_last_blocks(), key=lambda block: block['seqno'])
+            if not blocks:
+                raise TonLibWrongResult("No liteserver available")
+            block = blocks[(len(blocks) - 1) // 2]
+        else:
+            await self._update_last_blocks(block['seqno'])
+        if concurrency is None:
+            concurrency = sum(self.clients[i].max_parallel_requests for i in self._alive(block['seqno']))
+        return await run_batch(calls, functools.partial(self.raw_run_method, block=block), concurrency or 1)
+
+    raw_get_transactions = _pooled('raw_get_transactions')
+    raw_get_account_state = _pooled('raw_get_account_state')
+    generic_get_account_state = _pooled('generic_get_account_state')
+    raw_send_message = _pooled('raw_send_message', retry=False)
+    raw_create_and_send_query = _pooled('raw_create_and_send_query', retry=False)
+    raw_create_and_send_message = _pooled('raw_create_and_send_message', retry=False)
+    raw_estimate_fees = _pooled('raw_estimate_fees')
+    raw_get_block_transactions = _pooled('raw_get_block_transactions')
+    raw_get_block_transactions_ext = _pooled('raw_get_block_transactions_ext')
+    get_transactions = _pooled('get_transactions')
+    get_masterchain_info = _pooled('get_masterchain_info')
+    lookup_block = _pooled('lookup_block')
+    get_shards = _pooled('get_shards')
+    get_block_transactions = _pooled('get_block_transactions')
+    get_block_transactions_ext = _pooled('get_block_transactions_ext')
+    get_block_header = _pooled('get_block_header')
+    try_locate_tx_by_incoming_message = _pooled('try_locate_tx_by_incoming_message')
+    try_locate_tx_by_outcoming_message = _pooled('try_locate_tx_by_outcoming_message')
@@ -1,8 +1,9 @@
 import asyncio
-import functools
+import heapq
+import itertools
 import json
 import logging
-import random
+import threading
 import time
 import traceback
 from ctypes import CDLL, c_void_p, c_char_p, c_double
@@ -46,13 +47,9 @@ class AsyncTonLibJsonWrapper:
         tonlib_json_client_destroy.argtypes = [c_void_p]
         self._tonlib_json_client_destroy = tonlib_json_client_destroy
 
-        self.futures = {}
+        self.futures = {}  # request id -> future
         self.loop = loop
         self.ls_index = ls_index
-        self.read_results_task = asyncio.ensure_future(
-            self.read_results(), loop=self.loop)
-        self.del_expired_futures_task = asyncio.ensure_future(
-            self.del_expired_futures_loop(), loop=self.loop)
         self.shutdown_state = False  # False, "started", "finished"
         self.request_num = 0
         self.verbose = verbose
@@ -60,6 +57,15 @@ class AsyncTonLibJsonWrapper:
         self.max_requests = None
         self.max_restarts = None
 
+        self._holds = 0  # see hold()
+        self._request_ids = itertools.count(1)
+        self._deadlines = []  # heap of (deadline, request id)
+        self._expire_handle = None
+        self._expire_at = None
+        self._reader_lock = threading.Lock()
+        self._reader_running = False
+        self._start_reader()
+
     def __del__(self):
         try:
             self._tonlib_json_client_destroy(self._client)
@@ -77,16 +83,26 @@ class AsyncTonLibJsonWrapper:
     async def restart(self):
         if not self.shutdown_state:
             self.shutdown_state = "started"
-            asyncio.ensure_future(self.restart_hook(
-                self.max_restarts), loop=self.loop)
+            asyncio.ensure_future(self._restart(), loop=self.loop)
+
+    async def _restart(self):
+        try:
+            # the client moves its requests to a new instance
+            await self.restart_hook(self.max_restarts)
+        finally:
+            self._check_finished()
 
     def receive(self, timeout=10):
+        """Blocks for up to timeout seconds waiting for a result. Called from
+        the reader thread."""
         result = None
         try:
             result = self._tonlib_json_client_receive(
-                self._client, timeout)  # time.sleep # asyncio.sleep
+                self._client, timeout)
         except Exception:
-            asyncio.ensure_future(self.restart(), loop=self.loop)
+            logger.critical(f"Tonlib #{self.ls_index:03d} crashed!")
+            asyncio.run_coroutine_threadsafe(self.restart(), self.loop)
+            time.sleep(0.05)
         if result:
             result = json.loads(result.decode('utf-8'))
         return result
@@ -96,17 +112,28 @@ class AsyncTonLibJsonWrapper:
         self.max_restarts = max_restarts
         self.restart_hook = hook
 
-    def execute(self, query, timeout=10):
-        query_type = query.get('@type', '?')
+    def hold(self):
+        """Keeps this instance running until the matching release(), even
+        once restarted: the ids of contracts loaded on it are only valid
+        here."""
+        self._holds += 1
+
+    def release(self):
+        self._holds -= 1
+        self._check_finished()
 
-        extra_id = "%s:%s:%s" % (
-            time.time()+timeout, self.ls_index, random.random())
-        query["@extra"] = extra_id
+    def execute(self, query, timeout=10):
+        if self.shutdown_state == "finished":
+            raise ConnectionError(f"Tonlib #{self.ls_index:03d} is shut down")
 
-        self.loop.run_in_executor(None, lambda: self.send(query))
+        request_id = next(self._request_ids)
+        query["@extra"] = request_id
 
         future_result = self.loop.create_future()
-        self.futures[extra_id] = future_result
+        self.futures[request_id] = future_result
+        self._add_deadline(self.loop.time() + timeout, request_id)
+        # tonlib only queues the query here, no need for a thread
+        self.send(query)
 
         self.request_num += 1
 
@@ -117,48 +144,83 @@ class AsyncTonLibJsonWrapper:
 
     @property
     def _is_finishing(self):
-        return (not len(self.futures)) and (self.shutdown_state in ["started", "finished"])
-
-    async def read_results(self):
-        timeout = 3
-        delta = 5
-        receive_func = functools.partial(self.receive, timeout)
-
-        while not self._is_finishing:
-            result = None
-            try:
-                result = await asyncio.wait_for(self.loop.run_in_executor(None, receive_func), timeout=timeout + delta)
-            except asyncio.TimeoutError:
-                logger.critical(f"Tonlib #{self.ls_index:03d} Stuck!")
-                asyncio.ensure_future(self.restart(), loop=self.loop)
-                await asyncio.sleep(0.05)
-            except Exception as e:
-                logger.critical(f"Tonlib #{self.ls_index:03d} crashed!")
-                asyncio.ensure_future(self.restart(), loop=self.loop)
-                await asyncio.sleep(0.05)
-
-            # return result
-            if result and isinstance(result, dict) and ("@extra" in result) and (result["@extra"] in self.futures):
+        return (not len(self.futures)) and (not self._holds) and (self.shutdown_state in ["started", "finished"])
+
+    def _start_reader(self):
+        with self._reader_lock:
+            if not self._reader_running:
+                self._reader_running = True
+                threading.Thread(target=self._read_loop, name=f"tonlib-{self.ls_index:03d}",
+                                 daemon=True).start()
+
+    def _read_loop(self):
+        """Reader thread: passes the results of tonlib to the event loop, in
+        batches of all the results that are ready."""
+        try:
+            while self.shutdown_state != "finished":
+                result = self.receive(1.0)
+                if not result:
+                    continue
+                results = [result]
+                while len(results) < 1000:
+                    result = self.receive(0)
+                    if not result:
+                        break
+                    results.append(result)
                 try:
-                    if not self.futures[result["@extra"]].done():
-                        self.futures[result["@extra"]].set_result(result)
-                        self.futures.pop(result["@extra"])
-                except Exception as e:
-                    logger.error(
-                        f'Tonlib #{self.ls_index:03d} receiving result exception: {e}')
-        self.shutdown_state = "finished"
-
-    async def del_expired_futures_loop(self):
-        while not self._is_finishing:
-            await self.cancel_futures()
-            await asyncio.sleep(0.05)
+                    self.loop.call_soon_threadsafe(self._set_results, results)
+                except RuntimeError:  # the loop is closed
+                    return
+        finally:
+            with self._reader_lock:
+                self._reader_running = False
+
+    def _set_results(self, results):
+        for result in results:
+            if not isinstance(result, dict):
+                continue
+            future = self.futures.pop(result.get("@extra"), None)
+            if future is not None and not future.done():
+                future.set_result(result)
+        self._check_finished()
+
+    def _check_finished(self):
+        if self._is_finishing:
+            self.shutdown_state = "finished"
+            if self._expire_handle is not None:
+                self._expire_handle.cancel()
+                self._expire_handle = None
+
+    def _add_deadline(self, deadline, request_id):
+        heapq.heappush(self._deadlines, (deadline, request_id))
+        if self._expire_at is None or deadline < self._expire_at:
+            self._schedule_expire()
+
+    def _schedule_expire(self):
+        if self._expire_handle is not None:
+            self._expire_handle.cancel()
+            self._expire_handle = None
+            self._expire_at = None
+        if self._deadlines:
+            self._expire_at = self._deadlines[0][0]
+            self._expire_handle = self.loop.call_at(self._expire_at, self._expire)
+
+    def _expire(self, expire_all=False):
+        """Fails the requests past their deadline with asyncio.TimeoutError.
+        Deadlines of answered requests are dropped on the way."""
+        now = self.loop.time()
+        deadlines = self._deadlines
+        while deadlines and (expire_all or deadlines[0][0] <= now):
+            _, request_id = heapq.heappop(deadlines)
+            future = self.futures.pop(request_id, None)
+            if future is not None and not future.done():
+                future.set_exception(asyncio.TimeoutError(
+                    f"Tonlib #{self.ls_index:03d} request timed out"))
+        self._expire_handle = None
+        self._expire_at = None
+        self._schedule_expire()
+        self._check_finished()
 
     async def cancel_futures(self, cancel_all=False):
-        now = time.time()
-        to_del = []
-        for i in self.futures:
-            if float(i.split(":")[0]) <= now or cancel_all:
-                to_del.append(i)
-        for i in to_del:
-            i.cancel()
-            self.futures.pop(i)
+        """Fails expired requests, or all pending ones if cancel_all."""
+        self._expire(cancel_all)
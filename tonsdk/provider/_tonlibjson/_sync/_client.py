@@ -15,6 +15,8 @@ class SyncTonlibClient:
         self.keystore = keystore
         self.cdll_path = cdll_path
         self.verbosity = verbosity
+        self._run_contracts = {}  # run query id -> id of its contract, see read_results()
+        self._forgetting = set()  # ids of the smc.forget queries not answered yet
 
     def init(self):
         wrapper = SyncTonLibWrapper(self.cdll_path)
@@ -62,11 +64,17 @@ class SyncTonlibClient:
         return self.read_results({query_idx: 0}, read_timeout)[0]
 
     def read_results(self, queries_order, read_timeout=None):
+        """Reads the results of queries_order (query id -> index). The
+        contracts of the raw_run_method queries read are forgotten, and the
+        results of these smc.forget queries are read as well."""
         read_timeout = read_timeout if read_timeout else time.time() + 5
         results = [None] * len(queries_order)
-        while queries_order:
+        while queries_order or self._forgetting:
             if time.time() >= read_timeout:
-                raise TimeoutError("Tonlib queries took too long!")
+                if queries_order:
+                    raise TimeoutError("Tonlib queries took too long!")
+                self._forgetting.clear()  # left to later reads
+                break
 
             result = None
             try:
@@ -74,10 +82,17 @@ class SyncTonlibClient:
             except Exception as e:  # FIXME: handle exceptions (TimeOutError?)
                 raise
 
-            if result and isinstance(result, dict) and ("@extra" in result) and (result["@extra"] in queries_order):
+            if not (result and isinstance(result, dict) and ("@extra" in result)):
+                continue
+            if result["@extra"] in self._forgetting:
+                self._forgetting.discard(result["@extra"])
+            elif result["@extra"] in queries_order:
                 query_order = queries_order[result["@extra"]]
                 results[query_order] = result
                 queries_order.pop(result["@extra"])
+                contract_id = self._run_contracts.pop(result["@extra"], None)
+                if contract_id is not None:
+                    self._forget_contract(contract_id)
 
         return results
 
@@ -115,7 +130,10 @@ class SyncTonlibClient:
             'stack': stack_data
         }
 
-        return self.__execute(request)
+        query_idx = self.__execute(request)
+        # forgotten once the result is read: tonlib keeps loaded contracts
+        self._run_contracts[query_idx] = contract_id
+        return query_idx
 
     def _load_contract(self, address):
         request = {
@@ -130,6 +148,13 @@ class SyncTonlibClient:
 
         return result["id"]
 
+    def _forget_contract(self, contract_id):
+        request = {
+            '@type': 'smc.forget',
+            'id': contract_id
+        }
+        self._forgetting.add(self.__execute(request))
+
     def __execute(self, query) -> str:
         extra_id = "%s:%s" % (time.time(), random.random())
         query["@extra"] = extra_id
@@ -6,6 +6,8 @@ import json
 import os
 import platform
 import struct
+import time
+from collections import OrderedDict
 from functools import wraps
 from pathlib import Path
 
@@ -19,6 +21,91 @@ class TonLibWrongResult(Exception):
         return f"{self.description} - unexpected lite server response:\n\t{json.dumps(self.result)}"
 
 
+class TonLibOverloaded(Exception):
+    pass
+
+
+class ContractCache:
+    """LRU of the contract ids returned by smc.load, keyed by (address,
+    masterchain block seqno).
+
+    Ids of contracts loaded at a given block stay valid until evicted. The
+    others (loaded at the latest block) hold the account state of the moment
+    they were loaded, so they are only cached if ttl is set, and for ttl
+    seconds: a get-method may then see a state up to ttl seconds old. A ttl
+    of about the block interval (5 seconds) keeps it within one block. Ids
+    that are evicted, expired or not cached go to to_forget, for smc.forget,
+    once no request uses them anymore."""
+
+    def __init__(self, max_size=1000, ttl=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.to_forget = []
+        self._entries = OrderedDict()  # key -> [id, expires_at, users]
+        self._retired = {}  # id -> users, of dropped entries still in use
+
+    def __len__(self):
+        return len(self._entries)
+
+    def acquire(self, key):
+        """Returns the cached id for key, marked in use, or None."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            self._retire(self._entries.pop(key))
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        entry[2] += 1
+        return entry[0]
+
+    def add(self, key, contract_id, pinned=False):
+        """Caches a freshly loaded id, marked in use."""
+        if not pinned and not self.ttl:
+            self._retired[contract_id] = self._retired.get(contract_id, 0) + 1
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._retire(old)
+        expires_at = None if pinned else time.monotonic() + self.ttl
+        self._entries[key] = [contract_id, expires_at, 1]
+        while len(self._entries) > self.max_size:
+            self._retire(self._entries.popitem(last=False)[1])
+
+    def release(self, key, contract_id):
+        if contract_id in self._retired:
+            self._retired[contract_id] -= 1
+            if not self._retired[contract_id]:
+                del self._retired[contract_id]
+                self.to_forget.append(contract_id)
+            return
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == contract_id:
+            entry[2] -= 1
+
+    def _retire(self, entry):
+        contract_id, _, users = entry
+        if users:
+            self._retired[contract_id] = users
+        else:
+            self.to_forget.append(contract_id)
+
+    def drain(self):
+        """Returns the ids to forget and empties to_forget."""
+        to_forget, self.to_forget = self.to_forget, []
+        return to_forget
+
+    def clear(self):
+        """Drops all ids, for a new tonlib instance."""
+        self._entries.clear()
+        self._retired.clear()
+        self.to_forget = []
+
+
 def get_tonlib_cdll_path():
     platform_name = platform.system().lower()
     if platform_name == 'linux':
@@ -1,7 +1,7 @@
 from ._address import Address
 from ._currency import to_nano, from_nano, TonCurrencyEnum
 from ._exceptions import InvalidAddressError
-from ._utils import concat_bytes, move_to_end, tree_walk, crc32c, \
+from ._utils import concat_bytes, move_to_end, tree_walk, topological_sort, crc32c, Crc32c, \
     crc16, read_n_bytes_uint_from_array, compare_bytes, sign_message, b64str_to_bytes, \
     b64str_to_hex, bytes_to_b64str, check_timeout
 from ._highload_query_id import HighloadQueryId
@@ -13,7 +13,9 @@ __all__ = [
     'concat_bytes',
     'move_to_end',
     'tree_walk',
+    'topological_sort',
     'crc32c',
+    'Crc32c',
     'crc16',
     'read_n_bytes_uint_from_array',
     'compare_bytes',
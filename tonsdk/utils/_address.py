@@ -1,8 +1,8 @@
 import base64
-import ctypes
+from typing import Iterable, List, Optional
 
 from ._exceptions import InvalidAddressError
-from ._utils import crc16, string_to_bytes
+from ._utils import crc16
 
 
 def parse_friendly_address(addr_str):
@@ -11,8 +11,11 @@ def parse_friendly_address(addr_str):
             "User-friendly address should contain strictly 48 characters")
 
     # avoid padding error (https://gist.github.com/perrygeo/ee7c65bb1541ff6ac770)
-    data = string_to_bytes(base64.b64decode(addr_str+"=="))
+    data = base64.b64decode(addr_str+"==")
+    return _parse_friendly_address_bytes(data)
 
+
+def _parse_friendly_address_bytes(data):
     if len(data) != 36:
         raise InvalidAddressError(
             "Unknown address type: byte length is not equal to 36")
@@ -50,60 +53,190 @@ def parse_friendly_address(addr_str):
     }
 
 
+def _parse_raw_address(any_form):
+    arr = any_form.split(":")
+    if len(arr) != 2:
+        raise InvalidAddressError(f"Invalid address {any_form}")
+
+    wc = int(arr[0])
+    if wc != 0 and wc != -1:
+        raise InvalidAddressError(f"Invalid address wc {wc}")
+
+    address_hex = arr[1]
+    if len(address_hex) != 64:
+        raise InvalidAddressError(f'Invalid address hex {any_form}')
+
+    return wc, bytes.fromhex(address_hex)
+
+
 class Address:
+    """Immutable TON address.
+
+    Addresses compare equal and hash by (wc, hash_part) only, whatever form
+    they were parsed from, so they can be used as dict keys directly.
+    """
     BOUNCEABLE_TAG = 0x11
     NON_BOUNCEABLE_TAG = 0x51
     TEST_FLAG = 0x80
 
+    __slots__ = ('wc', 'hash_part', 'is_test_only', 'is_user_friendly',
+                 'is_bounceable', 'is_url_safe', '_friendly_cache', '__weakref__')
+
+    # str -> Address, see enable_intern_pool()
+    _intern_pool = None
+    _intern_pool_max_size = None
+
+    def __new__(cls, any_form):
+        pool = cls._intern_pool
+        if pool is not None and type(any_form) is str:
+            address = pool.get(any_form)
+            if address is not None:
+                return address
+        return super().__new__(cls)
+
     def __init__(self, any_form):
+        if hasattr(self, 'wc'):
+            # returned from the intern pool
+            return
+
         if any_form is None:
             raise InvalidAddressError("Invalid address")
 
         if isinstance(any_form, Address):
-            self.wc = any_form.wc
-            self.hash_part = any_form.hash_part
-            self.is_test_only = any_form.is_test_only
-            self.is_user_friendly = any_form.is_user_friendly
-            self.is_bounceable = any_form.is_bounceable
-            self.is_url_safe = any_form.is_url_safe
+            self._init(any_form.wc, any_form.hash_part, any_form.is_test_only, any_form.is_user_friendly,
+                       any_form.is_bounceable, any_form.is_url_safe)
             return
 
+        source = any_form
         if any_form.find("-") > 0 or any_form.find("_") > 0:
             any_form = any_form.replace("-", '+').replace("_", '/')
-            self.is_url_safe = True
+            is_url_safe = True
         else:
-            self.is_url_safe = False
-
-        try:
-            colon_index = any_form.index(":")
-        except ValueError:
-            colon_index = -1
-
-        if colon_index > -1:
-            arr = any_form.split(":")
-            if len(arr) != 2:
-                raise InvalidAddressError(f"Invalid address {any_form}")
-
-            wc = int(arr[0])
-            if wc != 0 and wc != -1:
-                raise InvalidAddressError(f"Invalid address wc {wc}")
-
-            address_hex = arr[1]
-            if len(address_hex) != 64:
-                raise InvalidAddressError(f'Invalid address hex {any_form}')
-
-            self.is_user_friendly = False
-            self.wc = wc
-            self.hash_part = bytearray.fromhex(address_hex)
-            self.is_test_only = False
-            self.is_bounceable = False
+            is_url_safe = False
+
+        if ":" in any_form:
+            wc, hash_part = _parse_raw_address(any_form)
+            self._init(wc, hash_part, False, False, False, is_url_safe)
         else:
-            self.is_user_friendly = True
             parse_result = parse_friendly_address(any_form)
-            self.wc = parse_result["workchain"]
-            self.hash_part = parse_result["hash_part"]
-            self.is_test_only = parse_result["is_test_only"]
-            self.is_bounceable = parse_result["is_bounceable"]
+            self._init(parse_result["workchain"], parse_result["hash_part"], parse_result["is_test_only"], True,
+                       parse_result["is_bounceable"], is_url_safe)
+
+        self._intern(source)
+
+    def _init(self, wc, hash_part, is_test_only, is_user_friendly, is_bounceable, is_url_safe):
+        set_attr = object.__setattr__
+        set_attr(self, 'wc', wc)
+        set_attr(self, 'hash_part', bytes(hash_part))
+        set_attr(self, 'is_test_only', is_test_only)
+        set_attr(self, 'is_user_friendly', is_user_friendly)
+        set_attr(self, 'is_bounceable', is_bounceable)
+        set_attr(self, 'is_url_safe', is_url_safe)
+        # {(is_bounceable, is_url_safe, is_test_only): str}
+        set_attr(self, '_friendly_cache', {})
+
+    @classmethod
+    def _from_parts(cls, wc, hash_part, is_test_only, is_user_friendly, is_bounceable, is_url_safe):
+        address = object.__new__(cls)
+        address._init(wc, hash_part, is_test_only, is_user_friendly, is_bounceable, is_url_safe)
+        return address
+
+    def _intern(self, source):
+        pool = Address._intern_pool
+        if pool is None:
+            return
+        pool[source] = self
+        if Address._intern_pool_max_size is not None and len(pool) > Address._intern_pool_max_size:
+            # dicts keep insertion order: drop the oldest entry
+            del pool[next(iter(pool))]
+
+    @classmethod
+    def enable_intern_pool(cls, max_size: Optional[int] = 1 << 16):
+        """Makes Address(s) return the same object for the same string s.
+        At most max_size strings are remembered (None for no limit)."""
+        if Address._intern_pool is None:
+            Address._intern_pool = {}
+        Address._intern_pool_max_size = max_size
+
+    @classmethod
+    def disable_intern_pool(cls):
+        Address._intern_pool = None
+        Address._intern_pool_max_size = None
+
+    @classmethod
+    def parse_many(cls, addresses: Iterable[str]) -> List["Address"]:
+        """Parses many address strings at once.
+
+        All user-friendly forms are base64-decoded in a single call, and a
+        string repeated in the input is parsed only once."""
+        addresses = list(addresses)
+        pool = Address._intern_pool
+        parsed = {}
+        friendly = []
+        for any_form in addresses:
+            if not isinstance(any_form, str):
+                if not isinstance(any_form, Address):
+                    raise InvalidAddressError(f"Invalid address {any_form!r}")
+                continue
+            if any_form in parsed:
+                continue
+            if pool is not None and any_form in pool:
+                parsed[any_form] = pool[any_form]
+            elif ":" in any_form or len(any_form) != 48:
+                parsed[any_form] = cls(any_form)
+            else:
+                parsed[any_form] = None
+                friendly.append(any_form)
+
+        if friendly:
+            try:
+                data = base64.b64decode(
+                    ''.join(friendly).replace("-", '+').replace("_", '/'), validate=True)
+            except ValueError:
+                data = None
+
+            for i, any_form in enumerate(friendly):
+                if data is None:
+                    # invalid characters somewhere: parse one by one for a precise error
+                    parsed[any_form] = cls(any_form)
+                    continue
+                is_url_safe = any_form.find("-") > 0 or any_form.find("_") > 0
+                parse_result = _parse_friendly_address_bytes(data[i * 36:(i + 1) * 36])
+                address = cls._from_parts(parse_result["workchain"], parse_result["hash_part"],
+                                          parse_result["is_test_only"], True,
+                                          parse_result["is_bounceable"], is_url_safe)
+                address._intern(any_form)
+                parsed[any_form] = address
+
+        return [parsed[any_form] if isinstance(any_form, str) else cls(any_form)
+                for any_form in addresses]
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Address is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("Address is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, Address):
+            return NotImplemented
+        return self.wc == other.wc and self.hash_part == other.hash_part
+
+    def __hash__(self):
+        return hash((self.wc, self.hash_part))
+
+    def __repr__(self):
+        return f"<Address {self.to_string(False)}>"
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (Address._from_parts, (self.wc, self.hash_part, self.is_test_only, self.is_user_friendly,
+                                      self.is_bounceable, self.is_url_safe))
 
     def to_string(self, is_user_friendly=None, is_url_safe=None, is_bounceable=None, is_test_only=None):
         if is_user_friendly is None:
@@ -117,27 +250,26 @@ class Address:
 
         if not is_user_friendly:
             return f"{self.wc}:{self.hash_part.hex()}"
-        else:
-            tag = Address.BOUNCEABLE_TAG if is_bounceable else Address.NON_BOUNCEABLE_TAG
 
-            if is_test_only:
-                tag |= Address.TEST_FLAG
+        key = (bool(is_bounceable), bool(is_url_safe), bool(is_test_only))
+        address_base_64 = self._friendly_cache.get(key)
+        if address_base_64 is None:
+            address_base_64 = self._friendly_cache[key] = self._to_friendly_string(*key)
+        return address_base_64
+
+    def _to_friendly_string(self, is_bounceable, is_url_safe, is_test_only):
+        tag = Address.BOUNCEABLE_TAG if is_bounceable else Address.NON_BOUNCEABLE_TAG
 
-            addr = (ctypes.c_int8 * 34)()
-            addr[0] = tag
-            addr[1] = self.wc
-            addr[2:] = self.hash_part
-            address_with_checksum = (ctypes.c_uint8 * 36)()
-            address_with_checksum[:34] = addr
-            address_with_checksum[34:] = crc16(addr)
+        if is_test_only:
+            tag |= Address.TEST_FLAG
 
-            address_base_64 = base64.b64encode(
-                address_with_checksum).decode('utf-8')
-            if is_url_safe:
-                address_base_64 = address_base_64.replace(
-                    "+", '-').replace("/", '_')
+        addr = bytes([tag, self.wc & 0xff]) + self.hash_part
+        address_with_checksum = addr + crc16(addr)
 
-            return str(address_base_64)
+        if is_url_safe:
+            return base64.urlsafe_b64encode(address_with_checksum).decode('utf-8')
+        return base64.b64encode(address_with_checksum).decode('utf-8')
 
     def to_buffer(self):
-        return self.hash_part + bytearray([self.wc, self.wc, self.wc, self.wc])
+        wc = self.wc & 0xff
+        return bytearray(self.hash_part) + bytearray([wc, wc, wc, wc])
@@ -1,6 +1,6 @@
 import codecs
 import ctypes
-import math
+import itertools
 import struct
 
 import nacl
@@ -40,52 +40,163 @@ def tree_walk(cell, topological_order_arr, index_hashmap, parent_hash=None):
     return [topological_order_arr, index_hashmap]
 
 
-def _crc32c(crc, bytes_arr):
-    POLY = 0x82f63b78
+def topological_sort(*root_cells):
+    """Orders the cells of a tree exactly as tree_walk() does, but without
+    recursion and without rescanning the whole index on every shared
+    subtree. Returns [topological_order_arr, index_hashmap] in the same
+    shape as tree_walk().
+
+    Several roots may be given: their trees are ordered one after another,
+    each cell appearing once, before all of the cells it references."""
+    cells = {}  # hash -> cell, dict order is the topological order
+    position = {}  # hash -> ordering key, a later cell has a larger key
+    counter = itertools.count()
+
+    def move_subtree_to_end(target):
+        # A recursive move_to_end() leaves the subtree at the end ordered by
+        # the last occurrence of each cell in its (non-deduplicated) preorder,
+        # which is the reversed postorder of a right-to-left dedup walk.
+        postorder = []
+        visited = set()
+        stack = [(target, False)]
+        while stack:
+            _hash, children_done = stack.pop()
+            if children_done:
+                postorder.append(_hash)
+                continue
+            if _hash in visited:
+                continue
+            visited.add(_hash)
+            stack.append((_hash, True))
+            for sub_cell in cells[_hash].refs:
+                sub_hash = sub_cell.bytes_hash()
+                if sub_hash not in visited:
+                    stack.append((sub_hash, False))
+
+        for _hash in reversed(postorder):
+            cells[_hash] = cells.pop(_hash)
+            position[_hash] = next(counter)
+
+    # the roots are walked as the refs of a virtual parent placed before
+    # everything, so a root met again is never moved
+    position[None] = -1
+    stack = [(None, iter(root_cells))]
+    while stack:
+        parent_hash, sub_cells = stack[-1]
+        sub_cell = next(sub_cells, None)
+        if sub_cell is None:
+            stack.pop()
+            continue
+        cell_hash = sub_cell.bytes_hash()
+        if cell_hash in position:
+            if position[parent_hash] > position[cell_hash]:
+                move_subtree_to_end(cell_hash)
+            continue
+        cells[cell_hash] = sub_cell
+        position[cell_hash] = next(counter)
+        stack.append((cell_hash, iter(sub_cell.refs)))
+
+    del position[None]
+    topological_order_arr = [[_hash, cell] for _hash, cell in cells.items()]
+    index_hashmap = {_hash: i for i, _hash in enumerate(cells)}
+    return [topological_order_arr, index_hashmap]
+
+
+def _make_crc32c_tables(poly):
+    table = []
+    for n in range(256):
+        crc = n
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+        table.append(crc)
+
+    tables = [table]
+    for _ in range(7):
+        prev = tables[-1]
+        tables.append([(c >> 8) ^ table[c & 0xff] for c in prev])
+    return tables
 
-    crc ^= 0xffffffff
 
-    for n in range(len(bytes_arr)):
-        crc ^= bytes_arr[n]
-        crc = (crc >> 1) ^ POLY if crc & 1 else crc >> 1
-        crc = (crc >> 1) ^ POLY if crc & 1 else crc >> 1
-        crc = (crc >> 1) ^ POLY if crc & 1 else crc >> 1
-        crc = (crc >> 1) ^ POLY if crc & 1 else crc >> 1
-        crc = (crc >> 1) ^ POLY if crc & 1 else crc >> 1
-        crc = (crc >> 1) ^ POLY if crc & 1 else crc >> 1
-        crc = (crc >> 1) ^ POLY if crc & 1 else crc >> 1
-        crc = (crc >> 1) ^ POLY if crc & 1 else crc >> 1
+_CRC32C_TABLES = _make_crc32c_tables(0x82f63b78)
+
+
+def _crc32c_py(crc, bytes_arr):
+    """Slicing-by-8 CRC32C: eight table lookups per 8-byte word."""
+    t0, t1, t2, t3, t4, t5, t6, t7 = _CRC32C_TABLES
+    data = memoryview(bytes_arr).cast('B')
+    words_end = len(data) & ~7
+
+    crc ^= 0xffffffff
+    for lo, hi in struct.iter_unpack('<II', data[:words_end]):
+        lo ^= crc
+        crc = t7[lo & 0xff] ^ t6[(lo >> 8) & 0xff] ^ t5[(lo >> 16) & 0xff] ^ t4[lo >> 24] \
+            ^ t3[hi & 0xff] ^ t2[(hi >> 8) & 0xff] ^ t1[(hi >> 16) & 0xff] ^ t0[hi >> 24]
+    for byte in data[words_end:]:
+        crc = t0[(crc ^ byte) & 0xff] ^ (crc >> 8)
 
     return crc ^ 0xffffffff
 
 
+try:
+    # optional C implementation (pip install crc32c)
+    from crc32c import crc32c as _crc32c_native
+except ImportError:
+    _crc32c_native = None
+
+
+def _crc32c(crc, bytes_arr):
+    """Continues the CRC32C value crc over bytes_arr, so that
+    _crc32c(_crc32c(0, a), b) == _crc32c(0, a + b)."""
+    if _crc32c_native is not None:
+        return _crc32c_native(bytes(bytes_arr), crc)
+    return _crc32c_py(crc, bytes_arr)
+
+
 def crc32c(bytes_array):
     int_crc = _crc32c(0, bytes_array)
+    return int_crc.to_bytes(4, 'little')
+
+
+class Crc32c:
+    """Incremental CRC32C, e.g. to checksum a BOC while it is being written.
+
+    Crc32c(a).update(b).digest() == crc32c(a + b)
+    """
 
-    # TODO: check mistakes
-    arr = bytearray(4)
-    struct.pack_into('>I', arr, 0, int_crc)
+    def __init__(self, data=b''):
+        self.value = 0
+        if data:
+            self.update(data)
 
-    return bytes(arr)[::-1]
+    def update(self, data) -> "Crc32c":
+        self.value = _crc32c(self.value, data)
+        return self
+
+    def digest(self) -> bytes:
+        return self.value.to_bytes(4, 'little')
+
+
+def _make_crc16_table(poly):
+    table = []
+    for n in range(256):
+        crc = n << 8
+        for _ in range(8):
+            crc = (crc << 1) ^ poly if crc & 0x8000 else crc << 1
+        table.append(crc & 0xffff)
+    return table
+
+
+_CRC16_TABLE = _make_crc16_table(0x1021)
 
 
 def crc16(data):
-    POLY = 0x1021
-    reg = 0
-    message = bytes(data) + bytes(2)
-
-    for byte in message:
-        mask = 0x80
-        while mask > 0:
-            reg <<= 1
-            if byte & mask:
-                reg += 1
-            mask >>= 1
-            if reg > 0xffff:
-                reg &= 0xffff
-                reg ^= POLY
-
-    return bytearray([math.floor(reg / 256), reg % 256])
+    """CRC-16/XMODEM of data as two big-endian bytes, one table lookup per byte."""
+    table = _CRC16_TABLE
+    crc = 0
+    for byte in bytes(data):
+        crc = ((crc << 8) & 0xffff) ^ table[(crc >> 8) ^ byte]
+
+    return bytearray(crc.to_bytes(2, 'big'))
 
 
 def read_n_bytes_uint_from_array(size_bytes, uint8_array):